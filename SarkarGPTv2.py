@@ -1,29 +1,33 @@
 import yfinance as yf
 import mplfinance as mpf
 import pandas as pd
-import sys, os, json, io, base64, threading, traceback
-from datetime import datetime
-from functools import partial
-
-try:
-    import cv2
-    import numpy as np
-except ImportError:
-    cv2 = None
-    np = None
-
-from PIL import Image, ImageQt, ImageEnhance, ImageFilter
+import numpy as np
+import sys, os, json, io, base64, threading, traceback, time, ast, csv, zlib, bisect, re, hashlib, zipfile, uuid, sqlite3
+import multiprocessing
+import xml.etree.ElementTree as ElementTree
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from functools import partial, lru_cache
+
+from PIL import Image, ImageEnhance, ImageFilter, ImageDraw, ImageFont
 
 import requests
 from deep_translator import GoogleTranslator
 
 try:
     from reportlab.lib.pagesizes import A4, letter
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, ListFlowable, ListItem, Preformatted
+    from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame
+    from reportlab.platypus.tableofcontents import TableOfContents
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.enums import TA_RIGHT, TA_CENTER, TA_JUSTIFY
     from reportlab.lib import colors
     from reportlab.lib.units import cm, inch
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas as pdf_canvas
 except ImportError:
     SimpleDocTemplate = None
 
@@ -37,11 +41,11 @@ from PyQt6.QtWidgets import (
     QStackedWidget, QListWidget, QListWidgetItem, QTextEdit, QLineEdit, QFileDialog, QMessageBox,
     QComboBox, QCheckBox, QSpinBox, QGroupBox, QFormLayout, QTabWidget, QSlider, QFrame,
     QSplitter, QInputDialog, QDialogButtonBox, QSizePolicy, QScrollArea, QRadioButton,
-    QTableWidget, QTableWidgetItem, QHeaderView
+    QTableWidget, QTableWidgetItem, QHeaderView, QToolTip, QCompleter, QProgressBar
 )
-from PyQt6.QtGui import QIcon, QPixmap, QAction, QColor, QFont, QPalette, QBrush, QPen, QImage, QMovie
+from PyQt6.QtGui import QIcon, QPixmap, QAction, QColor, QFont, QPalette, QBrush, QPen, QImage, QMovie, QPainter, QTextCursor, QTextBlockFormat, QTextCharFormat
 from PyQt6.QtCore import (
-    Qt, QTimer, pyqtSignal, QObject, QSize, QEvent, QRect, QPoint,
+    Qt, QTimer, pyqtSignal, QObject, QSize, QEvent, QRect, QPoint, QRectF, QPointF, QLineF, QStringListModel,
     QPropertyAnimation, QEasingCurve, QSequentialAnimationGroup
 )
 
@@ -63,6 +67,10 @@ API_KEY_FILE = os.path.join(APP_DATA_DIR, "api_keys.json")
 PREF_FILE = os.path.join(APP_DATA_DIR, "preferences.json")
 TEMPLATES_FILE = os.path.join(APP_DATA_DIR, "templates.json")
 CHAT_MEMORY_FILE = os.path.join(APP_DATA_DIR, "chat_memory.json")
+STOCK_AI_CACHE_FILE = os.path.join(APP_DATA_DIR, "stock_ai_cache.json")
+SYMBOLS_FILE = os.path.join(APP_DATA_DIR, "symbols.csv")
+BOOKS_DIR = os.path.join(APP_DATA_DIR, "books")
+LEDGER_FILE = os.path.join(APP_DATA_DIR, "ledger.sqlite3")
 
 
 ICONS_DIR = "icons"
@@ -82,7 +90,17 @@ DEFAULT_PREFS = {
     "active_template": "No Template",
     "remember_messages": True,
     "ai_mindset_preset": "Neutral",
-    "ai_mindset_custom": ""
+    "ai_mindset_custom": "",
+    "market_data_provider": "yfinance",
+    "fixture_dir": os.path.join(APP_DATA_DIR, "fixtures"),
+    "fixture_latency_ms": 0,
+    "fixture_generate": True,
+    "stock_ai_combined": True,
+    "watchlist": [],
+    "watchlist_live": False,
+    "watchlist_poll_seconds": 30,
+    "watchlist_ignore_hours": False,
+    "book_workers": 4
 }
 
 ensure_file(API_KEY_FILE, {})
@@ -103,15 +121,72 @@ def save_json(path, data):
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
+class TTLCache:
+    def __init__(self, path=None, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = load_json(path, {}) if path else {}
+
+    def get(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry["at"] < ttl:
+                return entry["value"]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = {"value": value, "at": time.time()}
+            if len(self._entries) > self.max_entries:
+                for old in sorted(self._entries, key=lambda k: self._entries[k]["at"])[:len(self._entries) - self.max_entries]:
+                    del self._entries[old]
+            if self.path:
+                try:
+                    save_json(self.path, self._entries)
+                except Exception as e:
+                    print(f"Could not persist cache {self.path}: {e}")
+
+
+_openai_clients = {}
+_openai_clients_lock = threading.Lock()
+
+
+def openai_client(key):
+    with _openai_clients_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            client = _openai_clients[key] = OpenAI(api_key=key)
+        return client
+
+
 class Signals(QObject):
     chat_reply = pyqtSignal(str, str)
     translate_done = pyqtSignal(str)
+    translate_progress = pyqtSignal(object)
     image_gen_done = pyqtSignal(object)
     image_to_graph_done = pyqtSignal(str)
     book_gen_done = pyqtSignal(str)
+    book_outline_done = pyqtSignal(object)
+    book_section_update = pyqtSignal(int, str, object)
+    book_section_stream = pyqtSignal(int, str)
     stock_overview_done = pyqtSignal(str)
     stock_analytics_done = pyqtSignal(str)
     stock_graph_done = pyqtSignal(object)
+    stock_data_done = pyqtSignal(str, str, str, object)
+    backtest_done = pyqtSignal(object)
+    backtest_sweep_done = pyqtSignal(object)
+    screener_rows = pyqtSignal(object)
+    screener_done = pyqtSignal(object)
+    watchlist_tick = pyqtSignal(object)
+    portfolio_done = pyqtSignal(object)
+    compare_done = pyqtSignal(object)
+    report_progress = pyqtSignal(object)
+    pdf_progress = pyqtSignal(str, object)
+    pdf_done = pyqtSignal(str, object)
+    invoice_batch_progress = pyqtSignal(object)
+    book_export_done = pyqtSignal(object)
+    ledger_report_done = pyqtSignal(object)
     business_assist_done = pyqtSignal(str)
 
 
@@ -217,30 +292,41 @@ def english_number(n):
     trans = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹০১২৩৪۵۶৭۸৯", "01234s6789012345678901234s6789")
     return s.translate(trans)
 
-def pil_to_qpixmap(pil_image, maxsize=None):
-    if pil_image is None:
-        return QPixmap()
-    img = pil_image.copy()
-    if maxsize:
-        img.thumbnail(maxsize, Image.Resampling.LANCZOS)
-    qim = ImageQt.ImageQt(img.convert("RGBA"))
-    pix = QPixmap.fromImage(qim)
-    return pix
-
-def cv2_to_qpixmap(cv_image, maxsize=None):
-    if cv_image is None:
-        return QPixmap()
-    try:
-        h, w, ch = cv_image.shape
-        bytes_per_line = ch * w
-        rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
-        q_img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        pixmap = QPixmap.fromImage(q_img)
-        if maxsize:
-            pixmap = pixmap.scaled(maxsize[0], maxsize[1], Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-        return pixmap
-    except Exception as e:
-        return QPixmap()
+PIL_QIMAGE_FORMATS = {
+    "RGBA": QImage.Format.Format_RGBA8888,
+    "RGB": QImage.Format.Format_RGB888,
+    "L": QImage.Format.Format_Grayscale8,
+}
+
+
+def qimage_from_rgba(buffer, width, height):
+    return QImage(buffer, width, height, width * 4, QImage.Format.Format_RGBA8888)
+
+
+def figure_rgba(fig):
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    return width, height, fig.canvas.buffer_rgba()
+
+
+def to_qimage(image):
+    if image is None:
+        return QImage()
+    if isinstance(image, QImage):
+        return image
+    if isinstance(image, Image.Image):
+        if image.mode not in PIL_QIMAGE_FORMATS:
+            image = image.convert("RGBA")
+        return QImage(image.tobytes(), image.width, image.height,
+                      image.width * len(image.getbands()), PIL_QIMAGE_FORMATS[image.mode])
+    array = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = array.shape[:2]
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    fmt = {1: QImage.Format.Format_Grayscale8,
+           3: QImage.Format.Format_RGB888,
+           4: QImage.Format.Format_RGBA8888}[channels]
+    return QImage(array.data, width, height, array.strides[0], fmt)
+
 
 def pil_to_base64(pil_image, format="PNG"):
     buf = io.BytesIO()
@@ -264,6 +350,3357 @@ def get_icon_path(icon_name):
     return path
 
 
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10), "max": None,
+}
+PERIOD_ORDER = ["1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+INTERVAL_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "1d": 1440}
+INTERVAL_MAX_PERIOD = {"1m": "5d", "5m": "1mo", "15m": "1mo", "30m": "1mo", "1h": "2y", "1d": "max"}
+
+
+def normalize_ohlcv(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    data = data[[col for col in OHLCV_COLUMNS if col in data.columns]].copy()
+    for col in data.columns:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    data = data.dropna()
+    data = data[~data.index.duplicated(keep="last")].sort_index()
+    return data
+
+
+def cache_period(period):
+    return "1y" if period == "ytd" else period
+
+
+def clamp_period(period, interval):
+    limit = INTERVAL_MAX_PERIOD.get(interval, "max")
+    return limit if PERIOD_ORDER.index(period) > PERIOD_ORDER.index(limit) else period
+
+
+def resample_ohlcv(data, interval):
+    if data.empty:
+        return data
+    index = pd.DatetimeIndex(data.index)
+    local = index.tz_localize(None) if index.tz is not None else index
+    stamps = local.values.astype("datetime64[ns]").view(np.int64)
+    step = INTERVAL_MINUTES[interval] * 60_000_000_000
+    if interval == "1d":
+        offset = 0
+    else:
+        day = stamps // 86_400_000_000_000
+        opens = stamps[np.concatenate([[0], np.flatnonzero(np.diff(day)) + 1])] % min(step, 3_600_000_000_000)
+        values, counts = np.unique(opens, return_counts=True)
+        offset = int(values[np.argmax(counts)])
+    buckets = (stamps - offset) // step
+    ends = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate([[0], ends])
+    last = np.concatenate([ends - 1, [len(buckets) - 1]])
+    o, h, l, c, v = (data[col].to_numpy(dtype=float) for col in OHLCV_COLUMNS)
+    labels = pd.DatetimeIndex((buckets[starts] * step + offset).view("datetime64[ns]"))
+    if index.tz is not None:
+        labels = labels.tz_localize(index.tz, ambiguous="NaT", nonexistent="shift_forward")
+    return pd.DataFrame({"Open": o[starts], "High": np.maximum.reduceat(h, starts),
+                         "Low": np.minimum.reduceat(l, starts), "Close": c[last],
+                         "Volume": np.add.reduceat(v, starts)}, index=labels)
+
+
+def period_start(last, period):
+    if period == "ytd":
+        return pd.Timestamp(year=last.year, month=1, day=1, tz=last.tz)
+    return last - PERIOD_OFFSETS.get(period, pd.DateOffset(months=6))
+
+
+def slice_period(data, period):
+    if data.empty or period == "max":
+        return data
+    return data[data.index >= period_start(data.index[-1], period)]
+
+
+class MarketDataProvider:
+    name = "base"
+
+    def fetch(self, ticker, period, interval):
+        raise NotImplementedError
+
+    def fetch_many(self, tickers, period, interval):
+        frames = {}
+        for ticker in tickers:
+            try:
+                frames[ticker] = self.fetch(ticker, period, interval)
+            except Exception as e:
+                print(f"{self.name} fetch failed for {ticker}: {e}")
+        return frames
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def fetch(self, ticker, period, interval):
+        data = yf.download(ticker, period=period, interval=interval, auto_adjust=True, progress=False)
+        return normalize_ohlcv(data)
+
+    def fetch_many(self, tickers, period, interval):
+        if len(tickers) == 1:
+            return {tickers[0]: self.fetch(tickers[0], period, interval)}
+        data = yf.download(tickers, period=period, interval=interval, auto_adjust=True,
+                           group_by="ticker", threads=True, progress=False)
+        frames = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex) and ticker in data.columns.get_level_values(0):
+                frames[ticker] = normalize_ohlcv(data[ticker])
+        return frames
+
+
+FIXTURE_FREQUENCIES = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "1h", "1d": "B"}
+
+
+@lru_cache(maxsize=16)
+def _fixture_index(interval, bars, end):
+    return pd.date_range(end=pd.Timestamp(end), periods=bars, freq=FIXTURE_FREQUENCIES.get(interval, interval))
+
+
+def generate_fixture_bars(ticker, interval="1d", bars=7500, end="2024-12-31", seed=0):
+    rng = np.random.default_rng(zlib.crc32(f"{ticker.upper()}|{interval}".encode()) ^ seed)
+    index = _fixture_index(interval, bars, end)
+    drift, vol = rng.uniform(-0.0002, 0.0006), rng.uniform(0.008, 0.03)
+    close = rng.uniform(10, 400) * np.exp(np.cumsum(rng.normal(drift, vol, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, vol / 4, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, bars)))
+    volume = rng.lognormal(13, 0.5, bars).round()
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+
+class FixtureProvider(MarketDataProvider):
+    name = "fixture"
+
+    def __init__(self, root=None, latency=0.0, generate=True, seed=0):
+        self.root = root
+        self.latency = latency
+        self.generate = generate
+        self.seed = seed
+
+    def _find(self, ticker, interval):
+        if not self.root or not os.path.isdir(self.root):
+            return None
+        for stem in (f"{ticker}_{interval}", ticker):
+            for ext in (".parquet", ".csv"):
+                path = os.path.join(self.root, stem + ext)
+                if os.path.exists(path):
+                    return path
+        return None
+
+    def _load(self, ticker, interval):
+        path = self._find(ticker.upper(), interval)
+        if path is not None:
+            if path.endswith(".parquet"):
+                data = pd.read_parquet(path)
+            else:
+                data = pd.read_csv(path, index_col=0, parse_dates=True)
+            return normalize_ohlcv(data)
+        if self.generate:
+            return generate_fixture_bars(ticker, interval, seed=self.seed)
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    def fetch(self, ticker, period, interval):
+        if self.latency:
+            time.sleep(self.latency)
+        return slice_period(self._load(ticker, interval), period)
+
+    def fetch_many(self, tickers, period, interval):
+        if self.latency:
+            time.sleep(self.latency)
+        return {ticker: slice_period(self._load(ticker, interval), period) for ticker in tickers}
+
+
+def make_market_data_provider(prefs):
+    kind = os.environ.get("SARKARGPT_MARKET_DATA") or prefs.get("market_data_provider", "yfinance")
+    if kind == "fixture":
+        return FixtureProvider(root=prefs.get("fixture_dir") or os.path.join(APP_DATA_DIR, "fixtures"),
+                               latency=prefs.get("fixture_latency_ms", 0) / 1000.0,
+                               generate=prefs.get("fixture_generate", True))
+    return YFinanceProvider()
+
+
+def render_placeholder_image(text, size=(600, 400), bg="#ffffff", fg="#000000"):
+    img = Image.new("RGB", size, bg)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default(size=22)
+    except TypeError:
+        font = ImageFont.load_default()
+    left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=font, align="center")
+    draw.multiline_text(((size[0] - (right - left)) / 2, (size[1] - (bottom - top)) / 2), text,
+                        fill=fg, font=font, align="center")
+    return img
+
+
+class OHLCVCache:
+    MAX_CHANGES = 64
+
+    def __init__(self, ttl=900, provider=None):
+        self.ttl = ttl
+        self.provider = provider or YFinanceProvider()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._version = 0
+
+    def _next_version(self):
+        self._version += 1
+        return self._version
+
+    @property
+    def version(self):
+        return self._version
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _covers(self, entry, period):
+        return PERIOD_ORDER.index(entry["period"]) >= PERIOD_ORDER.index(cache_period(period))
+
+    def set_provider(self, provider):
+        with self._lock:
+            self.provider = provider
+            self._entries.clear()
+
+    def _download(self, ticker, period, interval):
+        return self.provider.fetch(ticker, period, interval)
+
+    def _download_many(self, tickers, period, interval):
+        return self.provider.fetch_many(tickers, period, interval)
+
+    def get_many(self, tickers, period="6mo", interval="1d", batch_size=100, refresh=False):
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        missing = []
+        with self._lock:
+            for ticker in tickers:
+                entry = self._entries.get((ticker, interval))
+                if refresh or entry is None or (time.time() - entry["fetched_at"]) >= self.ttl or not self._covers(entry, period):
+                    missing.append(ticker)
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            try:
+                frames = self._download_many(batch, cache_period(period), interval)
+            except Exception as e:
+                if refresh:
+                    raise
+                print(f"Batch download failed for {len(batch)} tickers: {e}")
+                continue
+            for ticker, data in frames.items():
+                if not data.empty:
+                    self.merge(ticker, interval, data, period)
+        result = {}
+        for ticker in tickers:
+            frame, _ = self.snapshot(ticker, interval)
+            if frame is not None and not frame.empty:
+                result[ticker] = slice_period(frame, period)
+        return result
+
+    def _finer_source(self, ticker, period, interval):
+        minutes = INTERVAL_MINUTES.get(interval)
+        if minutes is None:
+            return None
+        with self._lock:
+            entry = self._entries.get((ticker.upper(), interval))
+            if (entry is not None and entry.get("source") is None and self._covers(entry, period)
+                    and (time.time() - entry["fetched_at"]) < self.ttl):
+                return None
+            for finer, finer_minutes in sorted(INTERVAL_MINUTES.items(), key=lambda item: item[1]):
+                if finer_minutes >= minutes or minutes % finer_minutes:
+                    continue
+                entry = self._entries.get((ticker.upper(), finer))
+                if (entry is not None and entry.get("source") is None and self._covers(entry, period)
+                        and (time.time() - entry["fetched_at"]) < self.ttl):
+                    return entry["frame"]
+        return None
+
+    def get(self, ticker, period="6mo", interval="1d", refresh=False):
+        key = (ticker.upper(), interval)
+        with self._key_lock(key):
+            source = None if refresh else self._finer_source(ticker, period, interval)
+            if source is not None:
+                self.merge(ticker, interval, resample_ohlcv(slice_period(source, cache_period(period)), interval), period, "resampled")
+                return slice_period(self._entries[key]["frame"], period)
+            entry = self._entries.get(key)
+            fresh = entry is not None and (time.time() - entry["fetched_at"]) < self.ttl
+            if entry is None or refresh or not fresh or not self._covers(entry, period):
+                wanted = cache_period(period)
+                if entry is not None and self._covers(entry, period):
+                    wanted = entry["period"]
+                data = self._download(ticker, wanted, interval)
+                if data.empty:
+                    raise Exception(f"No data found for ticker {ticker} (period: {period}, interval: {interval})")
+                if entry is not None and entry.get("source"):
+                    self.put(ticker, interval, data, wanted)
+                else:
+                    self.merge(ticker, interval, data, wanted)
+                entry = self._entries[key]
+            return slice_period(entry["frame"], period)
+
+    def put(self, ticker, interval, data, period="max"):
+        key = (ticker.upper(), interval)
+        period = cache_period(period)
+        with self._lock:
+            version = self._next_version()
+            self._entries[key] = {"frame": data, "version": version, "period": period,
+                                  "fetched_at": time.time(), "changes": [(version, 0)]}
+        return version
+
+    def merge(self, ticker, interval, data, period=None, source=None):
+        key = (ticker.upper(), interval)
+        period = cache_period(period)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                version = self._next_version()
+                self._entries[key] = {"frame": data, "version": version, "period": period or "max",
+                                      "fetched_at": time.time(), "changes": [(version, 0)]}
+                if source:
+                    self._entries[key]["source"] = source
+                return version
+            old = entry["frame"]
+            merged = pd.concat([old[~old.index.isin(data.index)], data]).sort_index()
+            n = min(len(old), len(merged))
+            same = (old.index[:n] == merged.index[:n]) & np.isclose(
+                old.to_numpy(dtype=float)[:n], merged.to_numpy(dtype=float)[:n], equal_nan=True).all(axis=1)
+            first_changed = int(np.argmin(same)) if not same.all() else n
+            entry["fetched_at"] = time.time()
+            if period and PERIOD_ORDER.index(period) > PERIOD_ORDER.index(entry["period"]):
+                entry["period"] = period
+            if first_changed == len(merged) == len(old):
+                return entry["version"]
+            entry["frame"] = merged
+            entry["version"] = self._next_version()
+            entry["changes"] = (entry["changes"] + [(entry["version"], first_changed)])[-self.MAX_CHANGES:]
+            return entry["version"]
+
+    def snapshot(self, ticker, interval="1d"):
+        with self._lock:
+            entry = self._entries.get((ticker.upper(), interval))
+            if entry is None:
+                return None, 0
+            return entry["frame"], entry["version"]
+
+    def changed_since(self, ticker, interval, version):
+        with self._lock:
+            entry = self._entries.get((ticker.upper(), interval))
+            if entry is None or not entry["changes"] or entry["changes"][0][0] > version + 1:
+                return 0
+            positions = [pos for ver, pos in entry["changes"] if ver > version]
+            return min(positions) if positions else None
+
+
+def _seeded_ewm(values, alpha, seed=None):
+    if seed is not None and np.isfinite(seed):
+        values = values.copy()
+        values.iloc[0] = seed
+    return values.ewm(alpha=alpha, adjust=False).mean()
+
+
+def _seeded_cumsum(values, seed=None):
+    if seed is not None and np.isfinite(seed):
+        values = values.copy()
+        values.iloc[0] = seed
+    return values.cumsum()
+
+
+def indicator_sma(data, period=20, seed=None):
+    return pd.DataFrame({f"SMA {period}": data["Close"].rolling(period).mean()})
+
+
+def indicator_ema(data, period=20, seed=None):
+    col = f"EMA {period}"
+    return pd.DataFrame({col: _seeded_ewm(data["Close"], 2.0 / (period + 1), None if seed is None else seed[col])})
+
+
+def indicator_rsi(data, period=14, seed=None):
+    delta = data["Close"].diff()
+    gain = _seeded_ewm(delta.clip(lower=0), 1.0 / period, None if seed is None else seed["_gain"])
+    loss = _seeded_ewm(-delta.clip(upper=0), 1.0 / period, None if seed is None else seed["_loss"])
+    rs = gain / loss.replace(0, np.nan)
+    rsi = (100 - 100 / (1 + rs)).where(loss != 0, 100.0)
+    return pd.DataFrame({f"RSI {period}": rsi, "_gain": gain, "_loss": loss})
+
+
+def indicator_macd(data, fast=12, slow=26, signal=9, seed=None):
+    close = data["Close"]
+    ema_fast = _seeded_ewm(close, 2.0 / (fast + 1), None if seed is None else seed["_fast"])
+    ema_slow = _seeded_ewm(close, 2.0 / (slow + 1), None if seed is None else seed["_slow"])
+    macd = ema_fast - ema_slow
+    sig = _seeded_ewm(macd, 2.0 / (signal + 1), None if seed is None else seed["MACD Signal"])
+    return pd.DataFrame({"MACD": macd, "MACD Signal": sig, "MACD Hist": macd - sig, "_fast": ema_fast, "_slow": ema_slow})
+
+
+def indicator_bollinger(data, period=20, width=2.0, seed=None):
+    close = data["Close"]
+    mid = close.rolling(period).mean()
+    std = close.rolling(period).std(ddof=0)
+    return pd.DataFrame({"BB Mid": mid, "BB Upper": mid + width * std, "BB Lower": mid - width * std})
+
+
+def indicator_atr(data, period=14, seed=None):
+    prev_close = data["Close"].shift(1)
+    tr = pd.concat([data["High"] - data["Low"], (data["High"] - prev_close).abs(), (data["Low"] - prev_close).abs()], axis=1).max(axis=1)
+    col = f"ATR {period}"
+    return pd.DataFrame({col: _seeded_ewm(tr, 1.0 / period, None if seed is None else seed[col])})
+
+
+def indicator_vwap(data, seed=None):
+    typical = (data["High"] + data["Low"] + data["Close"]) / 3.0
+    pv = _seeded_cumsum(typical * data["Volume"], None if seed is None else seed["_pv"])
+    vol = _seeded_cumsum(data["Volume"], None if seed is None else seed["_vol"])
+    return pd.DataFrame({"VWAP": pv / vol.replace(0, np.nan), "_pv": pv, "_vol": vol})
+
+
+def indicator_volatility(data, period=20, annualize=252, seed=None):
+    returns = np.log(data["Close"]).diff()
+    return pd.DataFrame({f"Volatility {period}": returns.rolling(period).std() * np.sqrt(annualize)})
+
+
+INDICATORS = {
+    "SMA": {"fn": indicator_sma, "params": {"period": 20}, "context": lambda p: p["period"], "pane": "price"},
+    "EMA": {"fn": indicator_ema, "params": {"period": 20}, "context": lambda p: 1, "pane": "price"},
+    "RSI": {"fn": indicator_rsi, "params": {"period": 14}, "context": lambda p: 1, "pane": "lower"},
+    "MACD": {"fn": indicator_macd, "params": {"fast": 12, "slow": 26, "signal": 9}, "context": lambda p: 1, "pane": "lower"},
+    "BBANDS": {"fn": indicator_bollinger, "params": {"period": 20, "width": 2.0}, "context": lambda p: p["period"], "pane": "price"},
+    "ATR": {"fn": indicator_atr, "params": {"period": 14}, "context": lambda p: 1, "pane": "lower"},
+    "VWAP": {"fn": indicator_vwap, "params": {}, "context": lambda p: 1, "pane": "price"},
+    "VOLATILITY": {"fn": indicator_volatility, "params": {"period": 20, "annualize": 252}, "context": lambda p: p["period"] + 1, "pane": "lower"},
+}
+
+CHART_INDICATOR_PRESETS = [
+    ("SMA 20", "SMA", {"period": 20}),
+    ("SMA 50", "SMA", {"period": 50}),
+    ("SMA 200", "SMA", {"period": 200}),
+    ("EMA 20", "EMA", {"period": 20}),
+    ("Bollinger", "BBANDS", {}),
+    ("VWAP", "VWAP", {}),
+    ("RSI 14", "RSI", {"period": 14}),
+    ("MACD", "MACD", {}),
+    ("ATR 14", "ATR", {"period": 14}),
+    ("Volatility 20", "VOLATILITY", {"period": 20}),
+]
+
+
+class IndicatorEngine:
+    MAX_MEMO = 512
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def compute(self, ticker, name, interval="1d", **params):
+        spec = INDICATORS[name]
+        params = {**spec["params"], **params}
+        frame, version = self._cache.snapshot(ticker, interval)
+        if frame is None:
+            raise KeyError(f"No cached data for {ticker} ({interval})")
+        key = (ticker.upper(), interval, name, tuple(sorted(params.items())))
+        with self._lock:
+            memo = self._memo.get(key)
+        if memo is not None and memo[0] == version:
+            return memo[1]
+
+        result = None
+        if memo is not None:
+            first_changed = self._cache.changed_since(ticker, interval, memo[0])
+            if first_changed is not None:
+                start = first_changed - spec["context"](params)
+                if start >= 1 and first_changed <= len(memo[1]):
+                    seed = memo[1].iloc[start]
+                    tail = spec["fn"](frame.iloc[start:], seed=seed, **params).iloc[first_changed - start:]
+                    result = pd.concat([memo[1].iloc[:first_changed], tail])
+        if result is None:
+            result = spec["fn"](frame, **params)
+
+        with self._lock:
+            self._memo.pop(key, None)
+            self._memo[key] = (version, result)
+            while len(self._memo) > self.MAX_MEMO:
+                self._memo.pop(next(iter(self._memo)))
+        return result
+
+    def visible(self, ticker, name, interval="1d", **params):
+        result = self.compute(ticker, name, interval, **params)
+        return result[[col for col in result.columns if not col.startswith("_")]]
+
+    def snapshot_text(self, ticker, interval="1d"):
+        frame, _ = self._cache.snapshot(ticker, interval)
+        if frame is None or frame.empty:
+            return ""
+        last = frame.iloc[-1]
+        lines = [f"Latest bar: {frame.index[-1]:%Y-%m-%d}  O {last['Open']:.2f}  H {last['High']:.2f}  "
+                 f"L {last['Low']:.2f}  C {last['Close']:.2f}  V {last['Volume']:,.0f}"]
+        for label, name, params in CHART_INDICATOR_PRESETS:
+            values = self.visible(ticker, name, interval, **params).iloc[-1]
+            parts = [f"{col} {val:,.2f}" for col, val in values.items() if pd.notna(val)]
+            if parts:
+                lines.append(", ".join(parts))
+        return "\n".join(lines)
+
+
+ohlcv_cache = OHLCVCache()
+STOCK_OVERVIEW_TTL = 7 * 24 * 3600
+STOCK_SENTIMENT_TTL = 30 * 60
+stock_ai_cache = TTLCache(STOCK_AI_CACHE_FILE)
+indicator_engine = IndicatorEngine(ohlcv_cache)
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+_render_pool = None
+RENDER_WORKERS = max(2, min(6, (os.cpu_count() or 2) - 1))
+
+
+def _render_worker_init():
+    import matplotlib
+    matplotlib.use("Agg")
+    import mplfinance
+
+
+def render_pool():
+    global _render_pool
+    with _process_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=_render_worker_init,
+                                               mp_context=multiprocessing.get_context("spawn"))
+        return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _process_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+def css_color_to_mpl(value, fallback="#444444", min_alpha=0.0):
+    value = (value or "").strip()
+    if value.startswith("#"):
+        return value
+    if value.startswith("rgb"):
+        parts = [float(p) for p in value[value.index("(") + 1:value.rindex(")")].split(",")]
+        alpha = max(parts[3] if len(parts) > 3 else 1.0, min_alpha)
+        return "#{:02x}{:02x}{:02x}{:02x}".format(*(int(round(c)) for c in parts[:3]), int(round(alpha * 255)))
+    return fallback
+
+
+def chart_render_style(theme):
+    is_dark = theme.get("is_dark", True)
+    bg = theme.get("card_bg", "#2a2a3e")
+    if "gradient" in bg:
+        bg = bg.split("stop:1 ")[-1].strip(")") if is_dark else "#ffffff"
+    return {"is_dark": is_dark,
+            "bg": bg,
+            "text": theme.get("text", "#e0e0e0" if is_dark else "#222222"),
+            "up": theme.get("accent", "#2ECC71"),
+            "down": "#E74C3C",
+            "grid": css_color_to_mpl(theme.get("glass"), "#444444", min_alpha=0.35)}
+
+
+def share_ohlcv(data):
+    values = np.ascontiguousarray(data[OHLCV_COLUMNS].to_numpy(dtype=np.float64))
+    dates = pd.DatetimeIndex(data.index)
+    index = dates.values.astype("datetime64[ns]").view(np.int64)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes + index.nbytes))
+    buf = np.ndarray(values.size + index.size, dtype=np.float64, buffer=shm.buf)
+    buf[:values.size] = values.ravel()
+    buf[values.size:] = index.view(np.float64)
+    return shm, {"name": shm.name, "rows": len(values), "tz": str(dates.tz) if dates.tz else None}
+
+
+def attach_ohlcv(ref):
+    shm = shared_memory.SharedMemory(name=ref["name"])
+    try:
+        rows = ref["rows"]
+        buf = np.ndarray(rows * 6, dtype=np.float64, buffer=shm.buf)
+        values = buf[:rows * 5].reshape(rows, 5).copy()
+        index = pd.DatetimeIndex(buf[rows * 5:].view(np.int64).copy().view("datetime64[ns]"))
+    finally:
+        shm.close()
+    if ref.get("tz"):
+        index = index.tz_localize("UTC").tz_convert(ref["tz"])
+    return pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS)
+
+
+def render_candlestick_rgba(ref, title, style, figsize=(10, 6), dpi=100):
+    import matplotlib.pyplot as plt
+    data = attach_ohlcv(ref)
+    mc = mpf.make_marketcolors(up=style["up"], down=style["down"],
+                               wick={'up': style["up"], 'down': style["down"]},
+                               volume={'up': style["up"], 'down': style["down"]},
+                               edge="inherit")
+    text_color = style["text"]
+    mpf_style = mpf.make_mpf_style(base_mpf_style='nightclouds' if style["is_dark"] else 'default',
+                                   marketcolors=mc,
+                                   facecolor=style["bg"],
+                                   edgecolor=text_color,
+                                   figcolor=style["bg"],
+                                   gridcolor=style["grid"],
+                                   gridstyle="--",
+                                   y_on_right=True,
+                                   rc={'axes.labelcolor': text_color,
+                                       'xtick.color': text_color,
+                                       'ytick.color': text_color,
+                                       'text.color': text_color,
+                                       'figure.facecolor': style["bg"],
+                                       'axes.facecolor': style["bg"]})
+    fig, _ = mpf.plot(data, type='candle', style=mpf_style, title=f"\n{title}", volume=True,
+                      panel_ratios=(3, 1), figsize=figsize, tight_layout=True, scale_padding={'right': 1.5},
+                      returnfig=True)
+    try:
+        fig.set_dpi(dpi)
+        width, height, rgba = figure_rgba(fig)
+        return width, height, bytes(rgba)
+    finally:
+        plt.close(fig)
+
+
+def _report_row(ticker, frame):
+    close = frame["Close"]
+    last = float(close.iloc[-1])
+    change = lambda n: (last / float(close.iloc[-n - 1]) - 1) * 100 if len(close) > n else float("nan")
+    return [ticker, f"{last:,.2f}", f"{change(1):+.2f}%", f"{change(21):+.2f}%", f"{(last / float(close.iloc[0]) - 1) * 100:+.2f}%"]
+
+
+REPORT_CHART_THEME = {"is_dark": False, "card_bg": "#FFFFFF", "text": "#222222", "accent": "#2ECC71", "glass": "rgba(0, 0, 0, 0.2)"}
+
+
+def report_markdown_flowables(text, style):
+    flowables = []
+    for block in parse_markdown_blocks(text):
+        kind = block[0]
+        if kind == "heading":
+            flowables.append(Paragraph(f"<b>{markdown_inline(block[2])}</b>", style))
+        elif kind in ("para", "quote"):
+            flowables.append(Paragraph(markdown_inline(_join_markdown_lines(block[1])).replace("\n", "<br/>"), style))
+        elif kind == "list":
+            counters = {}
+            for indent, ordered, item in block[1]:
+                counters = {level: n for level, n in counters.items() if level <= indent}
+                counters[indent] = counters.get(indent, 0) + 1
+                marker = f"{counters[indent]}." if ordered else "&bull;"
+                flowables.append(Paragraph(f"{'&nbsp;' * (indent + 2)}{marker} {markdown_inline(item)}", style))
+        elif kind == "code":
+            flowables.append(Paragraph(f'<font face="Courier">{_xml_escape(block[1]).replace(chr(10), "<br/>")}</font>', style))
+        elif kind == "table":
+            flowables.extend(Paragraph(" | ".join(markdown_inline(cell) for cell in row), style) for row in block[1])
+    return flowables
+
+
+def write_watchlist_report(path, tickers, period="6mo", progress=None):
+    t0 = time.perf_counter()
+    frames = ohlcv_cache.get_many(tickers, period, "1d")
+    tickers = [t for t in tickers if t in frames]
+    if not tickers:
+        raise Exception("No price data for any watchlist ticker")
+    style = chart_render_style(REPORT_CHART_THEME)
+    pool = render_pool()
+    jobs = []
+    for ticker in tickers:
+        shm, ref = share_ohlcv(frames[ticker])
+        jobs.append((ticker, shm, pool.submit(render_candlestick_rgba, ref, f"{ticker} - {period}", style, (10, 6), 100)))
+
+    styles = getSampleStyleSheet()
+    body = ParagraphStyle(name="ReportBody", parent=styles["Normal"], fontSize=9, leading=12, alignment=TA_JUSTIFY)
+    table_style = TableStyle([("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"), ("FONTSIZE", (0, 0), (-1, -1), 8),
+                              ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1A2642")),
+                              ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                              ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#BBBBBB")),
+                              ("ALIGN", (1, 0), (-1, -1), "RIGHT")])
+    width, height = A4
+    margin = 1.8 * cm
+    frame_width = width - 2 * margin
+    pdf = pdf_canvas.Canvas(path, pagesize=A4)
+    pdf.setTitle("Watchlist Report")
+
+    def footer(page):
+        pdf.setFont("Helvetica", 8)
+        pdf.drawString(margin, 1.2 * cm, f"SarkarGPT Watchlist Report · {datetime.now():%Y-%m-%d %H:%M}")
+        pdf.drawRightString(width - margin, 1.2 * cm, f"Page {page}")
+
+    def draw_flowable(flowable, y):
+        while True:
+            _, h = flowable.wrapOn(pdf, frame_width, y - 2 * cm)
+            if h <= y - 2 * cm:
+                flowable.drawOn(pdf, margin, y - h)
+                return y - h
+            parts = flowable.split(frame_width, y - 2 * cm)
+            if len(parts) > 1:
+                _, h = parts[0].wrapOn(pdf, frame_width, y - 2 * cm)
+                parts[0].drawOn(pdf, margin, y - h)
+                flowable = parts[1]
+            elif y >= height - margin:
+                flowable.drawOn(pdf, margin, y - h)
+                return y - h
+            footer(pdf.getPageNumber())
+            pdf.showPage()
+            y = height - margin
+
+    try:
+        pdf.setFont("Helvetica-Bold", 20)
+        pdf.drawString(margin, height - margin - 10, "Watchlist Report")
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(margin, height - margin - 28, f"{len(tickers)} tickers · {period} daily bars")
+        rows = [["Ticker", "Last", "1D", "1M", period]] + [_report_row(t, frames[t]) for t in tickers]
+        summary = Table(rows, colWidths=[frame_width / 5] * 5, repeatRows=1)
+        summary.setStyle(table_style)
+        y = height - margin - 44
+        while summary is not None:
+            parts = summary.split(frame_width, y - 2 * cm)
+            if not parts:
+                parts = [summary]
+            draw_flowable(parts[0], y)
+            footer(pdf.getPageNumber())
+            pdf.showPage()
+            summary = parts[1] if len(parts) > 1 else None
+            y = height - margin
+
+        for i in range(len(jobs)):
+            ticker, shm, future = jobs[i]
+            jobs[i] = None
+            try:
+                chart_w, chart_h, rgba = future.result()
+                chart = Image.frombuffer("RGBA", (chart_w, chart_h), rgba, "raw", "RGBA", 0, 1).convert("RGB")
+            except Exception as e:
+                chart = None
+                print(f"Report chart failed for {ticker}: {e}")
+            finally:
+                shm.close(); shm.unlink()
+            y = height - margin
+            pdf.setFont("Helvetica-Bold", 16)
+            name = symbol_index.name(ticker)
+            pdf.drawString(margin, y - 14, f"{ticker}  {name}".strip())
+            y -= 26
+            if chart is not None:
+                chart_height = frame_width * chart.height / chart.width
+                pdf.drawImage(ImageReader(chart), margin, y - chart_height, frame_width, chart_height)
+                y -= chart_height + 8
+            else:
+                pdf.setFont("Helvetica-Oblique", 10)
+                pdf.drawString(margin, y - 12, "Chart unavailable")
+                y -= 24
+            indicator_rows = [["Indicator", "Value"]]
+            for label, indicator, params in CHART_INDICATOR_PRESETS:
+                try:
+                    values = indicator_engine.visible(ticker, indicator, "1d", **params).iloc[-1]
+                except Exception:
+                    continue
+                values = values.dropna()
+                text = f"{values.iloc[0]:,.2f}" if len(values) == 1 else ", ".join(f"{col} {val:,.2f}" for col, val in values.items())
+                if text:
+                    indicator_rows.append([label, text])
+            if len(indicator_rows) > 1:
+                indicators = Table(indicator_rows, colWidths=[frame_width * 0.3, frame_width * 0.7])
+                indicators.setStyle(table_style)
+                y = draw_flowable(indicators, y) - 10
+            overview = stock_ai_cache.get(f"overview:{ticker}", STOCK_OVERVIEW_TTL)
+            text = overview or "No cached AI overview. Search this ticker in Market View to fetch one."
+            for flowable in report_markdown_flowables(text, body):
+                y = draw_flowable(flowable, y) - 4
+            footer(pdf.getPageNumber())
+            pdf.showPage()
+            if progress:
+                progress(i + 1, len(jobs))
+        pdf.save()
+    finally:
+        for job in jobs:
+            if job is not None:
+                job[2].cancel()
+                job[1].close(); job[1].unlink()
+    return {"path": path, "tickers": len(tickers), "elapsed": time.perf_counter() - t0}
+
+
+class PdfBuildCancelled(Exception):
+    pass
+
+
+def build_pdf(doc, story, progress=None, cancel=None, multi=False, **kwargs):
+    state = {"page": 0, "done": 0, "total": max(1, len(story)), "pass": 1}
+
+    def on_progress(kind, value):
+        if cancel is not None and cancel.is_set():
+            raise PdfBuildCancelled("Export cancelled.")
+        if kind == "PROGRESS":
+            state["done"] = value
+        elif kind == "PASS":
+            state["pass"] = value
+        elif kind == "PAGE":
+            state["page"] = value
+            if progress:
+                progress(dict(state))
+
+    doc.setProgressCallBack(on_progress)
+    if multi:
+        doc.multiBuild(story, **kwargs)
+    else:
+        doc.build(story, **kwargs)
+    return state
+
+
+def book_page_number(canvas, doc):
+    canvas.saveState()
+    page_num = canvas.getPageNumber()
+    if page_num > 1:
+        canvas.setFont('Helvetica', 9)
+        canvas.drawRightString(doc.width + doc.leftMargin, 1.5 * cm, f"Page {page_num - 1}")
+    canvas.restoreState()
+
+
+MD_HEADING = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+MD_RULE = re.compile(r"^\s{0,3}([-*_])(?:\s*\1){2,}\s*$")
+MD_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+MD_ORDERED = re.compile(r"^(\s*)\d{1,9}[.)]\s+(.*)$")
+MD_FENCE = re.compile(r"^\s*(```|~~~)")
+MD_TABLE_SEP = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+MD_ESCAPE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!|~<>])")
+MD_CODE = re.compile(r"(`+)(.+?)\1")
+MD_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+MD_BOLD = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__")
+MD_ITALIC = re.compile(r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?!\*)|(?<![\w_])_(?=\S)(.+?)(?<=\S)_(?![\w_])")
+MD_STRIKE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~")
+
+
+def _xml_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def markdown_inline(text, html=False):
+    text = MD_ESCAPE.sub(lambda m: chr(0xF0000 + ord(m.group(1))), text)
+    spans = []
+
+    def code(m):
+        code_text = _xml_escape(m.group(2).strip())
+        spans.append(f"<code>{code_text}</code>" if html else f'<font face="Courier">{code_text}</font>')
+        return f"\x00{len(spans) - 1}\x00"
+
+    text = _xml_escape(MD_CODE.sub(code, text))
+    link = '<a href="{1}">{0}</a>' if html else '<a href="{1}" color="#1e88e5">{0}</a>'
+    text = MD_LINK.sub(lambda m: link.format(m.group(1), m.group(2).replace('"', "&quot;")), text)
+    text = MD_BOLD.sub(lambda m: f"<b>{m.group(1) or m.group(2)}</b>", text)
+    text = MD_ITALIC.sub(lambda m: f"<i>{m.group(1) or m.group(2)}</i>", text)
+    strike = "del" if html else "strike"
+    text = MD_STRIKE.sub(lambda m: f"<{strike}>{m.group(1)}</{strike}>", text)
+    text = re.sub("\x00(\\d+)\x00", lambda m: spans[int(m.group(1))], text)
+    return re.sub("[\U000F0000-\U000F00FF]", lambda m: _xml_escape(chr(ord(m.group(0)) - 0xF0000)), text)
+
+
+def _table_cells(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def _list_match(line):
+    m = MD_BULLET.match(line)
+    if m and not MD_RULE.match(line):
+        return len(m.group(1).expandtabs(4)), False, m.group(2)
+    m = MD_ORDERED.match(line)
+    if m:
+        return len(m.group(1).expandtabs(4)), True, m.group(2)
+    return None
+
+
+def _markdown_block_start(line):
+    stripped = line.strip()
+    return (not stripped or MD_RULE.match(line) or MD_HEADING.match(stripped) or MD_FENCE.match(line)
+            or stripped.startswith((">", "|")))
+
+
+def parse_markdown_blocks(text):
+    lines = text.replace("\r\n", "\n").split("\n")
+    blocks, para, i = [], [], 0
+
+    def flush():
+        if para:
+            blocks.append(("para", list(para)))
+            para.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        fence = MD_FENCE.match(line)
+        if fence:
+            flush()
+            code, i = [], i + 1
+            while i < len(lines) and not lines[i].strip().startswith(fence.group(1)):
+                code.append(lines[i])
+                i += 1
+            blocks.append(("code", "\n".join(code)))
+            i += 1
+            continue
+        if not stripped:
+            flush()
+            i += 1
+            continue
+        if MD_RULE.match(line):
+            flush()
+            blocks.append(("rule",))
+            i += 1
+            continue
+        heading = MD_HEADING.match(stripped)
+        if heading:
+            flush()
+            blocks.append(("heading", len(heading.group(1)), heading.group(2)))
+            i += 1
+            continue
+        item = _list_match(line)
+        if item and not (para and item[1] and not stripped.startswith(("1.", "1)"))):
+            flush()
+            items = []
+            while i < len(lines):
+                item = _list_match(lines[i])
+                if item:
+                    items.append(list(item))
+                elif lines[i].strip() and (lines[i][:1].isspace() or not _markdown_block_start(lines[i])):
+                    items[-1][2] += " " + lines[i].strip()
+                elif not lines[i].strip() and i + 1 < len(lines) and (_list_match(lines[i + 1]) or lines[i + 1][:1].isspace()):
+                    pass
+                else:
+                    break
+                i += 1
+            blocks.append(("list", items))
+            continue
+        if stripped.startswith(">"):
+            flush()
+            quote = []
+            while i < len(lines) and lines[i].strip().startswith(">"):
+                quote.append(lines[i].strip()[1:].strip())
+                i += 1
+            blocks.append(("quote", quote))
+            continue
+        if "|" in stripped and not para and i + 1 < len(lines) and "-" in lines[i + 1] and MD_TABLE_SEP.match(lines[i + 1]):
+            rows, i = [_table_cells(line)], i + 2
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                rows.append(_table_cells(lines[i]))
+                i += 1
+            blocks.append(("table", rows))
+            continue
+        para.append(line)
+        i += 1
+    flush()
+    return blocks
+
+
+def _join_markdown_lines(lines):
+    text = ""
+    for line in lines[:-1]:
+        if line.endswith("  ") or line.endswith("\\"):
+            text += line.rstrip(" \\") + "\n"
+        else:
+            text += line.strip() + " "
+    return (text + lines[-1].strip()).strip()
+
+
+@lru_cache(maxsize=None)
+def book_stylesheet():
+    body = ParagraphStyle(name='Body', fontSize=10, alignment=TA_JUSTIFY, spaceAfter=6, leading=14, fontName='Helvetica')
+    return {
+        "title": ParagraphStyle(name='TitleStyle', fontSize=32, leading=38, alignment=TA_CENTER, spaceAfter=20, fontName='Helvetica-Bold', textColor=colors.HexColor("#1A2642")),
+        "author": ParagraphStyle(name='AuthorStyle', fontSize=16, leading=20, alignment=TA_CENTER, spaceAfter=40, fontName='Helvetica-Oblique', textColor=colors.HexColor("#555555")),
+        "h1": ParagraphStyle(name='H1', fontSize=20, leading=24, fontName='Helvetica-Bold', spaceBefore=20, spaceAfter=10, textColor=colors.HexColor("#1F1F32"), borderPadding=4, borderBottomWidth=1, borderBottomColor=colors.HexColor("#1F1F32")),
+        "h2": ParagraphStyle(name='H2', fontSize=16, leading=20, fontName='Helvetica-Bold', spaceBefore=10, spaceAfter=5, textColor=colors.HexColor("#20314e")),
+        "h3": ParagraphStyle(name='H3', fontSize=14, leading=17, fontName='Helvetica-Bold', spaceBefore=5, spaceAfter=4, textColor=colors.HexColor("#2C3E50")),
+        "body": body,
+        "list": ParagraphStyle(name='ListBody', parent=body, spaceAfter=2),
+        "quote": ParagraphStyle(name='Quote', parent=body, fontName='Helvetica-Oblique', leftIndent=18, rightIndent=18, textColor=colors.HexColor("#555555")),
+        "code": ParagraphStyle(name='Code', fontName='Courier', fontSize=8.5, leading=11, leftIndent=8, spaceBefore=4, spaceAfter=8, backColor=colors.HexColor("#F2F4F7"), borderPadding=4),
+        "cell": ParagraphStyle(name='Cell', parent=body, alignment=0, spaceAfter=0, fontSize=9, leading=12),
+        "toc0": ParagraphStyle(name='TOC0', fontName='Helvetica-Bold', fontSize=11, leading=15, leftIndent=16, firstLineIndent=-16, spaceBefore=6),
+        "toc1": ParagraphStyle(name='TOC1', fontName='Helvetica', fontSize=10, leading=13, leftIndent=32, firstLineIndent=-16),
+    }
+
+
+def markdown_plain(text):
+    return MD_ESCAPE.sub(lambda m: m.group(1), re.sub(r"\*\*|__|~~|[*`]", "", text)).strip()
+
+
+def _markdown_paragraph(text, style):
+    try:
+        return CachedParagraph(markdown_inline(text).replace("\n", "<br/>"), style)
+    except ValueError:
+        return CachedParagraph(_xml_escape(text).replace("\n", "<br/>"), style)
+
+
+def _list_entries(items):
+    base = min(indent for indent, _, _ in items)
+    entries = []
+    for indent, ordered, text in items:
+        if indent > base and entries:
+            entries[-1][2].append((indent, ordered, text))
+        else:
+            entries.append((ordered, text, []))
+    return entries
+
+
+def _markdown_list(items, styles):
+    entries = _list_entries(items)
+    flowables, run = [], []
+    for j, (ordered, text, children) in enumerate(entries):
+        content = [_markdown_paragraph(text, styles["list"])]
+        if children:
+            content += _markdown_list(children, styles)
+        run.append(ListItem(content))
+        if j + 1 == len(entries) or entries[j + 1][0] != ordered:
+            flowables.append(ListFlowable(run, bulletType="1" if ordered else "bullet", start=None if ordered else "\u2022",
+                                          bulletFormat="%s." if ordered else None, leftIndent=16, bulletFontSize=9, spaceAfter=6))
+            run = []
+    return flowables
+
+
+def markdown_flowables(text, width, styles=None):
+    styles = styles or book_stylesheet()
+    story, previous = [], None
+    for block in parse_markdown_blocks(text):
+        kind = block[0]
+        if kind == "heading":
+            level = block[1]
+            if level == 2 and story and not isinstance(story[-1], PageBreak):
+                story.append(PageBreak())
+            style = styles[("title", "h1", "h2")[level - 1] if level <= 3 else "h3"]
+            heading = _markdown_paragraph(block[2], style)
+            heading.outline = (level, markdown_plain(block[2]), f"heading-{len(story)}")
+            story.append(heading)
+        elif kind == "para":
+            joined = _join_markdown_lines(block[1])
+            style = styles["author"] if previous and previous[:2] == ("heading", 1) and joined.startswith("*By ") else styles["body"]
+            story.append(_markdown_paragraph(joined, style))
+        elif kind == "list":
+            story += _markdown_list(block[1], styles)
+        elif kind == "quote":
+            story.append(_markdown_paragraph(_join_markdown_lines(block[1]), styles["quote"]))
+        elif kind == "code":
+            story.append(Preformatted(block[1], styles["code"], maxLineLength=int(width / (styles["code"].fontSize * 0.6)) - 2, newLineChars=""))
+        elif kind == "table":
+            columns = max(len(row) for row in block[1])
+            rows = [[_markdown_paragraph(cell, styles["cell"]) for cell in row + [""] * (columns - len(row))] for row in block[1]]
+            table = Table(rows, colWidths=[width / columns] * columns, repeatRows=1)
+            table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#E0E5EC")),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#B0B8C4")),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP')
+            ]))
+            story += [table, Spacer(1, 0.3*cm)]
+        elif kind == "rule" and story and not isinstance(story[-1], PageBreak):
+            story.append(PageBreak())
+        previous = block
+    return story
+
+
+if SimpleDocTemplate is not None:
+    class CachedParagraph(Paragraph):
+        def breakLines(self, width):
+            key = tuple(width) if isinstance(width, (list, tuple)) else width
+            cache = self.__dict__.setdefault("_break_cache", {})
+            if key not in cache:
+                cache[key] = super().breakLines(width)
+            return cache[key]
+
+    class BookDocTemplate(BaseDocTemplate):
+        def __init__(self, filename, book_title="", **kwargs):
+            super().__init__(filename, **kwargs)
+            self.book_title = book_title
+            self.chapter = ""
+            self._outline_level = -1
+            frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="body")
+            self.addPageTemplates([PageTemplate(id="book", frames=[frame], onPageEnd=self._decorate_page)])
+
+        def beforeDocument(self):
+            self.chapter = ""
+            self._outline_level = -1
+
+        def afterFlowable(self, flowable):
+            outline = getattr(flowable, "outline", None)
+            if outline is None:
+                return
+            level, text, key = outline
+            if level == 1:
+                self.book_title = self.book_title or text
+                return
+            if level == 2:
+                self.chapter = text
+            depth = min(level - 2, self._outline_level + 1, 2)
+            self._outline_level = depth
+            self.canv.bookmarkPage(key, fit="XYZ", left=0, top=self.frame._y + flowable.height + flowable.getSpaceBefore())
+            self.canv.addOutlineEntry(text, key, level=depth)
+            if level <= 3:
+                self.notify("TOCEntry", (level - 2, _xml_escape(text), self.page - 1, key))
+
+        def _decorate_page(self, canvas, doc):
+            book_page_number(canvas, doc)
+            if canvas.getPageNumber() == 1:
+                return
+            top = doc.pagesize[1] - 1.3 * cm
+            canvas.saveState()
+            canvas.setFont('Helvetica', 8)
+            canvas.setFillColor(colors.HexColor("#777777"))
+            canvas.drawString(doc.leftMargin, top, self.book_title[:70])
+            canvas.drawRightString(doc.leftMargin + doc.width, top, self.chapter[:70])
+            canvas.setStrokeColor(colors.HexColor("#CCCCCC"))
+            canvas.setLineWidth(0.5)
+            canvas.line(doc.leftMargin, top - 4, doc.leftMargin + doc.width, top - 4)
+            canvas.restoreState()
+
+
+def book_story(text, width):
+    styles = book_stylesheet()
+    story = markdown_flowables(text, width, styles)
+    toc = TableOfContents(dotsMinLevel=0)
+    toc.levelStyles = [styles["toc0"], styles["toc1"]]
+    contents = [Paragraph("Contents", styles["h1"]), toc]
+    first = next((i for i, flowable in enumerate(story) if getattr(flowable, "outline", (0,))[0] == 2), None)
+    if first is None:
+        return story
+    if first > 0 and isinstance(story[first - 1], PageBreak):
+        first -= 1
+    else:
+        contents.append(PageBreak())
+    if first > 0:
+        contents.insert(0, PageBreak())
+    return story[:first] + contents + story[first:]
+
+
+def write_book_pdf(path, text, title="", progress=None, cancel=None):
+    doc = BookDocTemplate(path, book_title=title, title=title, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
+    return build_pdf(doc, book_story(text, doc.width), progress, cancel, multi=True)
+
+
+@lru_cache(maxsize=None)
+def invoice_styles():
+    styles = getSampleStyleSheet()
+    return {
+        "title": styles['Title'],
+        "heading": styles['Heading2'],
+        "body": styles['Normal'],
+        "right": ParagraphStyle(name='right', parent=styles['Normal'], alignment=TA_RIGHT),
+        "center": ParagraphStyle(name='center', parent=styles['Normal'], alignment=TA_CENTER),
+        "table": TableStyle([
+            ('BACKGROUND',(0,0),(-1,0), colors.HexColor("#2C3E50")),
+            ('TEXTCOLOR',(0,0),(-1,0), colors.whitesmoke),
+            ('GRID',(0,0),(-1,-1),0.5,colors.gray),
+            ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor("#E0E5EC")),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#CADBEB")),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')
+        ]),
+    }
+
+
+def build_invoice_story(client, address, items, tax_pct, date=None):
+    styles = invoice_styles()
+    story = []
+    story.append(Paragraph("SarkarGPT Pro Services", styles['title']))
+    story.append(Paragraph("Invoice", styles['heading']))
+    story.append(Paragraph(f"Date: {date or datetime.now().strftime('%Y-%m-%d')}", styles['right']))
+    story.append(Spacer(1,0.2*inch))
+    story.append(Paragraph(f"Bill To: {_xml_escape(client)}", styles['body']))
+    story.append(Paragraph(_xml_escape(address).replace("\n","<br/>"), styles['body']))
+    story.append(Spacer(1,0.2*inch))
+    data = [["Item Description","Rate","Qty","Total"]]
+    subtotal = 0.0
+    for it in items:
+        data.append([it['name'], english_number(it['rate']), str(it['qty']), english_number(it['total'])])
+        subtotal += it['total']
+    tax_amt = subtotal * tax_pct / 100.0
+    grand = subtotal + tax_amt
+    data.append(["","","Subtotal", english_number(subtotal)])
+    data.append(["","","Tax ("+str(int(tax_pct))+"%)", english_number(tax_amt)])
+    data.append(["","","Total", english_number(grand)])
+    table = Table(data, colWidths=[3*inch,1*inch,0.6*inch,1*inch])
+    table.setStyle(styles['table'])
+    story.append(table); story.append(Spacer(1,0.5*inch))
+    story.append(Paragraph("Thank you for your business!", styles['center']))
+    return story
+
+
+def write_invoice_pdf(path, client, address, items, tax_pct, progress=None, cancel=None, date=None):
+    return build_pdf(SimpleDocTemplate(path, pagesize=A4), build_invoice_story(client, address, items, tax_pct, date), progress, cancel)
+
+
+def _batch_number(value, field, where):
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        raise ValueError(f"{where}: '{value}' is not a valid {field}")
+
+
+def load_invoice_batch(path, default_tax=18.0):
+    label, first = "Row", 2
+    if path.lower().endswith(".json"):
+        label, first = "Item", 1
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records.get("invoices", [])
+        rows = []
+        for record in records:
+            for item in record.get("items", []):
+                rows.append({**{k: v for k, v in record.items() if k != "items"}, **item})
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = [{(k or "").strip().lower(): (v or "").strip() if isinstance(v, str) else v for k, v in row.items()}
+                    for row in csv.DictReader(f)]
+    invoices = {}
+    for line, row in enumerate(rows, first):
+        where = f"{label} {line}"
+        client = str(row.get("client") or "").strip()
+        name = str(row.get("item") or row.get("name") or "").strip()
+        if not client or not name:
+            raise ValueError(f"{where}: every line item needs a client and an item name")
+        key = (client, str(row.get("invoice") or ""))
+        invoice = invoices.setdefault(key, {"client": client, "address": "", "tax_pct": None, "date": None, "items": []})
+        invoice["address"] = invoice["address"] or str(row.get("address") or "").replace("\\n", "\n")
+        if invoice["tax_pct"] is None and str(row.get("tax") or "").strip():
+            invoice["tax_pct"] = _batch_number(row["tax"], "tax rate", where)
+        if not invoice["date"] and str(row.get("date") or "").strip():
+            try:
+                invoice["date"] = datetime.strptime(str(row["date"]).strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{where}: date '{row['date']}' must be YYYY-MM-DD")
+        rate = _batch_number(row.get("rate", ""), "rate", where)
+        qty = _batch_number(row.get("qty") or 1, "quantity", where)
+        qty = int(qty) if qty.is_integer() else qty
+        invoice["items"].append({"name": name, "rate": rate, "qty": qty, "total": rate * qty})
+    for invoice in invoices.values():
+        if invoice["tax_pct"] is None:
+            invoice["tax_pct"] = float(default_tax)
+    return list(invoices.values())
+
+
+def render_invoice(path, invoice):
+    t0 = time.perf_counter()
+    state = write_invoice_pdf(path, invoice["client"], invoice["address"], invoice["items"], invoice["tax_pct"], date=invoice["date"])
+    return {"pages": state["page"], "render_ms": (time.perf_counter() - t0) * 1000}
+
+
+def write_invoice_batch(invoices, out_dir, source="", pool=None, progress=None, cancel=None):
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    entries, used = [], set()
+    for invoice in invoices:
+        name = f"Invoice_{book_slug(invoice['client'])}"
+        stem, n = name, 2
+        while name in used:
+            name, n = f"{stem}-{n}", n + 1
+        used.add(name)
+        subtotal = sum(item["total"] for item in invoice["items"])
+        tax = subtotal * invoice["tax_pct"] / 100.0
+        entries.append({"client": invoice["client"], "file": f"{name}.pdf", "items": len(invoice["items"]),
+                        "subtotal": round(subtotal, 2), "tax": round(tax, 2), "total": round(subtotal + tax, 2),
+                        "pages": 0, "render_ms": None, "status": "pending"})
+
+    def finished(index, result, error=None):
+        if error is None:
+            entries[index].update(result, status="ok", render_ms=round(result["render_ms"], 1))
+        else:
+            entries[index].update(status="failed", error=str(error))
+        if progress:
+            progress(done, len(entries), dict(entries[index], index=index))
+
+    stopped = lambda: cancel is not None and cancel.is_set()
+    done = 0
+    if pool is None:
+        for index, invoice in enumerate(invoices):
+            if stopped():
+                break
+            done += 1
+            try:
+                finished(index, render_invoice(os.path.join(out_dir, entries[index]["file"]), invoice))
+            except Exception as e:
+                finished(index, None, e)
+    else:
+        queued = iter(enumerate(invoices))
+        window = 2 * (os.cpu_count() or 2)
+        pending = {}
+        try:
+            while True:
+                while len(pending) < window and not stopped():
+                    index, invoice = next(queued, (None, None))
+                    if invoice is None:
+                        break
+                    pending[pool.submit(render_invoice, os.path.join(out_dir, entries[index]["file"]), invoice)] = index
+                if not pending:
+                    break
+                if stopped():
+                    for future in pending:
+                        future.cancel()
+                for future in wait(pending, timeout=0.2, return_when=FIRST_COMPLETED).done:
+                    index = pending.pop(future)
+                    if future.cancelled():
+                        continue
+                    done += 1
+                    try:
+                        finished(index, future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        finished(index, None, e)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    for entry in entries:
+        if entry["status"] == "pending":
+            entry["status"] = "cancelled"
+    times = [entry["render_ms"] for entry in entries if entry["status"] == "ok"]
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "invoices": entries,
+        "count": len(entries),
+        "failed": sum(entry["status"] == "failed" for entry in entries),
+        "cancelled": sum(entry["status"] == "cancelled" for entry in entries),
+        "grand_total": round(sum(entry["total"] for entry in entries if entry["status"] == "ok"), 2),
+        "render_ms_total": round(sum(times), 1),
+        "render_ms_max": round(max(times), 1) if times else None,
+        "elapsed": round(time.perf_counter() - t0, 3),
+    }
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+    return dict(manifest, path=path)
+
+
+LEDGER_STATUSES = ("unpaid", "paid", "void")
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    number TEXT UNIQUE,
+    client TEXT NOT NULL,
+    address TEXT NOT NULL DEFAULT '',
+    issued TEXT NOT NULL,
+    month TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'unpaid',
+    tax_pct REAL NOT NULL,
+    subtotal REAL NOT NULL,
+    tax REAL NOT NULL,
+    total REAL NOT NULL,
+    path TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invoice_items (
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    rate REAL NOT NULL,
+    qty REAL NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (invoice_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_invoices_client ON invoices(client, issued, status, total);
+CREATE INDEX IF NOT EXISTS idx_invoices_month_issued ON invoices(month, status, issued, subtotal, tax, total);
+CREATE INDEX IF NOT EXISTS idx_invoices_tax ON invoices(tax_pct, status, issued, subtotal, tax);
+CREATE INDEX IF NOT EXISTS idx_invoices_issued ON invoices(issued);
+CREATE INDEX IF NOT EXISTS idx_invoices_status ON invoices(status, issued, total);
+"""
+
+
+class InvoiceLedger:
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(LEDGER_SCHEMA)
+        return self._conn
+
+    def record(self, invoice, path=""):
+        return self.record_many([(invoice, path)])[0]
+
+    def record_many(self, invoices):
+        numbers = []
+        with self._lock:
+            db = self._db()
+            with db:
+                for invoice, path in invoices:
+                    issued = invoice.get("date") or datetime.now().strftime("%Y-%m-%d")
+                    subtotal = sum(item["total"] for item in invoice["items"])
+                    tax = subtotal * invoice["tax_pct"] / 100.0
+                    cur = db.execute("INSERT INTO invoices (client, address, issued, month, tax_pct, subtotal, tax, total, path, created) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     (invoice["client"], invoice.get("address", ""), issued, issued[:7], float(invoice["tax_pct"]),
+                                      subtotal, tax, subtotal + tax, path, time.time()))
+                    number = f"INV-{issued[:4]}-{cur.lastrowid:06d}"
+                    db.execute("UPDATE invoices SET number = ? WHERE id = ?", (number, cur.lastrowid))
+                    db.executemany("INSERT INTO invoice_items (invoice_id, position, name, rate, qty, total) VALUES (?, ?, ?, ?, ?, ?)",
+                                   [(cur.lastrowid, i, item["name"], item["rate"], item["qty"], item["total"])
+                                    for i, item in enumerate(invoice["items"])])
+                    numbers.append(number)
+        return numbers
+
+    def set_status(self, numbers, status):
+        if status not in LEDGER_STATUSES:
+            raise ValueError(f"Unknown invoice status: {status}")
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("UPDATE invoices SET status = ? WHERE number = ?", [(status, number) for number in numbers])
+
+    def invoices(self, since=None, client=None, status=None, limit=500):
+        where, params = self._filters(since, client, status)
+        with self._lock:
+            return self._db().execute(f"SELECT number, issued, client, total, status, path FROM invoices{where} "
+                                      f"ORDER BY issued DESC, id DESC LIMIT ?", params + [limit]).fetchall()
+
+    def items(self, number):
+        with self._lock:
+            return self._db().execute("SELECT i.name, i.rate, i.qty, i.total FROM invoice_items i JOIN invoices v ON v.id = i.invoice_id "
+                                      "WHERE v.number = ? ORDER BY i.position", (number,)).fetchall()
+
+    def _filters(self, since=None, client=None, status=None):
+        clauses, params = [], []
+        if since:
+            clauses.append("issued >= ?"); params.append(since)
+        if client:
+            clauses.append("client = ?"); params.append(client)
+        if status:
+            clauses.append("status = ?"); params.append(status)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def report(self, since=None, client=None):
+        where, params = self._filters(since, client)
+        billed = f"{where} {'AND' if where else 'WHERE'} status != 'void'"
+        with self._lock:
+            db = self._db()
+            monthly = db.execute(f"SELECT month, COUNT(*), SUM(subtotal), SUM(tax), SUM(total), "
+                                 f"SUM(CASE WHEN status = 'paid' THEN total ELSE 0 END) "
+                                 f"FROM invoices{billed} GROUP BY month ORDER BY month DESC", params).fetchall()
+            clients = db.execute(f"SELECT client, COUNT(*), SUM(total), SUM(CASE WHEN status = 'unpaid' THEN total ELSE 0 END), MAX(issued) "
+                                 f"FROM invoices{billed} GROUP BY client ORDER BY SUM(total) DESC", params).fetchall()
+            taxes = db.execute(f"SELECT tax_pct, COUNT(*), SUM(subtotal), SUM(tax) FROM invoices{billed} "
+                               f"GROUP BY tax_pct ORDER BY tax_pct", params).fetchall()
+            outstanding = db.execute(f"SELECT COUNT(*), COALESCE(SUM(total), 0), MIN(issued) FROM invoices"
+                                     f"{where} {'AND' if where else 'WHERE'} status = 'unpaid'", params).fetchone()
+        return {"monthly": monthly, "clients": clients, "taxes": taxes, "outstanding": outstanding,
+                "revenue": sum(row[4] for row in monthly), "tax": sum(row[3] for row in monthly)}
+
+    def clients(self):
+        with self._lock:
+            return [row[0] for row in self._db().execute("SELECT DISTINCT client FROM invoices ORDER BY client")]
+
+
+invoice_ledger = InvoiceLedger()
+
+
+BOOK_CSS = """
+body { font-family: Georgia, serif; line-height: 1.6; max-width: 46em; margin: 2em auto; padding: 0 1em; color: #222; }
+h1 { text-align: center; color: #1A2642; }
+p.author { text-align: center; font-style: italic; color: #555; }
+h2 { color: #1F1F32; border-bottom: 1px solid #1F1F32; padding-bottom: 0.2em; }
+h3, h4, h5, h6 { color: #20314e; }
+pre { background: #F2F4F7; padding: 0.6em; overflow-x: auto; font-size: 0.85em; }
+code { font-family: Menlo, Consolas, monospace; }
+blockquote { font-style: italic; color: #555; margin-left: 1.5em; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #B0B8C4; padding: 0.3em 0.6em; text-align: left; vertical-align: top; }
+th { background: #E0E5EC; }
+section { page-break-before: always; }
+"""
+
+
+def _is_wellformed(html):
+    try:
+        ElementTree.fromstring(f"<div>{html}</div>")
+        return True
+    except ElementTree.ParseError:
+        return False
+
+
+def _html_inline(text):
+    html = markdown_inline(text, True)
+    return html if _is_wellformed(html) else _xml_escape(markdown_plain(text))
+
+
+def _markdown_html_list(items):
+    html, tag = [], None
+    for ordered, text, children in _list_entries(items):
+        if tag != ("ol" if ordered else "ul"):
+            if tag:
+                html.append(f"</{tag}>")
+            tag = "ol" if ordered else "ul"
+            html.append(f"<{tag}>")
+        html.append(f"<li>{_html_inline(text)}{_markdown_html_list(children) if children else ''}</li>")
+    html.append(f"</{tag}>")
+    return "".join(html)
+
+
+def markdown_html(text):
+    html, previous = [], None
+    for block in parse_markdown_blocks(text):
+        kind = block[0]
+        if kind == "heading":
+            html.append(f"<h{block[1]}>{_html_inline(block[2])}</h{block[1]}>")
+        elif kind == "para":
+            joined = _join_markdown_lines(block[1])
+            author = previous and previous[:2] == ("heading", 1) and joined.startswith("*By ")
+            paragraph = _html_inline(joined).replace("\n", "<br/>")
+            html.append(f'<p class="author">{paragraph}</p>' if author else f"<p>{paragraph}</p>")
+        elif kind == "list":
+            html.append(_markdown_html_list(block[1]))
+        elif kind == "quote":
+            html.append(f"<blockquote><p>{_html_inline(_join_markdown_lines(block[1]))}</p></blockquote>")
+        elif kind == "code":
+            html.append(f"<pre><code>{_xml_escape(block[1])}</code></pre>")
+        elif kind == "table":
+            columns = max(len(row) for row in block[1])
+            rows = [row + [""] * (columns - len(row)) for row in block[1]]
+            head = "".join(f"<th>{_html_inline(cell)}</th>" for cell in rows[0])
+            body = "".join("<tr>" + "".join(f"<td>{_html_inline(cell)}</td>" for cell in row) + "</tr>" for row in rows[1:])
+            html.append(f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>")
+        elif kind == "rule":
+            html.append("<hr/>")
+        previous = block
+    return "\n".join(html)
+
+
+def split_book_chapters(text):
+    chapters, lines, title, fenced = [], [], "Title Page", False
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if MD_FENCE.match(line):
+            fenced = not fenced
+        heading = None if fenced else MD_HEADING.match(line.strip())
+        if heading and len(heading.group(1)) == 2:
+            if "".join(lines).strip():
+                chapters.append((title, "\n".join(lines)))
+            lines, title = [], markdown_plain(heading.group(2))
+        lines.append(line)
+    if "".join(lines).strip():
+        chapters.append((title, "\n".join(lines)))
+    return chapters
+
+
+BOOK_HTML_VERSION = 2
+
+
+class BookExportCache:
+    def __init__(self, title, root=BOOKS_DIR):
+        self.path = os.path.join(root, book_slug(title), "export")
+
+    def render(self, chapters):
+        os.makedirs(self.path, exist_ok=True)
+        fragments, digests, rebuilt = [], set(), 0
+        for title, text in chapters:
+            digest = hashlib.sha1(f"{BOOK_HTML_VERSION}\0{text}".encode("utf-8")).hexdigest()
+            digests.add(digest)
+            cached = os.path.join(self.path, f"{digest}.xhtml")
+            try:
+                with open(cached, "r", encoding="utf-8") as f:
+                    fragments.append(f.read())
+                continue
+            except OSError:
+                pass
+            fragment = markdown_html(text)
+            if not _is_wellformed(fragment):
+                raise ValueError(f"Chapter '{title}' did not render to well-formed XHTML")
+            with open(cached + ".tmp", "w", encoding="utf-8") as f:
+                f.write(fragment)
+            os.replace(cached + ".tmp", cached)
+            fragments.append(fragment)
+            rebuilt += 1
+        for name in os.listdir(self.path):
+            if name.endswith(".xhtml") and name[:-6] not in digests:
+                os.remove(os.path.join(self.path, name))
+        return fragments, rebuilt
+
+
+def _write_text_atomic(path, text):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def write_book_html(path, title, chapters, fragments):
+    nav = "".join(f'<li><a href="#chapter-{i + 1}">{_xml_escape(name)}</a></li>' for i, (name, _) in enumerate(chapters))
+    body = "".join(f'<section id="chapter-{i + 1}">\n{fragment}\n</section>\n' for i, fragment in enumerate(fragments))
+    _write_text_atomic(path, f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8"/>
+<title>{_xml_escape(title)}</title>
+<style>{BOOK_CSS}</style>
+</head>
+<body>
+<nav><h2>Contents</h2><ol>{nav}</ol></nav>
+{body}</body>
+</html>
+""")
+
+
+def _epub_page(title, body):
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="en" xml:lang="en">
+<head>
+<title>{_xml_escape(title)}</title>
+<link rel="stylesheet" type="text/css" href="style.css"/>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def write_book_epub(path, title, author, chapters, fragments):
+    identifier = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, 'sarkargpt-book:' + book_slug(title))}"
+    files = [f"chapter-{i + 1:03d}.xhtml" for i in range(len(chapters))]
+    manifest = "\n".join(f'<item id="c{i + 1}" href="{name}" media-type="application/xhtml+xml"/>' for i, name in enumerate(files))
+    spine = "\n".join(f'<itemref idref="c{i + 1}"/>' for i in range(len(files)))
+    nav = "".join(f'<li><a href="{name}">{_xml_escape(chapter[0])}</a></li>' for name, chapter in zip(files, chapters))
+    opf = f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">{identifier}</dc:identifier>
+<dc:title>{_xml_escape(title)}</dc:title>
+<dc:creator>{_xml_escape(author)}</dc:creator>
+<dc:language>en</dc:language>
+<meta property="dcterms:modified">{datetime.utcnow():%Y-%m-%dT%H:%M:%SZ}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="css" href="style.css" media-type="text/css"/>
+{manifest}
+</manifest>
+<spine>
+{spine}
+</spine>
+</package>
+"""
+    container = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+"""
+    with zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/container.xml", container)
+        zf.writestr("OEBPS/content.opf", opf)
+        zf.writestr("OEBPS/style.css", BOOK_CSS)
+        zf.writestr("OEBPS/nav.xhtml", _epub_page("Contents", f'<nav epub:type="toc" id="toc"><h2>Contents</h2><ol>{nav}</ol></nav>'))
+        for name, chapter, fragment in zip(files, chapters, fragments):
+            zf.writestr(f"OEBPS/{name}", _epub_page(chapter[0], fragment))
+    os.replace(path + ".tmp", path)
+
+
+def export_book(path, fmt, title, author, text):
+    t0 = time.perf_counter()
+    chapters = split_book_chapters(text)
+    fragments, rebuilt = BookExportCache(title).render(chapters)
+    if fmt == "epub":
+        write_book_epub(path, title, author, chapters, fragments)
+    else:
+        write_book_html(path, title, chapters, fragments)
+    return {"path": path, "chapters": len(chapters), "rebuilt": rebuilt, "elapsed": time.perf_counter() - t0}
+
+
+TRANSLATE_CHUNK_CHARS = 4500
+TRANSLATE_WORKERS = 4
+TRANSLATE_ATTEMPTS = 3
+TEXT_PARAGRAPH = re.compile(r"(\n\s*\n)")
+TEXT_SENTENCE = re.compile(r"(?<=[.!?;:\u0964\u3002\uff01\uff1f])(\s+)")
+TEXT_WORD = re.compile(r"(\s+)")
+
+
+def _split_units(text, pattern):
+    parts = pattern.split(text)
+    return [(parts[i], parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+
+def _fit_unit(unit, limit, patterns=(TEXT_SENTENCE, TEXT_WORD)):
+    text, sep = unit
+    if len(text) <= limit:
+        return [unit]
+    if not patterns:
+        return [(text[i:i + limit], sep if i + limit >= len(text) else "") for i in range(0, len(text), limit)]
+    units = _split_units(text, patterns[0])
+    units[-1] = (units[-1][0], sep)
+    if len(units) == 1:
+        return _fit_unit(unit, limit, patterns[1:])
+    fitted = []
+    for sub in units:
+        fitted.extend(_fit_unit(sub, limit, patterns[1:]))
+    return fitted
+
+
+def split_translation_chunks(text, limit=TRANSLATE_CHUNK_CHARS):
+    chunks, current, size = [], [], 0
+    for paragraph in _split_units(text, TEXT_PARAGRAPH):
+        for unit in _fit_unit(paragraph, limit):
+            if current and size + len(unit[0]) > limit:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(unit)
+            size += len(unit[0]) + len(unit[1])
+    if current:
+        chunks.append(current)
+    return [("".join(u + sep for u, sep in chunk[:-1]) + chunk[-1][0], chunk[-1][1]) for chunk in chunks]
+
+
+def translate_chunk(text, src, dest, attempts=TRANSLATE_ATTEMPTS):
+    if not text.strip():
+        return text
+    for attempt in range(attempts):
+        try:
+            return GoogleTranslator(source=src, target=dest).translate(text) or ""
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def translate_document(text, src, dest, workers=TRANSLATE_WORKERS, progress=None):
+    chunks = split_translation_chunks(text)
+    results, emitted = [None] * len(chunks), 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = {pool.submit(translate_chunk, chunk, src, dest): i for i, (chunk, _) in enumerate(chunks)}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    raise Exception(f"chunk {index + 1} of {len(chunks)} failed: {e}") from e
+                ready = []
+                while emitted < len(chunks) and results[emitted] is not None:
+                    ready.append(results[emitted] + chunks[emitted][1])
+                    emitted += 1
+                if progress:
+                    progress(done, len(chunks), "".join(ready))
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    return "".join(result + sep for result, (_, sep) in zip(results, chunks))
+
+
+BOOK_MAX_WORKERS = 8
+BOOK_PENDING_TEXT = "*Waiting to be written...*"
+BOOK_STREAM_INTERVAL = 0.05
+
+
+def _book_spec(data):
+    spec = f"""
+            SPECIFICATIONS:
+            - Book Title: {data['title']}
+            - Author: {data['author']}
+            - Difficulty Level: {data['difficulty']}
+            - Writing Style: {data['style']}
+            """
+    if data['custom_instructions']:
+        spec += f"- Custom Instructions: {data['custom_instructions']}\n"
+    return spec
+
+
+def book_outline_prompt(data):
+    prompt = f"""
+            You are a professional author planning a book. Reply with a JSON object with a single field "chapters":
+            a list of objects with the string fields "title" and "summary". Each summary is two or three sentences on
+            what the chapter covers, so that every chapter can be written on its own without overlapping the others.
+
+            *** IMPORTANT: The entire book must be written in English. ***
+            {_book_spec(data)}
+            """
+    if data['chapters']:
+        prompt += "Use exactly these chapters, in this order and with these titles:\n"
+        prompt += "\n".join(f"- Chapter {i + 1}: {title}" for i, title in enumerate(data['chapters'])) + "\n"
+    else:
+        prompt += "No chapters were provided. Propose 3-8 relevant chapters based on the title.\n"
+    for field, label in (("preface", "preface"), ("intro", "introduction"), ("conclusion", "conclusion")):
+        if data[field]:
+            prompt += f"The author's notes for the {label}: \"{data[field]}\"\n"
+    return prompt
+
+
+def book_sections(data, outline):
+    sections = [{"key": "preface", "kind": "preface", "title": "Preface", "brief": data['preface']},
+                {"key": "intro", "kind": "intro", "title": "Introduction", "brief": data['intro']}]
+    for i, chapter in enumerate(outline):
+        sections.append({"key": f"chapter-{i + 1}", "kind": "chapter", "title": f"Chapter {i + 1}: {chapter['title']}",
+                         "brief": chapter['summary']})
+    sections.append({"key": "conclusion", "kind": "conclusion", "title": "Conclusion", "brief": data['conclusion']})
+    return sections
+
+
+def book_section_prompt(data, outline, section):
+    contents = "\n".join(f"            - Chapter {i + 1}: {chapter['title']} - {chapter['summary']}" for i, chapter in enumerate(outline))
+    prompt = f"""
+            You are a professional author writing one section of a book. Other sections are being written separately,
+            so write only the section requested below.
+
+            *** IMPORTANT: The entire book must be written in English. ***
+            {_book_spec(data)}
+            TABLE OF CONTENTS:
+{contents}
+
+            SECTION TO WRITE: {section['title']}
+            """
+    if section['kind'] == "chapter":
+        prompt += f"Chapter summary: {section['brief']}\nWrite the full content for this chapter.\n"
+    elif section['brief']:
+        prompt += f"The author provided this text; use it as a base: \"{section['brief']}\"\n"
+    else:
+        prompt += {"preface": "Write a compelling preface for this book.",
+                   "intro": "Write a detailed introduction for this book, outlining its purpose and scope.",
+                   "conclusion": "Write a strong concluding chapter, summarizing the key takeaways and looking to the future."}[section['kind']] + "\n"
+    prompt += """
+            INSTRUCTIONS:
+            - Respond in Markdown. Do not repeat the section heading; use '###' for sub-sections.
+            - Ensure the tone matches the requested difficulty, style, and custom instructions.
+            - Refer to other chapters only for brief transitions.
+            """
+    return prompt
+
+
+def clean_book_section(text):
+    lines = text.strip().splitlines()
+    if lines and lines[0].startswith("```"):
+        lines = lines[1:-1] if lines[-1].startswith("```") else lines[1:]
+    if lines and lines[0].lstrip().startswith("#") and not lines[0].lstrip().startswith("###"):
+        lines = lines[1:]
+    cleaned = []
+    for line in lines:
+        if line.startswith("# ") or line.startswith("## "):
+            line = "### " + line.lstrip("#").lstrip()
+        cleaned.append(line)
+    return "\n".join(cleaned).strip()
+
+
+def book_slug(title):
+    slug = "".join(ch.lower() if ch.isalnum() else "-" for ch in title)
+    return "-".join(part for part in slug.split("-") if part) or "untitled"
+
+
+class BookProject:
+    def __init__(self, title, root=BOOKS_DIR):
+        self.path = os.path.join(root, book_slug(title))
+        self._lock = threading.Lock()
+        self.manifest = load_json(os.path.join(self.path, "manifest.json"), {})
+
+    @property
+    def data(self):
+        return self.manifest.get("data")
+
+    @property
+    def outline(self):
+        return self.manifest.get("outline")
+
+    @property
+    def sections(self):
+        return self.manifest.get("sections", [])
+
+    def _section_path(self, key):
+        return os.path.join(self.path, f"{key}.md")
+
+    def _write(self, path, text):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def _write_manifest(self):
+        self._write(os.path.join(self.path, "manifest.json"), json.dumps(self.manifest, indent=2, ensure_ascii=False))
+
+    def reset(self):
+        with self._lock:
+            if os.path.isdir(self.path):
+                for name in os.listdir(self.path):
+                    if name.endswith((".md", ".tmp")) or name == "manifest.json":
+                        os.remove(os.path.join(self.path, name))
+            self.manifest = {}
+
+    def start(self, data, outline, sections):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            self.manifest = {"data": data, "outline": outline, "sections": [dict(section, state="queued") for section in sections]}
+            self._write_manifest()
+
+    def section_text(self, key):
+        try:
+            with open(self._section_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def written(self):
+        return sum(os.path.exists(self._section_path(section["key"])) for section in self.sections)
+
+    def _set_state(self, key, state, error=None):
+        for section in self.manifest.get("sections", []):
+            if section["key"] == key:
+                section["state"] = state
+                section["error"] = error
+        self._write_manifest()
+
+    def save_section(self, key, text):
+        with self._lock:
+            self._write(self._section_path(key), text)
+            self._set_state(key, "done")
+
+    def mark_failed(self, key, error):
+        with self._lock:
+            self._set_state(key, "error", error)
+
+
+def book_skeleton(data, sections):
+    parts = [f"# {data['title']}", f"*By {data['author']}*"]
+    for section in sections:
+        parts += [f"## {section['title']}", BOOK_PENDING_TEXT]
+    return "\n\n".join(parts) + "\n"
+
+
+BACKTEST_STRATEGIES = {
+    "MA Crossover": {
+        "params": [("Fast MA", 20, 2, 400, 5, 104, 1), ("Slow MA", 50, 5, 800, 20, 416, 4)],
+        "valid": lambda combos: combos[:, 0] < combos[:, 1],
+    },
+    "RSI Threshold": {
+        "params": [("RSI Period", 14, 2, 100, 14, 14, 1), ("Buy Below", 30, 1, 99, 10, 40, 1), ("Sell Above", 70, 1, 99, 60, 90, 1)],
+        "valid": lambda combos: combos[:, 1] < combos[:, 2],
+    },
+}
+BACKTEST_CHUNK = 500
+SCREENER_CHUNK = 50
+SCREENER_COLUMNS = ["Ticker", "Close", "Change %", "Rank", "Bars"]
+BACKTEST_STAT_COLUMNS = ["Total Return %", "CAGR %", "Sharpe", "Max Drawdown %", "Trades", "Win Rate %", "Exposure %"]
+
+
+def _sma_matrix(close, windows):
+    csum = np.concatenate([[0.0], np.cumsum(close)])
+    out = np.full((len(close), len(windows)), np.nan)
+    for j, w in enumerate(windows):
+        if 0 < w <= len(close):
+            out[w - 1:, j] = (csum[w:] - csum[:-w]) / w
+    return out
+
+
+def strategy_positions(close, strategy, combos):
+    combos = np.asarray(combos, dtype=float).reshape(len(combos), -1)
+    if strategy == "MA Crossover":
+        windows, inverse = np.unique(combos[:, :2].astype(np.int64), return_inverse=True)
+        inverse = inverse.reshape(-1, 2)
+        sma = _sma_matrix(close, windows)
+        return (sma[:, inverse[:, 0]] > sma[:, inverse[:, 1]]).astype(np.float64)
+    if strategy == "RSI Threshold":
+        periods, inverse = np.unique(combos[:, 0].astype(np.int64), return_inverse=True)
+        frame = pd.DataFrame({"Close": close})
+        rsi = np.column_stack([indicator_rsi(frame, period=int(n)).iloc[:, 0].to_numpy() for n in periods])[:, inverse.ravel()]
+        signal = np.where(rsi < combos[:, 1], 1.0, np.where(rsi > combos[:, 2], 0.0, np.nan))
+        return pd.DataFrame(signal).ffill().fillna(0.0).to_numpy()
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def backtest_stats(close, positions, cost=0.0, periods_per_year=252, with_series=False):
+    close = np.asarray(close, dtype=float)
+    positions = np.asarray(positions, dtype=float).reshape(len(close), -1)
+    n, k = positions.shape
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    held = np.zeros_like(positions)
+    held[1:] = positions[:-1]
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    strat = held * returns[:, None] - turnover * cost
+    cum = np.cumsum(np.log1p(strat), axis=0)
+    equity = np.exp(cum)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=0), 1.0)
+    drawdown = equity / peak - 1.0
+
+    std = strat.std(axis=0, ddof=1) if n > 1 else np.zeros(k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, strat.mean(axis=0) / std * np.sqrt(periods_per_year), 0.0)
+    years = max(n / periods_per_year, 1e-9)
+
+    prev_held = np.vstack([np.zeros((1, k)), held[:-1]])
+    next_held = np.vstack([held[1:], np.zeros((1, k))])
+    entry_col, entry_t = np.nonzero(((held > 0) & (prev_held == 0)).T)
+    exit_col, exit_t = np.nonzero(((held > 0) & (next_held == 0)).T)
+    cum_before = np.vstack([np.zeros((1, k)), cum[:-1]])
+    trade_returns = np.exp(cum[exit_t, exit_col] - cum_before[entry_t, entry_col]) - 1.0
+    trades = np.bincount(entry_col, minlength=k)
+    wins = np.bincount(entry_col, weights=(trade_returns > 0).astype(float), minlength=k)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = {
+            "Total Return %": (equity[-1] - 1.0) * 100,
+            "CAGR %": (equity[-1] ** (1.0 / years) - 1.0) * 100,
+            "Sharpe": sharpe,
+            "Max Drawdown %": drawdown.min(axis=0) * 100,
+            "Trades": trades.astype(float),
+            "Win Rate %": np.where(trades > 0, wins / np.maximum(trades, 1) * 100, np.nan),
+            "Exposure %": held.mean(axis=0) * 100,
+        }
+    if with_series:
+        stats["equity"] = equity
+        stats["drawdown"] = drawdown
+        stats["trade_returns"] = trade_returns
+    return stats
+
+
+def backtest_sweep_chunk(close, strategy, combos, cost=0.0, periods_per_year=252):
+    positions = strategy_positions(close, strategy, combos)
+    return backtest_stats(close, positions, cost, periods_per_year)
+
+
+def backtest_sweep(close, strategy, combos, cost=0.0, periods_per_year=252, pool=None):
+    close = np.asarray(close, dtype=float)
+    combos = np.asarray(combos, dtype=float)
+    chunks = [combos[i:i + BACKTEST_CHUNK] for i in range(0, len(combos), BACKTEST_CHUNK)]
+    if pool is not None and len(chunks) > 1:
+        futures = {pool.submit(backtest_sweep_chunk, close, strategy, chunk, cost, periods_per_year): i
+                   for i, chunk in enumerate(chunks)}
+        results = [None] * len(chunks)
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    else:
+        results = [backtest_sweep_chunk(close, strategy, chunk, cost, periods_per_year) for chunk in chunks]
+    names = [p[0] for p in BACKTEST_STRATEGIES[strategy]["params"]]
+    table = pd.DataFrame(combos, columns=names)
+    for col in BACKTEST_STAT_COLUMNS:
+        table[col] = np.concatenate([r[col] for r in results]) if results else []
+    return table
+
+
+SCREEN_FUNCTIONS = ["sma", "ema", "rsi", "atr", "vwap", "volatility", "macd", "macd_signal", "bb_upper", "bb_lower",
+                    "change", "highest", "lowest", "prev", "cross_above", "cross_below", "abs", "min", "max"]
+SCREEN_SERIES = ["close", "open", "high", "low", "volume"]
+_SCREEN_NODES = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+                 ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.Compare, ast.Gt, ast.GtE,
+                 ast.Lt, ast.LtE, ast.Eq, ast.NotEq, ast.Call, ast.Name, ast.Constant, ast.Load, ast.keyword)
+_compiled_screens = {}
+
+
+class _ScreenTransformer(ast.NodeTransformer):
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        fn = "_all" if isinstance(node.op, ast.And) else "_any"
+        return ast.Call(func=ast.Name(id=fn, ctx=ast.Load()), args=node.values, keywords=[])
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.Call(func=ast.Name(id="_not", ctx=ast.Load()), args=[node.operand], keywords=[])
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        operands = [node.left] + node.comparators
+        pairs = [ast.Compare(left=a, ops=[op], comparators=[b]) for a, op, b in zip(operands, node.ops, operands[1:])]
+        return ast.Call(func=ast.Name(id="_all", ctx=ast.Load()), args=pairs, keywords=[])
+
+
+def compile_screen_expression(expression):
+    code = _compiled_screens.get(expression)
+    if code is not None:
+        return code
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _SCREEN_NODES):
+            raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in SCREEN_FUNCTIONS and node.id not in SCREEN_SERIES:
+            raise ValueError(f"Unknown name '{node.id}'. Use: {', '.join(SCREEN_SERIES + SCREEN_FUNCTIONS)}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in SCREEN_FUNCTIONS):
+            raise ValueError("Only the built-in screener functions can be called.")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError("Only numeric constants are allowed.")
+    tree = ast.fix_missing_locations(_ScreenTransformer().visit(tree))
+    code = compile(tree, "<screen>", "eval")
+    _compiled_screens[expression] = code
+    return code
+
+
+def _screen_namespace(data):
+    close = data["Close"]
+
+    def _all(*args):
+        result = args[0]
+        for arg in args[1:]:
+            result = result & arg
+        return result
+
+    def _any(*args):
+        result = args[0]
+        for arg in args[1:]:
+            result = result | arg
+        return result
+
+    def _not(value):
+        return ~value if isinstance(value, pd.Series) else not value
+
+    def _shift(value, n):
+        return value.shift(n) if isinstance(value, pd.Series) else value
+
+    return {
+        "__builtins__": {},
+        "close": close, "open": data["Open"], "high": data["High"], "low": data["Low"], "volume": data["Volume"],
+        "sma": lambda n=20, series=close: series.rolling(int(n)).mean(),
+        "ema": lambda n=20, series=close: series.ewm(span=int(n), adjust=False).mean(),
+        "rsi": lambda n=14: indicator_rsi(data, period=int(n)).iloc[:, 0],
+        "atr": lambda n=14: indicator_atr(data, period=int(n)).iloc[:, 0],
+        "vwap": lambda: indicator_vwap(data)["VWAP"],
+        "volatility": lambda n=20: indicator_volatility(data, period=int(n)).iloc[:, 0],
+        "macd": lambda fast=12, slow=26, signal=9: indicator_macd(data, int(fast), int(slow), int(signal))["MACD"],
+        "macd_signal": lambda fast=12, slow=26, signal=9: indicator_macd(data, int(fast), int(slow), int(signal))["MACD Signal"],
+        "bb_upper": lambda n=20, k=2.0: indicator_bollinger(data, int(n), k)["BB Upper"],
+        "bb_lower": lambda n=20, k=2.0: indicator_bollinger(data, int(n), k)["BB Lower"],
+        "change": lambda n=1: close.pct_change(int(n)) * 100,
+        "highest": lambda series=close, n=20: series.rolling(int(n)).max(),
+        "lowest": lambda series=close, n=20: series.rolling(int(n)).min(),
+        "prev": lambda series=close, n=1: _shift(series, int(n)),
+        "cross_above": lambda a, b: (a > b) & (_shift(a, 1) <= _shift(b, 1)),
+        "cross_below": lambda a, b: (a < b) & (_shift(a, 1) >= _shift(b, 1)),
+        "abs": abs, "min": min, "max": max,
+        "_all": _all, "_any": _any, "_not": _not,
+    }
+
+
+def _screen_last(value):
+    if isinstance(value, pd.Series):
+        value = value.iloc[-1] if len(value) else np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def screen_chunk(frames, expression, rank_expression=""):
+    t0 = time.perf_counter()
+    code = compile_screen_expression(expression)
+    rank_code = compile_screen_expression(rank_expression) if rank_expression.strip() else None
+    rows = []
+    for ticker, data in frames.items():
+        if len(data) < 2:
+            continue
+        try:
+            namespace = _screen_namespace(data)
+            passed = _screen_last(eval(code, namespace))
+            if not (np.isfinite(passed) and passed):
+                continue
+            close = data["Close"].to_numpy(dtype=float)
+            rows.append({
+                "Ticker": ticker,
+                "Close": close[-1],
+                "Change %": (close[-1] / close[-2] - 1) * 100,
+                "Rank": _screen_last(eval(rank_code, namespace)) if rank_code is not None else np.nan,
+                "Bars": len(data),
+            })
+        except Exception as e:
+            print(f"Screen failed for {ticker}: {e}")
+    return rows, time.perf_counter() - t0
+
+
+def load_ticker_universe(path):
+    tickers = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader, [])
+            lowered = [h.strip().lower() for h in header]
+            column = next((lowered.index(name) for name in ("symbol", "ticker", "tickers", "symbols") if name in lowered), None)
+            if column is None:
+                column = 0
+                tickers.append(header[0] if header else "")
+            tickers.extend(row[column] for row in reader if len(row) > column)
+        else:
+            tickers = [line.split("#")[0] for line in f]
+    return parse_ticker_list(" ".join(tickers))
+
+
+def parse_ticker_list(text):
+    tokens = text.replace(",", " ").replace(";", " ").split()
+    return list(dict.fromkeys(t.strip().upper() for t in tokens if t.strip()))
+
+
+WATCHLIST_COLUMNS = ["Ticker", "Last", "Change", "Change %", "Volume", "Bar"]
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+
+def market_is_open(now=None):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+def seconds_until_market_open(now=None):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if market_is_open(now):
+        return 0.0
+    opening = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if (now.hour, now.minute) >= MARKET_OPEN:
+        opening += timedelta(days=1)
+    while opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return (opening - now).total_seconds()
+
+
+BUNDLED_SYMBOLS = """AAPL|Apple Inc.
+ABBV|AbbVie Inc.
+ABNB|Airbnb Inc.
+ABT|Abbott Laboratories
+ACN|Accenture plc
+ADBE|Adobe Inc.
+AMD|Advanced Micro Devices Inc.
+AMGN|Amgen Inc.
+AMT|American Tower Corporation
+AMZN|Amazon.com Inc.
+ARKK|ARK Innovation ETF
+AVGO|Broadcom Inc.
+AXP|American Express Company
+BA|The Boeing Company
+BABA|Alibaba Group Holding Limited
+BAC|Bank of America Corporation
+BKNG|Booking Holdings Inc.
+BLK|BlackRock Inc.
+BMY|Bristol-Myers Squibb Company
+BRK-B|Berkshire Hathaway Inc. Class B
+C|Citigroup Inc.
+CAT|Caterpillar Inc.
+COIN|Coinbase Global Inc.
+COP|ConocoPhillips
+COST|Costco Wholesale Corporation
+CRM|Salesforce Inc.
+CSCO|Cisco Systems Inc.
+CVS|CVS Health Corporation
+CVX|Chevron Corporation
+DE|Deere & Company
+DIA|SPDR Dow Jones Industrial Average ETF Trust
+DIS|The Walt Disney Company
+EEM|iShares MSCI Emerging Markets ETF
+EFA|iShares MSCI EAFE ETF
+F|Ford Motor Company
+GE|General Electric Company
+GILD|Gilead Sciences Inc.
+GLD|SPDR Gold Shares
+GM|General Motors Company
+GOOG|Alphabet Inc. Class C
+GOOGL|Alphabet Inc. Class A
+GS|The Goldman Sachs Group Inc.
+HD|The Home Depot Inc.
+HDB|HDFC Bank Limited
+HON|Honeywell International Inc.
+HYG|iShares iBoxx High Yield Corporate Bond ETF
+IBM|International Business Machines Corporation
+INFY|Infosys Limited
+INTC|Intel Corporation
+INTU|Intuit Inc.
+IWM|iShares Russell 2000 ETF
+JNJ|Johnson & Johnson
+JPM|JPMorgan Chase & Co.
+KO|The Coca-Cola Company
+LIN|Linde plc
+LLY|Eli Lilly and Company
+LMT|Lockheed Martin Corporation
+LOW|Lowe's Companies Inc.
+MA|Mastercard Incorporated
+MCD|McDonald's Corporation
+MDT|Medtronic plc
+META|Meta Platforms Inc.
+MMM|3M Company
+MO|Altria Group Inc.
+MRK|Merck & Co. Inc.
+MS|Morgan Stanley
+MSFT|Microsoft Corporation
+MU|Micron Technology Inc.
+NEE|NextEra Energy Inc.
+NFLX|Netflix Inc.
+NKE|Nike Inc.
+NVDA|NVIDIA Corporation
+ORCL|Oracle Corporation
+PEP|PepsiCo Inc.
+PFE|Pfizer Inc.
+PG|The Procter & Gamble Company
+PLTR|Palantir Technologies Inc.
+PM|Philip Morris International Inc.
+PYPL|PayPal Holdings Inc.
+QCOM|Qualcomm Incorporated
+QQQ|Invesco QQQ Trust
+RTX|RTX Corporation
+SBUX|Starbucks Corporation
+SCHW|The Charles Schwab Corporation
+SHOP|Shopify Inc.
+SLV|iShares Silver Trust
+SNOW|Snowflake Inc.
+SPY|SPDR S&P 500 ETF Trust
+T|AT&T Inc.
+TGT|Target Corporation
+TLT|iShares 20+ Year Treasury Bond ETF
+TMO|Thermo Fisher Scientific Inc.
+TSLA|Tesla Inc.
+TSM|Taiwan Semiconductor Manufacturing Company Limited
+TXN|Texas Instruments Incorporated
+UBER|Uber Technologies Inc.
+UNH|UnitedHealth Group Incorporated
+UNP|Union Pacific Corporation
+UPS|United Parcel Service Inc.
+USO|United States Oil Fund LP
+V|Visa Inc.
+VOO|Vanguard S&P 500 ETF
+VTI|Vanguard Total Stock Market ETF
+VZ|Verizon Communications Inc.
+WFC|Wells Fargo & Company
+WIT|Wipro Limited
+WMT|Walmart Inc.
+XLE|Energy Select Sector SPDR Fund
+XLF|Financial Select Sector SPDR Fund
+XLK|Technology Select Sector SPDR Fund
+XOM|Exxon Mobil Corporation
+^DJI|Dow Jones Industrial Average
+^GSPC|S&P 500 Index
+^IXIC|NASDAQ Composite Index
+^NSEI|NIFTY 50 Index
+^BSESN|S&P BSE SENSEX Index
+RELIANCE.NS|Reliance Industries Limited
+TCS.NS|Tata Consultancy Services Limited
+HDFCBANK.NS|HDFC Bank Limited
+INFY.NS|Infosys Limited
+ICICIBANK.NS|ICICI Bank Limited
+SBIN.NS|State Bank of India
+BTC-USD|Bitcoin USD
+ETH-USD|Ethereum USD"""
+
+
+def edit_distance(a, b, limit=2):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _deletes(word, distance):
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def load_symbol_file(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        reader = csv.reader(f, delimiter="|" if "|" in sample.splitlines()[0] else ",")
+        header = [h.strip().lower() for h in next(reader, [])]
+        sym_col = next((i for i, h in enumerate(header) if h in ("symbol", "ticker", "act symbol")), 0)
+        name_col = next((i for i, h in enumerate(header) if "name" in h), 1)
+        symbols = []
+        for row in reader:
+            if len(row) > max(sym_col, name_col) and row[sym_col].strip() and not row[sym_col].startswith("File Creation"):
+                symbols.append((row[sym_col].strip().upper(), row[name_col].strip()))
+        return symbols
+
+
+class SymbolIndex:
+    MAX_DISTANCE = 1
+
+    def __init__(self, symbols=()):
+        self._lock = threading.Lock()
+        self._names = {}
+        self._build(symbols)
+
+    def _build(self, symbols):
+        names = dict(self._names)
+        for symbol, name in symbols:
+            names.setdefault(symbol, name)
+        words = set()
+        for symbol, name in names.items():
+            for word in name.lower().replace(",", " ").replace(".", " ").split():
+                words.add((word, symbol))
+        deletes = {}
+        for symbol in names:
+            for variant in _deletes(symbol, self.MAX_DISTANCE):
+                deletes.setdefault(variant, []).append(symbol)
+        self._words = sorted(words)
+        self._word_keys = [w for w, _ in self._words]
+        self._deletes = deletes
+        self._symbols = sorted(names)
+        self._names = names
+
+    def add(self, symbols):
+        with self._lock:
+            new = [(s, n) for s, n in symbols if s not in self._names]
+            if new:
+                self._build(new)
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._names
+
+    def name(self, symbol):
+        return self._names.get(symbol.upper(), "")
+
+    def _prefix(self, keys, prefix):
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + "\uffff")
+        return lo, hi
+
+    def fuzzy(self, text, limit=5):
+        text = text.upper()
+        found = {}
+        for variant in _deletes(text, self.MAX_DISTANCE):
+            for symbol in self._deletes.get(variant, ()):
+                if symbol not in found:
+                    distance = edit_distance(text, symbol, self.MAX_DISTANCE + 1)
+                    if distance <= self.MAX_DISTANCE + 1:
+                        found[symbol] = distance
+        return sorted(found, key=lambda s: (found[s], len(s), s))[:limit]
+
+    def search(self, text, limit=10):
+        text = text.strip()
+        if not text:
+            return []
+        upper = text.upper()
+        results = []
+        seen = set()
+
+        def add(symbol):
+            if symbol not in seen and len(results) < limit:
+                seen.add(symbol)
+                results.append(symbol)
+
+        if upper in self._names:
+            add(upper)
+        lo, hi = self._prefix(self._symbols, upper)
+        for symbol in sorted(self._symbols[lo:min(hi, lo + limit * 4)], key=len):
+            add(symbol)
+        lo, hi = self._prefix(self._word_keys, text.lower())
+        for i in range(lo, min(hi, lo + limit * 4)):
+            add(self._words[i][1])
+        if len(results) < limit:
+            for symbol in self.fuzzy(upper, limit):
+                add(symbol)
+        return [(symbol, self._names[symbol]) for symbol in results]
+
+
+def load_symbol_index():
+    symbols = [tuple(line.split("|", 1)) for line in BUNDLED_SYMBOLS.splitlines()]
+    if os.path.exists(SYMBOLS_FILE):
+        try:
+            symbols = load_symbol_file(SYMBOLS_FILE) + symbols
+        except Exception as e:
+            print(f"Could not load {SYMBOLS_FILE}: {e}")
+    return SymbolIndex(symbols)
+
+
+symbol_index = load_symbol_index()
+
+
+class WatchlistPoller:
+    def __init__(self, cache, interval=30, max_backoff=900, ignore_hours=False):
+        self.cache = cache
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.ignore_hours = ignore_hours
+        self.errors = 0
+        self._tickers = []
+        self._last_rows = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._force = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._once = False
+
+    def set_tickers(self, tickers):
+        with self._lock:
+            self._tickers = list(dict.fromkeys(t.upper() for t in tickers))
+            self._last_rows = {t: row for t, row in self._last_rows.items() if t in self._tickers}
+        self.poke()
+
+    def configure(self, interval=None, ignore_hours=None):
+        if interval is not None:
+            self.interval = max(5, interval)
+        if ignore_hours is not None:
+            self.ignore_hours = ignore_hours
+        self.poke()
+
+    def poke(self):
+        self._wake.set()
+
+    def poll_now(self):
+        self._force.set()
+        with self._lock:
+            live = self.running() and not self._stop.is_set()
+        if live:
+            self.poke()
+        else:
+            self.start(once=True)
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, once=False):
+        with self._lock:
+            self._once = once
+            if self.running() and not self._stop.is_set():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread = None
+
+    def _rows(self, frames):
+        rows = {}
+        for ticker, frame in frames.items():
+            if frame is None or frame.empty:
+                continue
+            last = frame.iloc[-1]
+            prev = frame["Close"].iloc[-2] if len(frame) > 1 else last["Open"]
+            change = float(last["Close"] - prev)
+            rows[ticker] = {"Ticker": ticker, "Last": float(last["Close"]), "Change": change,
+                            "Change %": change / prev * 100 if prev else float("nan"),
+                            "Volume": float(last["Volume"]), "Bar": str(frame.index[-1])}
+        return rows
+
+    def tick(self):
+        with self._lock:
+            tickers = list(self._tickers)
+        if not tickers:
+            return {"rows": [], "status": "idle", "polled": 0}
+        frames = self.cache.get_many(tickers, "5d", "1d", refresh=True)
+        if not frames:
+            raise Exception("No quotes returned")
+        rows = self._rows(frames)
+        with self._lock:
+            changed = [row for ticker, row in rows.items() if self._last_rows.get(ticker) != row]
+            self._last_rows.update(rows)
+        return {"rows": changed, "status": "live", "polled": len(tickers)}
+
+    def _run(self, stop):
+        while not stop.is_set():
+            self._wake.clear()
+            forced = self._force.is_set()
+            self._force.clear()
+            if not forced and not self.ignore_hours and not market_is_open():
+                wait = seconds_until_market_open()
+                signals.watchlist_tick.emit({"rows": [], "status": "closed", "polled": 0, "next": wait})
+                self._wake.wait(min(wait, 300))
+                continue
+            try:
+                payload = self.tick()
+                self.errors = 0
+                delay = self.interval
+            except Exception as e:
+                self.errors += 1
+                delay = min(self.interval * 2 ** self.errors, self.max_backoff)
+                payload = {"rows": [], "status": "error", "error": str(e), "polled": 0}
+            payload["next"] = delay
+            if stop.is_set():
+                break
+            signals.watchlist_tick.emit(payload)
+            with self._lock:
+                if self._once and not self._force.is_set():
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    break
+            self._wake.wait(delay)
+
+
+COMPARE_FETCH_WORKERS = 8
+
+
+def rebase_closes(frames, base=100.0):
+    closes = pd.concat({ticker: frame["Close"] for ticker, frame in frames.items()}, axis=1).sort_index().ffill()
+    values = closes.to_numpy(dtype=float)
+    first = np.argmax(np.isfinite(values), axis=0)
+    return closes.index, {ticker: values[:, i] / values[first[i], i] * base for i, ticker in enumerate(closes.columns)}
+
+
+PERIODS_PER_YEAR = {"1m": 252 * 390, "5m": 252 * 78, "15m": 252 * 26, "30m": 252 * 13, "1h": 252 * 7, "1d": 252}
+PORTFOLIO_COLUMNS = ["Ticker", "Weight %", "Vol %", "Beta", "Corr vs Bench", "Risk %"]
+
+
+def parse_holdings(text):
+    holdings = {}
+    for token in text.replace(";", "\n").replace(",", "\n").splitlines():
+        parts = token.replace(":", " ").replace("=", " ").split()
+        if not parts:
+            continue
+        weight = float(parts[1].rstrip("%")) if len(parts) > 1 else 1.0
+        holdings[parts[0].upper()] = holdings.get(parts[0].upper(), 0.0) + weight
+    return list(holdings.items())
+
+
+class PortfolioRisk:
+    def __init__(self, cache, holdings, benchmark="SPY", period="1y", interval="1d"):
+        self.cache = cache
+        self.tickers = [t for t, _ in holdings]
+        weights = np.array([w for _, w in holdings], dtype=float)
+        if not len(weights) or not weights.sum():
+            raise ValueError("Portfolio weights must not sum to zero")
+        self.weights = weights / weights.sum()
+        self.benchmark = benchmark.upper()
+        self.columns = self.tickers + [self.benchmark]
+        self.period = period
+        self.interval = interval
+        self.rebuilds = 0
+        self.appends = 0
+        self._versions = None
+        self._dates = None
+        self._origin = None
+        self._anchor = None
+        self._returns = None
+        self._sum = None
+        self._cross = None
+
+    def _snapshots(self):
+        frames, versions = [], []
+        for ticker in self.columns:
+            frame, version = self.cache.snapshot(ticker, self.interval)
+            if frame is None or frame.empty:
+                raise Exception(f"No cached prices for {ticker}")
+            frames.append(frame)
+            versions.append(version)
+        return frames, tuple(versions)
+
+    def _aligned(self, frames, since=None):
+        if since is not None:
+            frames = [f.iloc[f.index.searchsorted(since):] for f in frames]
+        index = frames[0].index
+        for frame in frames[1:]:
+            index = index.intersection(frame.index)
+        closes = np.column_stack([f["Close"].to_numpy(dtype=float)[f.index.get_indexer(index)] for f in frames])
+        return index, closes
+
+    def _rebuild(self, frames):
+        index, closes = self._aligned([slice_period(f, self.period) for f in frames])
+        if len(index) < 3:
+            raise Exception("Not enough overlapping history across holdings")
+        self._dates = index[1:]
+        self._origin = index[0]
+        self._anchor = index[-2]
+        self._returns = closes[1:] / closes[:-1] - 1.0
+        self._sum = self._returns.sum(axis=0)
+        self._cross = self._returns.T @ self._returns
+        self.rebuilds += 1
+
+    def _can_append(self, frames, versions):
+        last = self._dates[-1]
+        for ticker, frame, old, new in zip(self.columns, frames, self._versions, versions):
+            if old == new:
+                continue
+            pos = self.cache.changed_since(ticker, self.interval, old)
+            if pos is not None and (pos >= len(frame) or frame.index[pos] < last):
+                return False
+        return True
+
+    def _append(self, frames):
+        index, closes = self._aligned(frames, since=self._anchor)
+        if len(index) < 2 or index[0] != self._anchor or index[1] != self._dates[-1]:
+            return False
+        returns = closes[1:] / closes[:-1] - 1.0
+        replaced = self._returns[-1]
+        self._dates = self._dates[:-1].append(index[1:])
+        self._anchor = index[-2]
+        self._returns = np.vstack([self._returns[:-1], returns])
+        self._sum += returns.sum(axis=0) - replaced
+        self._cross += returns.T @ returns - np.outer(replaced, replaced)
+        self._trim()
+        self.appends += 1
+        return True
+
+    def _trim(self):
+        if self.period == "max":
+            return
+        start = period_start(self._dates[-1], self.period)
+        drop = int(self._origin < start) + int(np.searchsorted(self._dates[:-1], start))
+        if drop:
+            self._origin = self._dates[drop - 1]
+            old = self._returns[:drop]
+            self._sum -= old.sum(axis=0)
+            self._cross -= old.T @ old
+            self._returns = self._returns[drop:]
+            self._dates = self._dates[drop:]
+
+    def update(self):
+        frames, versions = self._snapshots()
+        if versions == self._versions:
+            return False
+        if self._returns is None or not self._can_append(frames, versions) or not self._append(frames):
+            self._rebuild(frames)
+        self._versions = versions
+        return True
+
+    def stats(self):
+        n = len(self._returns)
+        k = len(self.tickers)
+        mean = self._sum / n
+        cov = (self._cross - n * np.outer(mean, mean)) / (n - 1)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+            beta = cov[:k, k] / cov[k, k]
+            w = self.weights
+            marginal = cov[:k, :k] @ w
+            variance = float(w @ marginal)
+            contribution = w * marginal / variance
+            diversification = float(np.abs(w) @ std[:k] / np.sqrt(variance))
+        ann = np.sqrt(PERIODS_PER_YEAR.get(self.interval, 252))
+        pairs = corr[:k, :k][np.triu_indices(k, 1)]
+        rows = [{"Ticker": t, "Weight %": w[i] * 100, "Vol %": std[i] * ann * 100, "Beta": beta[i],
+                 "Corr vs Bench": corr[i, k], "Risk %": contribution[i] * 100} for i, t in enumerate(self.tickers)]
+        return {"rows": rows, "labels": list(self.tickers), "corr": corr[:k, :k],
+                "summary": {"bars": n, "start": self._dates[0], "end": self._dates[-1],
+                            "volatility": np.sqrt(variance) * ann * 100, "beta": float(w @ beta),
+                            "benchmark_vol": std[k] * ann * 100, "avg_corr": float(np.nanmean(pairs)) if len(pairs) else float("nan"),
+                            "diversification": diversification}}
+
+
+def backtest_grid(strategy, ranges):
+    axes = [np.arange(lo, hi + step * 0.5, step) if step > 0 and hi > lo else np.array([lo]) for lo, hi, step in ranges]
+    combos = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    return combos[BACKTEST_STRATEGIES[strategy]["valid"](combos)]
+
+
+def bar_grid(start, end, buckets, total):
+    start = max(0, int(start))
+    end = min(total, int(end))
+    count = end - start
+    if count <= buckets:
+        return start, max(start, end), 1
+    width = -(-count // buckets)
+    return start - start % width, min(total, -(-end // width) * width), width
+
+
+def downsample_ohlcv(o, h, l, c, v, start, end, buckets):
+    first, stop, width = bar_grid(start, end, buckets, len(c))
+    if stop <= first:
+        empty = np.empty(0)
+        return empty, empty, empty, empty, empty, empty
+    if width == 1:
+        x = np.arange(first, stop, dtype=float)
+        return x, o[first:stop], h[first:stop], l[first:stop], c[first:stop], v[first:stop]
+    firsts = np.arange(first, stop, width)
+    lasts = np.minimum(firsts + width, stop) - 1
+    offsets = firsts - first
+    x = (firsts + lasts) / 2.0
+    return (x, o[firsts],
+            np.maximum.reduceat(h[first:stop], offsets),
+            np.minimum.reduceat(l[first:stop], offsets),
+            c[lasts],
+            np.add.reduceat(v[first:stop], offsets))
+
+
+def downsample_line(values, buckets):
+    n = len(values)
+    if n <= buckets * 2:
+        return np.arange(n, dtype=float), values
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    firsts = edges[:-1]
+    centres = (firsts + edges[1:] - 1) / 2.0
+    lows = np.fmin.reduceat(values, firsts)
+    highs = np.fmax.reduceat(values, firsts)
+    return np.repeat(centres, 2), np.column_stack([lows, highs]).ravel()
+
+
+def nice_ticks(lo, hi, count=5):
+    span = hi - lo
+    if span <= 0 or not np.isfinite(span):
+        return [lo]
+    raw = span / max(1, count)
+    mag = 10 ** np.floor(np.log10(raw))
+    step = mag * min((m for m in (1, 2, 2.5, 5, 10) if m * mag >= raw), default=10)
+    first = np.ceil(lo / step) * step
+    return list(np.arange(first, hi + step * 0.5, step))
+
+
+OVERLAY_COLORS = ["#F39C12", "#8E44AD", "#16A085", "#2980B9", "#D35400", "#C0392B", "#7F8C8D", "#27AE60"]
+
+
+class CandlestickChart(QWidget):
+    MIN_VISIBLE_BARS = 10
+    PX_PER_BAR = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setMinimumHeight(300)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self._dates = None
+        self._o = self._h = self._l = self._c = self._v = np.empty(0)
+        self._title = ""
+        self._message = "Search for a stock to see its graph."
+        self._view = (0.0, 0.0)
+        self._drag_origin = None
+        self._mouse = None
+        self._lod = None
+        self._overlays = []
+        self._colors = {
+            "bg": QColor("#FFFFFF"), "text": QColor("#223344"), "grid": QColor(0, 0, 0, 30),
+            "up": QColor("#2ECC71"), "down": QColor("#E74C3C"), "cross": QColor("#888888"),
+        }
+
+    def set_theme(self, theme):
+        bg = theme.get("card_bg", "#ffffff")
+        self._colors["bg"] = QColor(bg if bg.startswith("#") else "#2a2a3e")
+        self._colors["text"] = QColor(theme.get("text", "#222222"))
+        grid = QColor(self._colors["text"]); grid.setAlpha(35)
+        self._colors["grid"] = grid
+        self._colors["up"] = QColor(theme.get("accent", "#2ECC71"))
+        cross = QColor(self._colors["text"]); cross.setAlpha(140)
+        self._colors["cross"] = cross
+        self.update()
+
+    def set_message(self, text):
+        self._message = text
+        self._c = np.empty(0)
+        self._lod = None
+        self.update()
+
+    def set_data(self, data, title=""):
+        self._dates = data.index
+        self._o = data["Open"].to_numpy(dtype=float)
+        self._h = data["High"].to_numpy(dtype=float)
+        self._l = data["Low"].to_numpy(dtype=float)
+        self._c = data["Close"].to_numpy(dtype=float)
+        self._v = data["Volume"].to_numpy(dtype=float) if "Volume" in data.columns else np.zeros(len(data))
+        self._title = title
+        self._message = ""
+        self._lod = None
+        self._overlays = []
+        self.reset_view()
+
+    def set_overlays(self, overlays):
+        self._overlays = [ov for ov in overlays if len(ov["values"]) == len(self._c)]
+        self.update()
+
+    def has_data(self):
+        return len(self._c) > 0
+
+    def reset_view(self):
+        self._view = (0.0, float(len(self._c)))
+        self._lod = None
+        self.update()
+
+    def _set_view(self, start, end):
+        n = len(self._c)
+        span = min(max(end - start, min(self.MIN_VISIBLE_BARS, n)), n)
+        start = min(max(0.0, start), n - span)
+        self._view = (start, start + span)
+        self.update()
+
+    def _plot_rect(self):
+        return QRectF(8, 28, max(1, self.width() - 78), max(1, self.height() - 52))
+
+    def _visible_bars(self, plot_width):
+        start, end = self._view
+        lo, hi = int(np.floor(start)), int(np.ceil(end))
+        buckets = max(1, int(plot_width // self.PX_PER_BAR))
+        key = bar_grid(lo, hi, buckets, len(self._c))
+        if self._lod is None or self._lod[0] != key:
+            self._lod = (key, downsample_ohlcv(self._o, self._h, self._l, self._c, self._v, lo, hi, buckets))
+        return self._lod[1]
+
+    def _x_to_index(self, x, rect):
+        start, end = self._view
+        return start + (x - rect.left()) / rect.width() * (end - start)
+
+    def _date_label(self, i):
+        i = int(min(max(0, round(i)), len(self._c) - 1))
+        try:
+            ts = self._dates[i]
+            fmt = "%Y-%m-%d %H:%M" if (ts.hour or ts.minute) else "%Y-%m-%d"
+            return ts.strftime(fmt)
+        except Exception:
+            return str(i)
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.fillRect(self.rect(), self._colors["bg"])
+        p.setPen(self._colors["text"])
+        if not self.has_data():
+            p.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self._message)
+            p.end()
+            return
+
+        rect = self._plot_rect()
+        lower = [ov for ov in self._overlays if ov["pane"] == "lower"]
+        vol_h = rect.height() * 0.18
+        lower_h = rect.height() * min(0.4, 0.14 * len({ov.get("group", ov["label"]) for ov in lower}))
+        price_rect = QRectF(rect.left(), rect.top(), rect.width(), rect.height() - vol_h - lower_h - 12)
+        lower_rect = QRectF(rect.left(), price_rect.bottom() + 6, rect.width(), lower_h)
+        vol_rect = QRectF(rect.left(), rect.bottom() - vol_h, rect.width(), vol_h)
+
+        x, o, h, l, c, v = self._visible_bars(rect.width())
+        if len(x) == 0:
+            p.end()
+            return
+        start, end = self._view
+        sx = rect.width() / (end - start)
+        px = rect.left() + (x + 0.5 - start) * sx
+        pmin, pmax = float(np.nanmin(l)), float(np.nanmax(h))
+        if pmax <= pmin:
+            pmax = pmin + 1.0
+        pad = (pmax - pmin) * 0.05
+        pmin -= pad; pmax += pad
+        py = lambda val: price_rect.bottom() - (val - pmin) / (pmax - pmin) * price_rect.height()
+        vmax = float(np.nanmax(v)) or 1.0
+
+        font = p.font(); font.setPointSize(8); p.setFont(font)
+        p.setPen(QPen(self._colors["grid"], 1, Qt.PenStyle.DashLine))
+        for t in nice_ticks(pmin, pmax):
+            y = py(t)
+            p.drawLine(QLineF(rect.left(), y, rect.right(), y))
+        p.setPen(self._colors["text"])
+        for t in nice_ticks(pmin, pmax):
+            p.drawText(QPointF(rect.right() + 6, py(t) + 4), f"{t:,.2f}")
+        for frac in (0.0, 0.25, 0.5, 0.75):
+            xi = start + frac * (end - start)
+            p.drawText(QPointF(rect.left() + frac * rect.width(), rect.bottom() + 16), self._date_label(xi))
+        font.setBold(True); p.setFont(font)
+        p.drawText(QPointF(rect.left(), 18), self._title)
+        font.setBold(False); p.setFont(font)
+
+        step = x[1] - x[0] if len(x) > 1 else 1.0
+        body_w = max(1.0, min(step * sx * 0.7, 14.0))
+        p.save()
+        p.setClipRect(rect)
+        up = c >= o
+        for mask, color in ((up, self._colors["up"]), (~up, self._colors["down"])):
+            if not mask.any():
+                continue
+            xs, hs, ls, os_, cs, vs = px[mask], h[mask], l[mask], o[mask], c[mask], v[mask]
+            p.setPen(QPen(color, 1))
+            p.drawLines([QLineF(xx, py(hh), xx, py(ll)) for xx, hh, ll in zip(xs, hs, ls)])
+            p.setPen(Qt.PenStyle.NoPen)
+            p.setBrush(color)
+            p.drawRects([QRectF(xx - body_w / 2, py(max(oo, cc)), body_w, max(1.0, abs(py(oo) - py(cc))))
+                         for xx, oo, cc in zip(xs, os_, cs)])
+            vol_color = QColor(color); vol_color.setAlpha(140)
+            p.setBrush(vol_color)
+            p.drawRects([QRectF(xx - body_w / 2, vol_rect.bottom() - vv / vmax * vol_rect.height(), body_w, vv / vmax * vol_rect.height())
+                         for xx, vv in zip(xs, vs)])
+
+        sample = np.clip(np.round(x).astype(np.int64), 0, len(self._c) - 1)
+        panes = {"price": (price_rect, pmin, pmax)}
+        groups = list(dict.fromkeys(ov.get("group", ov["label"]) for ov in lower))
+        for g, group in enumerate(groups):
+            sub = QRectF(lower_rect.left(), lower_rect.top() + g * lower_rect.height() / len(groups),
+                         lower_rect.width(), lower_rect.height() / len(groups))
+            vals = np.concatenate([ov["values"][sample] for ov in lower if ov.get("group", ov["label"]) == group])
+            lmin, lmax = (float(np.nanmin(vals)), float(np.nanmax(vals))) if np.isfinite(vals).any() else (0.0, 1.0)
+            if lmax <= lmin:
+                lmax = lmin + 1.0
+            panes[group] = (sub.adjusted(0, 3, 0, -3), lmin, lmax)
+            p.setPen(QPen(self._colors["grid"], 1, Qt.PenStyle.DashLine))
+            p.drawLine(QLineF(rect.left(), sub.top(), rect.right(), sub.top()))
+        legend_x = {}
+        for i, ov in enumerate(self._overlays):
+            pane = "price" if ov["pane"] == "price" else ov.get("group", ov["label"])
+            area, lo, hi = panes[pane]
+            to_y = lambda val: area.bottom() - (val - lo) / (hi - lo) * area.height()
+            vals = ov["values"][sample]
+            finite = np.isfinite(vals)
+            segments = [QLineF(px[j], to_y(vals[j]), px[j + 1], to_y(vals[j + 1]))
+                        for j in np.nonzero(finite[:-1] & finite[1:])[0]]
+            color = QColor(ov.get("color") or OVERLAY_COLORS[i % len(OVERLAY_COLORS)])
+            p.setPen(QPen(color, 1.4))
+            p.setClipRect(area.adjusted(0, -3, 0, 3))
+            p.drawLines(segments)
+            lx = legend_x.get(pane, area.left() + 4)
+            p.drawText(QPointF(lx, area.top() + 10), ov["label"])
+            legend_x[pane] = lx + p.fontMetrics().horizontalAdvance(ov["label"]) + 12
+        p.restore()
+        p.setPen(self._colors["text"])
+        for group in groups:
+            area, lo, hi = panes[group]
+            p.drawText(QPointF(rect.right() + 6, area.top() + 8), f"{hi:,.2f}")
+            p.drawText(QPointF(rect.right() + 6, area.bottom()), f"{lo:,.2f}")
+
+        if self._mouse is not None and rect.contains(self._mouse):
+            idx = int(min(max(0, np.floor(self._x_to_index(self._mouse.x(), rect))), len(self._c) - 1))
+            p.setPen(QPen(self._colors["cross"], 1, Qt.PenStyle.DotLine))
+            p.drawLine(QLineF(self._mouse.x(), rect.top(), self._mouse.x(), rect.bottom()))
+            p.drawLine(QLineF(rect.left(), self._mouse.y(), rect.right(), self._mouse.y()))
+            p.setPen(self._colors["text"])
+            if price_rect.contains(self._mouse):
+                val = pmin + (price_rect.bottom() - self._mouse.y()) / price_rect.height() * (pmax - pmin)
+                p.drawText(QPointF(rect.right() + 6, self._mouse.y() + 4), f"{val:,.2f}")
+            info = (f"{self._date_label(idx)}   O {self._o[idx]:,.2f}  H {self._h[idx]:,.2f}  "
+                    f"L {self._l[idx]:,.2f}  C {self._c[idx]:,.2f}  V {self._v[idx]:,.0f}")
+            p.drawText(QPointF(rect.left() + 200, 18), info)
+        p.end()
+
+    def resizeEvent(self, event):
+        self._lod = None
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        if not self.has_data():
+            return
+        rect = self._plot_rect()
+        anchor = self._x_to_index(event.position().x(), rect)
+        factor = 0.85 if event.angleDelta().y() > 0 else 1 / 0.85
+        start, end = self._view
+        self._set_view(anchor - (anchor - start) * factor, anchor + (end - anchor) * factor)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.has_data():
+            self._drag_origin = (event.position().x(), self._view)
+
+    def mouseMoveEvent(self, event):
+        self._mouse = event.position()
+        if self._drag_origin is not None:
+            x0, (start, end) = self._drag_origin
+            shift = (x0 - event.position().x()) / self._plot_rect().width() * (end - start)
+            self._set_view(start + shift, end + shift)
+        else:
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_origin = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.has_data():
+            self.reset_view()
+
+    def leaveEvent(self, event):
+        self._mouse = None
+        self.update()
+
+
+class LineChart(QWidget):
+    PX_PER_POINT = 2
+
+    def __init__(self, parent=None, min_height=200):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setMinimumHeight(min_height)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self._index = None
+        self._series = []
+        self._title = ""
+        self._baseline = None
+        self._message = ""
+        self._mouse = None
+        self._lod = {}
+        self._colors = {"bg": QColor("#FFFFFF"), "text": QColor("#223344"), "grid": QColor(0, 0, 0, 30)}
+
+    def set_theme(self, theme):
+        bg = theme.get("card_bg", "#ffffff")
+        self._colors["bg"] = QColor(bg if bg.startswith("#") else "#2a2a3e")
+        self._colors["text"] = QColor(theme.get("text", "#222222"))
+        grid = QColor(self._colors["text"]); grid.setAlpha(35)
+        self._colors["grid"] = grid
+        self.update()
+
+    def set_message(self, text):
+        self._message = text
+        self._series = []
+        self._lod = {}
+        self.update()
+
+    def set_series(self, index, series, title="", baseline=None):
+        self._index = index
+        self._series = [dict(s, values=np.asarray(s["values"], dtype=float)) for s in series]
+        self._title = title
+        self._baseline = baseline
+        self._message = ""
+        self._lod = {}
+        self.update()
+
+    def _plot_rect(self):
+        return QRectF(8, 24, max(1, self.width() - 78), max(1, self.height() - 46))
+
+    def _points(self, i, buckets):
+        key = (i, buckets)
+        if key not in self._lod:
+            self._lod[key] = downsample_line(self._series[i]["values"], buckets)
+        return self._lod[key]
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.fillRect(self.rect(), self._colors["bg"])
+        p.setPen(self._colors["text"])
+        if not self._series:
+            p.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self._message)
+            p.end()
+            return
+        rect = self._plot_rect()
+        n = max(len(s["values"]) for s in self._series)
+        buckets = max(1, int(rect.width() // self.PX_PER_POINT))
+        points = [self._points(i, buckets) for i in range(len(self._series))]
+        finite = np.concatenate([v[np.isfinite(v)] for _, v in points] + [np.array([self._baseline] if self._baseline is not None else [])])
+        lo, hi = (float(finite.min()), float(finite.max())) if len(finite) else (0.0, 1.0)
+        if hi <= lo:
+            hi = lo + 1.0
+        pad = (hi - lo) * 0.05
+        lo -= pad; hi += pad
+        to_x = lambda idx: rect.left() + (idx + 0.5) / max(n, 1) * rect.width()
+        to_y = lambda val: rect.bottom() - (val - lo) / (hi - lo) * rect.height()
+
+        font = p.font(); font.setPointSize(8); p.setFont(font)
+        ticks = nice_ticks(lo, hi)
+        p.setPen(QPen(self._colors["grid"], 1, Qt.PenStyle.DashLine))
+        for t in ticks:
+            p.drawLine(QLineF(rect.left(), to_y(t), rect.right(), to_y(t)))
+        p.setPen(self._colors["text"])
+        for t in ticks:
+            p.drawText(QPointF(rect.right() + 6, to_y(t) + 4), f"{t:,.2f}")
+        if self._index is not None and len(self._index):
+            for frac in (0.0, 0.25, 0.5, 0.75):
+                p.drawText(QPointF(rect.left() + frac * rect.width(), rect.bottom() + 16), self._label_at(frac * (n - 1)))
+        font.setBold(True); p.setFont(font)
+        p.drawText(QPointF(rect.left(), 16), self._title)
+        font.setBold(False); p.setFont(font)
+        if self._baseline is not None:
+            p.setPen(QPen(self._colors["text"], 1, Qt.PenStyle.DotLine))
+            p.drawLine(QLineF(rect.left(), to_y(self._baseline), rect.right(), to_y(self._baseline)))
+
+        p.save()
+        p.setClipRect(rect)
+        legend_x = rect.left() + 4
+        for i, (s, (xs, vs)) in enumerate(zip(self._series, points)):
+            color = QColor(s.get("color") or OVERLAY_COLORS[i % len(OVERLAY_COLORS)])
+            ok = np.isfinite(vs)
+            px, py = to_x(xs), to_y(vs)
+            if s.get("fill") and ok.any():
+                fill = QColor(color); fill.setAlpha(60)
+                base = to_y(self._baseline if self._baseline is not None else 0.0)
+                p.setPen(Qt.PenStyle.NoPen)
+                p.setBrush(fill)
+                p.drawRects([QRectF(px[j], min(py[j], base), max(1.0, px[j + 1] - px[j]), abs(base - py[j]))
+                             for j in np.nonzero(ok[:-1])[0]])
+                p.setBrush(Qt.BrushStyle.NoBrush)
+            p.setPen(QPen(color, s.get("width", 1.4)))
+            p.drawLines([QLineF(px[j], py[j], px[j + 1], py[j + 1]) for j in np.nonzero(ok[:-1] & ok[1:])[0]])
+            p.drawText(QPointF(legend_x, rect.top() + 12), s["label"])
+            legend_x += p.fontMetrics().horizontalAdvance(s["label"]) + 14
+        p.restore()
+
+        if self._mouse is not None and rect.contains(self._mouse):
+            idx = int(min(max(0, (self._mouse.x() - rect.left()) / rect.width() * n), n - 1))
+            p.setPen(QPen(self._colors["grid"], 1, Qt.PenStyle.DotLine))
+            p.drawLine(QLineF(self._mouse.x(), rect.top(), self._mouse.x(), rect.bottom()))
+            p.setPen(self._colors["text"])
+            parts = [f"{s['label']} {s['values'][idx]:,.2f}" for s in self._series if idx < len(s["values"]) and np.isfinite(s["values"][idx])]
+            p.drawText(QPointF(rect.left() + 220, 16), f"{self._label_at(idx)}   " + "   ".join(parts))
+        p.end()
+
+    def _label_at(self, i):
+        if self._index is None or not len(self._index):
+            return str(int(i))
+        ts = self._index[int(min(max(0, round(i)), len(self._index) - 1))]
+        try:
+            return ts.strftime("%Y-%m-%d %H:%M" if (ts.hour or ts.minute) else "%Y-%m-%d")
+        except Exception:
+            return str(ts)
+
+    def resizeEvent(self, event):
+        self._lod = {}
+        super().resizeEvent(event)
+
+    def mouseMoveEvent(self, event):
+        self._mouse = event.position()
+        self.update()
+
+    def leaveEvent(self, event):
+        self._mouse = None
+        self.update()
+
+
+class CorrelationHeatmap(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setMinimumSize(240, 240)
+        self._labels = []
+        self._matrix = None
+        self._image = None
+        self._message = "Run an analysis to see the correlation matrix"
+        self._colors = {"bg": QColor("#FFFFFF"), "text": QColor("#223344")}
+
+    def set_theme(self, theme):
+        bg = theme.get("card_bg", "#ffffff")
+        self._colors["bg"] = QColor(bg if bg.startswith("#") else "#2a2a3e")
+        self._colors["text"] = QColor(theme.get("text", "#222222"))
+        self.update()
+
+    def set_matrix(self, labels, matrix):
+        self._labels = labels
+        self._matrix = np.asarray(matrix, dtype=float)
+        t = np.nan_to_num((np.clip(self._matrix, -1, 1) + 1) / 2, nan=0.5)
+        rgba = np.empty(self._matrix.shape + (4,), dtype=np.uint8)
+        rgba[..., 0] = np.where(t > 0.5, 255, 255 * t * 2).astype(np.uint8)
+        rgba[..., 1] = (255 * (1 - np.abs(t - 0.5) * 2)).astype(np.uint8)
+        rgba[..., 2] = np.where(t < 0.5, 255, 255 * (1 - t) * 2).astype(np.uint8)
+        rgba[..., 3] = 255
+        self._image = to_qimage(rgba).copy()
+        self.update()
+
+    def _grid_rect(self):
+        margin = 60 if 0 < len(self._labels) <= 40 else 8
+        side = max(1, min(self.width() - margin - 8, self.height() - margin - 8))
+        return QRectF(margin, margin, side, side)
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.fillRect(self.rect(), self._colors["bg"])
+        p.setPen(self._colors["text"])
+        if self._image is None:
+            p.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self._message)
+            p.end()
+            return
+        rect = self._grid_rect()
+        p.drawImage(rect, self._image)
+        n = len(self._labels)
+        if n <= 40:
+            font = p.font(); font.setPointSize(7); p.setFont(font)
+            cell = rect.width() / n
+            for i, label in enumerate(self._labels):
+                p.drawText(QRectF(0, rect.top() + i * cell, rect.left() - 4, cell),
+                           Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, label)
+                p.save()
+                p.translate(rect.left() + (i + 0.5) * cell, rect.top() - 4)
+                p.rotate(-90)
+                p.drawText(QPointF(0, 3), label)
+                p.restore()
+        p.end()
+
+    def mouseMoveEvent(self, event):
+        if self._matrix is None:
+            return
+        rect = self._grid_rect()
+        pos = event.position()
+        if not rect.contains(pos):
+            QToolTip.hideText()
+            return
+        n = len(self._labels)
+        i = min(n - 1, int((pos.y() - rect.top()) / rect.height() * n))
+        j = min(n - 1, int((pos.x() - rect.left()) / rect.width() * n))
+        QToolTip.showText(event.globalPosition().toPoint(), f"{self._labels[i]} / {self._labels[j]}: {self._matrix[i, j]:.2f}", self)
+
+
+class ScaledPixmapLabel(QLabel):
+    DEBOUNCE_MS = 150
+    CACHE_SIZE = 4
+    PREVIEW_MAX = 800
+
+    def __init__(self, text="", parent=None, upscale=True):
+        super().__init__(text, parent)
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.upscale = upscale
+        self._source = None
+        self._preview = None
+        self._cache = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._apply_quality)
+
+    def set_source(self, image):
+        self._source = to_qimage(image)
+        if self._source.isNull():
+            self._source = None
+            return
+        if max(self._source.width(), self._source.height()) > self.PREVIEW_MAX:
+            self._preview = self._source.scaled(self.PREVIEW_MAX, self.PREVIEW_MAX, Qt.AspectRatioMode.KeepAspectRatio,
+                                                Qt.TransformationMode.FastTransformation)
+        else:
+            self._preview = self._source
+        self._cache = {}
+        self._apply_quality()
+
+    def source(self):
+        return self._source
+
+    def setText(self, text):
+        self._source = None
+        self._preview = None
+        self._cache = {}
+        self._timer.stop()
+        super().setText(text)
+
+    def _target(self):
+        size = self.contentsRect().size()
+        if not self.upscale:
+            size = size.boundedTo(self._source.size())
+        return size.width(), size.height()
+
+    def _apply_quality(self):
+        if self._source is None:
+            return
+        key = self._target()
+        if min(key) <= 0:
+            return
+        pix = self._cache.pop(key, None)
+        if pix is None:
+            pix = QPixmap.fromImage(self._source.scaled(key[0], key[1], Qt.AspectRatioMode.KeepAspectRatio,
+                                                        Qt.TransformationMode.SmoothTransformation))
+        self._cache[key] = pix
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.pop(next(iter(self._cache)))
+        super().setPixmap(pix)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self._source is None:
+            return
+        key = self._target()
+        if min(key) <= 0:
+            return
+        if key in self._cache:
+            self._timer.stop()
+            self._apply_quality()
+            return
+        super().setPixmap(QPixmap.fromImage(self._preview.scaled(key[0], key[1], Qt.AspectRatioMode.KeepAspectRatio,
+                                                                 Qt.TransformationMode.FastTransformation)))
+        self._timer.start(self.DEBOUNCE_MS)
+
+
 class SarkarGPTPro(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -288,13 +3725,24 @@ class SarkarGPTPro(QMainWindow):
             save_json(PREF_FILE, self.prefs)
 
         self.current_theme_colors = THEME_SETS[self.current_theme]
+        ohlcv_cache.set_provider(make_market_data_provider(self.prefs))
 
         self.img2g_pil_image = None
         self._bill_items = []
         self.book_chapters = []
+        self.book_sections = []
+        self.book_section_anchors = []
+        self.book_project = None
+        self._book_busy = False
+        self._pdf_exports = {}
+        self._pending_invoice = None
+        self._trans_streamed = False
 
         self.streaming_timer = None
         self.current_stock_ticker = None
+        self.current_stock_data = None
+        self._stock_render_generation = 0
+        self._confirmed_tickers = set()
         self.model_queue = []
         
         self.chat_image_paths = []
@@ -304,12 +3752,30 @@ class SarkarGPTPro(QMainWindow):
 
         signals.chat_reply.connect(self._on_chat_reply)
         signals.translate_done.connect(self._on_translate_done)
+        signals.translate_progress.connect(self._on_translate_progress)
         signals.image_gen_done.connect(self._on_generate_image_done)
         signals.image_to_graph_done.connect(self._on_image_to_graph_done)
         signals.book_gen_done.connect(self._on_book_gen_done)
+        signals.pdf_progress.connect(self._on_pdf_progress)
+        signals.pdf_done.connect(self._on_pdf_done)
+        signals.invoice_batch_progress.connect(self._on_invoice_batch_progress)
+        signals.book_export_done.connect(self._on_book_export_done)
+        signals.ledger_report_done.connect(self._on_ledger_report_done)
+        signals.book_outline_done.connect(self._on_book_outline_done)
+        signals.book_section_update.connect(self._on_book_section_update)
+        signals.book_section_stream.connect(self._on_book_section_stream)
         signals.stock_overview_done.connect(self._on_stock_overview_done)
         signals.stock_analytics_done.connect(self._on_stock_analytics_done)
         signals.stock_graph_done.connect(self._on_stock_graph_done)
+        signals.stock_data_done.connect(self._on_stock_data_done)
+        signals.backtest_done.connect(self._on_backtest_done)
+        signals.backtest_sweep_done.connect(self._on_backtest_sweep_done)
+        signals.screener_rows.connect(self._on_screener_rows)
+        signals.screener_done.connect(self._on_screener_done)
+        signals.watchlist_tick.connect(self._on_watchlist_tick)
+        signals.portfolio_done.connect(self._on_portfolio_done)
+        signals.compare_done.connect(self._on_compare_done)
+        signals.report_progress.connect(self._on_report_progress)
         signals.business_assist_done.connect(self._on_business_assist_done)
 
         self.apply_theme(self.current_theme)
@@ -759,12 +4225,34 @@ class SarkarGPTPro(QMainWindow):
         search_layout = QVBoxLayout(search_group)
         self.stock_search_input = QLineEdit()
         self.stock_search_input.setPlaceholderText("Enter stock ticker (e.g., AAPL)")
+        self.stock_symbol_model = QStringListModel(self)
+        self.stock_completer = QCompleter(self.stock_symbol_model, self)
+        self.stock_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.stock_completer.setWidget(self.stock_search_input)
+        self.stock_completer.activated.connect(self._on_symbol_completed)
+        self.stock_search_input.textEdited.connect(self._update_symbol_suggestions)
+        self.stock_search_input.returnPressed.connect(self._search_stock)
         search_layout.addWidget(self.stock_search_input)
 
+        range_row = QHBoxLayout()
         self.period_combo = QComboBox()
-        self.period_combo.addItems(["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"])
+        self.period_combo.addItems(["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "max"])
         self.period_combo.setCurrentText("6mo")
-        search_layout.addWidget(self.period_combo)
+        self.period_combo.currentTextChanged.connect(self._reload_stock_graph)
+        range_row.addWidget(self.period_combo)
+        self.interval_combo = QComboBox()
+        self.interval_combo.addItems(["1m", "5m", "15m", "1h", "1d"])
+        self.interval_combo.setCurrentText("1d")
+        self.interval_combo.setToolTip("Bar interval. Coarser intervals are resampled locally from the finest one already loaded.")
+        self.interval_combo.currentTextChanged.connect(self._reload_stock_graph)
+        range_row.addWidget(self.interval_combo)
+        search_layout.addLayout(range_row)
+
+        self.stock_ai_combined_check = QCheckBox("Single AI request")
+        self.stock_ai_combined_check.setToolTip("Fetch overview and sentiment in one structured request when neither is cached")
+        self.stock_ai_combined_check.setChecked(self.prefs.get("stock_ai_combined", True))
+        self.stock_ai_combined_check.toggled.connect(self._toggle_stock_ai_combined)
+        search_layout.addWidget(self.stock_ai_combined_check)
 
         self.stock_search_btn = QPushButton("Search")
         self.stock_search_btn.clicked.connect(self._search_stock)
@@ -788,6 +4276,21 @@ class SarkarGPTPro(QMainWindow):
 
         self.trading_tabs.addTab(self.tab1_market, "📈 Market View")
 
+        self.tab_watchlist = self._create_trading_tab_watchlist()
+        self.trading_tabs.addTab(self.tab_watchlist, "👁 Watchlist")
+
+        self.tab_backtest = self._create_trading_tab_backtest()
+        self.trading_tabs.addTab(self.tab_backtest, "🧪 Backtest")
+
+        self.tab_screener = self._create_trading_tab_screener()
+        self.trading_tabs.addTab(self.tab_screener, "🔎 Screener")
+
+        self.tab_portfolio = self._create_trading_tab_portfolio()
+        self.trading_tabs.addTab(self.tab_portfolio, "📊 Portfolio")
+
+        self.tab_compare = self._create_trading_tab_compare()
+        self.trading_tabs.addTab(self.tab_compare, "⚖ Compare")
+
         main_layout.addWidget(self.trading_tabs, 1)
 
         return w
@@ -797,11 +4300,39 @@ class SarkarGPTPro(QMainWindow):
         middle_layout = QVBoxLayout(w)
         middle_layout.setContentsMargins(12, 12, 12, 12)
 
-        self.stock_graph_label = QLabel("Search for a stock to see its graph.")
+        chart_header = QHBoxLayout()
+        self.stock_chart_mode_combo = QComboBox()
+        self.stock_chart_mode_combo.addItems(["Interactive", "Rendered (mplfinance)"])
+        self.stock_chart_mode_combo.currentIndexChanged.connect(self._on_stock_chart_mode_changed)
+        chart_header.addWidget(QLabel("Chart:"))
+        chart_header.addWidget(self.stock_chart_mode_combo)
+        chart_hint = QLabel("Scroll to zoom · drag to pan · double-click to reset")
+        chart_hint.setStyleSheet("color: #888; font-size: 9pt;")
+        chart_header.addWidget(chart_hint)
+        chart_header.addStretch()
+        middle_layout.addLayout(chart_header)
+
+        indicator_row = QHBoxLayout()
+        indicator_row.addWidget(QLabel("Indicators:"))
+        self.stock_indicator_checks = {}
+        for label, name, params in CHART_INDICATOR_PRESETS:
+            check = QCheckBox(label)
+            check.toggled.connect(self._refresh_stock_overlays)
+            indicator_row.addWidget(check)
+            self.stock_indicator_checks[label] = check
+        indicator_row.addStretch()
+        middle_layout.addLayout(indicator_row)
+
+        self.stock_chart_stack = QStackedWidget()
+        self.stock_chart = CandlestickChart()
+        self.stock_chart_stack.addWidget(self.stock_chart)
+
+        self.stock_graph_label = ScaledPixmapLabel("Search for a stock to see its graph.")
         self.stock_graph_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.stock_graph_label.setObjectName("VideoPlaceholder")
         self.stock_graph_label.setMinimumHeight(300)
-        middle_layout.addWidget(self.stock_graph_label, 2)
+        self.stock_chart_stack.addWidget(self.stock_graph_label)
+        middle_layout.addWidget(self.stock_chart_stack, 2)
 
         splitter = QSplitter(Qt.Orientation.Horizontal)
 
@@ -824,6 +4355,777 @@ class SarkarGPTPro(QMainWindow):
         middle_layout.addWidget(splitter, 1)
         return w
 
+    def _create_trading_tab_backtest(self):
+        w = QWidget()
+        layout = QVBoxLayout(w)
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        top = QHBoxLayout()
+        self.bt_ticker_input = QLineEdit()
+        self.bt_ticker_input.setPlaceholderText("Ticker (defaults to current stock)")
+        top.addWidget(self.bt_ticker_input, 2)
+        self.bt_period_combo = QComboBox()
+        self.bt_period_combo.addItems(["1y", "2y", "5y", "10y", "max"])
+        self.bt_period_combo.setCurrentText("10y")
+        top.addWidget(self.bt_period_combo)
+        self.bt_strategy_combo = QComboBox()
+        self.bt_strategy_combo.addItems(list(BACKTEST_STRATEGIES.keys()))
+        self.bt_strategy_combo.currentTextChanged.connect(self._bt_build_param_rows)
+        top.addWidget(self.bt_strategy_combo, 1)
+        self.bt_cost_spin = QSpinBox()
+        self.bt_cost_spin.setRange(0, 500)
+        self.bt_cost_spin.setValue(5)
+        self.bt_cost_spin.setSuffix(" bps/trade")
+        top.addWidget(self.bt_cost_spin)
+        layout.addLayout(top)
+
+        params_group = QGroupBox("Parameters")
+        self.bt_params_grid = QGridLayout(params_group)
+        for col, header in enumerate(["Parameter", "Value", "Sweep From", "Sweep To", "Step"]):
+            self.bt_params_grid.addWidget(QLabel(f"<b>{header}</b>"), 0, col)
+        self.bt_param_widgets = []
+        layout.addWidget(params_group)
+        self._bt_build_param_rows(self.bt_strategy_combo.currentText())
+
+        actions = QHBoxLayout()
+        self.bt_run_btn = QPushButton("Run Backtest")
+        self.bt_run_btn.clicked.connect(self._run_backtest)
+        actions.addWidget(self.bt_run_btn)
+        self.bt_sweep_btn = QPushButton("Run Parameter Sweep")
+        self.bt_sweep_btn.clicked.connect(self._run_backtest_sweep)
+        actions.addWidget(self.bt_sweep_btn)
+        self.bt_status_label = QLabel("")
+        self.bt_status_label.setStyleSheet("color: #888;")
+        actions.addWidget(self.bt_status_label, 1)
+        layout.addLayout(actions)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        results = QWidget()
+        results_layout = QVBoxLayout(results)
+        results_layout.setContentsMargins(0, 0, 0, 0)
+        self.bt_stats_label = QLabel("Run a backtest to see results.")
+        self.bt_stats_label.setWordWrap(True)
+        results_layout.addWidget(self.bt_stats_label)
+        self.bt_equity_chart = LineChart(min_height=180)
+        results_layout.addWidget(self.bt_equity_chart, 3)
+        self.bt_drawdown_chart = LineChart(min_height=90)
+        results_layout.addWidget(self.bt_drawdown_chart, 1)
+        splitter.addWidget(results)
+
+        self.bt_sweep_table = QTableWidget()
+        self.bt_sweep_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.bt_sweep_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.bt_sweep_table.cellDoubleClicked.connect(self._on_bt_sweep_row_activated)
+        splitter.addWidget(self.bt_sweep_table)
+        layout.addWidget(splitter, 1)
+        return w
+
+    def _bt_build_param_rows(self, strategy):
+        for widgets in self.bt_param_widgets:
+            for widget in widgets:
+                self.bt_params_grid.removeWidget(widget)
+                widget.deleteLater()
+        self.bt_param_widgets = []
+        for row, (label, default, lo, hi, sweep_lo, sweep_hi, step) in enumerate(BACKTEST_STRATEGIES[strategy]["params"], start=1):
+            name_label = QLabel(label)
+            spins = []
+            for i, value in enumerate((default, sweep_lo, sweep_hi, step)):
+                spin = QSpinBox()
+                spin.setRange(1 if i == 3 else lo, hi)
+                spin.setValue(value)
+                spins.append(spin)
+            self.bt_params_grid.addWidget(name_label, row, 0)
+            for col, spin in enumerate(spins, start=1):
+                self.bt_params_grid.addWidget(spin, row, col)
+            self.bt_param_widgets.append([name_label] + spins)
+
+    def _bt_ticker(self):
+        ticker = self.bt_ticker_input.text().strip().upper() or (self.current_stock_ticker or "")
+        if not ticker:
+            QMessageBox.warning(self, "Input Error", "Enter a ticker or search for a stock first.")
+        return ticker
+
+    def _run_backtest(self):
+        ticker = self._bt_ticker()
+        if not ticker:
+            return
+        strategy = self.bt_strategy_combo.currentText()
+        params = [widgets[1].value() for widgets in self.bt_param_widgets]
+        if not BACKTEST_STRATEGIES[strategy]["valid"](np.array([params], dtype=float))[0]:
+            QMessageBox.warning(self, "Parameters", "These parameter values are not valid for this strategy.")
+            return
+        self.bt_run_btn.setEnabled(False)
+        self.bt_status_label.setText(f"Backtesting {strategy} on {ticker}...")
+        args = (ticker, self.bt_period_combo.currentText(), strategy, params, self.bt_cost_spin.value() / 10000.0)
+        threading.Thread(target=self._backtest_thread, args=args, daemon=True).start()
+
+    def _backtest_thread(self, ticker, period, strategy, params, cost):
+        try:
+            data = ohlcv_cache.get(ticker, period, "1d")
+            close = data["Close"].to_numpy(dtype=float)
+            t0 = time.perf_counter()
+            positions = strategy_positions(close, strategy, [params])
+            stats = backtest_stats(close, positions, cost, with_series=True)
+            signals.backtest_done.emit({"ticker": ticker, "period": period, "strategy": strategy, "params": params,
+                                        "index": data.index, "close": close, "stats": stats,
+                                        "elapsed": time.perf_counter() - t0})
+        except Exception as e:
+            signals.backtest_done.emit(("error", str(e)))
+
+    def _on_backtest_done(self, payload):
+        self.bt_run_btn.setEnabled(True)
+        if isinstance(payload, tuple) and payload[0] == "error":
+            self.bt_status_label.setText(f"Backtest failed: {payload[1]}")
+            return
+        stats = payload["stats"]
+        names = [p[0] for p in BACKTEST_STRATEGIES[payload["strategy"]]["params"]]
+        params = ", ".join(f"{n} {v}" for n, v in zip(names, payload["params"]))
+        values = "  |  ".join(f"<b>{col}</b> {stats[col][0]:,.2f}" for col in BACKTEST_STAT_COLUMNS)
+        close = payload["close"]
+        self.bt_stats_label.setText(f"{payload['ticker']} · {payload['strategy']} ({params})<br>{values}"
+                                    f"<br>Buy &amp; hold: {(close[-1] / close[0] - 1) * 100:,.2f}%")
+        self.bt_equity_chart.set_series(payload["index"], [
+            {"label": "Strategy", "values": stats["equity"][:, 0] * 100},
+            {"label": "Buy & Hold", "values": close / close[0] * 100},
+        ], title="Equity (start = 100)", baseline=100.0)
+        self.bt_drawdown_chart.set_series(payload["index"], [
+            {"label": "Drawdown %", "values": stats["drawdown"][:, 0] * 100, "color": "#E74C3C", "fill": True},
+        ], title="Drawdown", baseline=0.0)
+        self.bt_status_label.setText(f"Backtest finished in {payload['elapsed'] * 1000:.1f} ms over {len(close)} bars.")
+
+    def _run_backtest_sweep(self):
+        ticker = self._bt_ticker()
+        if not ticker:
+            return
+        strategy = self.bt_strategy_combo.currentText()
+        ranges = [(widgets[2].value(), widgets[3].value(), widgets[4].value()) for widgets in self.bt_param_widgets]
+        combos = backtest_grid(strategy, ranges)
+        if len(combos) == 0:
+            QMessageBox.warning(self, "Parameters", "The sweep ranges produce no valid parameter combinations.")
+            return
+        if len(combos) > 250000:
+            QMessageBox.warning(self, "Parameters", f"{len(combos):,} combinations is too many. Narrow the ranges or increase the step.")
+            return
+        self.bt_sweep_btn.setEnabled(False)
+        self.bt_status_label.setText(f"Sweeping {len(combos):,} combinations of {strategy} on {ticker}...")
+        args = (ticker, self.bt_period_combo.currentText(), strategy, combos, self.bt_cost_spin.value() / 10000.0)
+        threading.Thread(target=self._backtest_sweep_thread, args=args, daemon=True).start()
+
+    def _backtest_sweep_thread(self, ticker, period, strategy, combos, cost):
+        try:
+            t0 = time.perf_counter()
+            close = ohlcv_cache.get(ticker, period, "1d")["Close"].to_numpy(dtype=float)
+            t1 = time.perf_counter()
+            try:
+                table = backtest_sweep(close, strategy, combos, cost, pool=process_pool())
+            except Exception as e:
+                print(f"Process pool sweep failed: {e}. Running in-process.")
+                shutdown_process_pool()
+                table = backtest_sweep(close, strategy, combos, cost)
+            signals.backtest_sweep_done.emit({"ticker": ticker, "strategy": strategy, "table": table, "bars": len(close),
+                                              "fetch": t1 - t0, "compute": time.perf_counter() - t1})
+        except Exception as e:
+            signals.backtest_sweep_done.emit(("error", str(e)))
+
+    def _on_backtest_sweep_done(self, payload):
+        self.bt_sweep_btn.setEnabled(True)
+        if isinstance(payload, tuple) and payload[0] == "error":
+            self.bt_status_label.setText(f"Sweep failed: {payload[1]}")
+            return
+        table = payload["table"].sort_values("Sharpe", ascending=False)
+        top = table.head(200)
+        self.bt_sweep_table.setSortingEnabled(False)
+        self.bt_sweep_table.clear()
+        self.bt_sweep_table.setColumnCount(len(top.columns))
+        self.bt_sweep_table.setHorizontalHeaderLabels(list(top.columns))
+        self.bt_sweep_table.setRowCount(len(top))
+        for r, row in enumerate(top.itertuples(index=False)):
+            for c, value in enumerate(row):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, round(float(value), 2) if pd.notna(value) else "")
+                self.bt_sweep_table.setItem(r, c, item)
+        self.bt_sweep_table.setSortingEnabled(True)
+        self.bt_sweep_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.bt_status_label.setText(
+            f"Swept {len(table):,} combinations over {payload['bars']:,} bars of {payload['ticker']} — "
+            f"fetch {payload['fetch']:.2f}s, compute {payload['compute']:.2f}s. Double-click a row to backtest it.")
+
+    def _on_bt_sweep_row_activated(self, row, column):
+        for c, widgets in enumerate(self.bt_param_widgets):
+            item = self.bt_sweep_table.item(row, c)
+            if item is not None:
+                widgets[1].setValue(int(float(item.data(Qt.ItemDataRole.DisplayRole))))
+        self._run_backtest()
+
+    def _create_trading_tab_watchlist(self):
+        w = QWidget()
+        layout = QVBoxLayout(w)
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        edit_row = QHBoxLayout()
+        self.watchlist_input = QLineEdit()
+        self.watchlist_input.setPlaceholderText("Add tickers (e.g., AAPL, MSFT)")
+        self.watchlist_input.returnPressed.connect(self._watchlist_add)
+        edit_row.addWidget(self.watchlist_input, 1)
+        btn_add = QPushButton("Add")
+        btn_add.clicked.connect(self._watchlist_add)
+        edit_row.addWidget(btn_add)
+        btn_remove = QPushButton("Remove Selected")
+        btn_remove.clicked.connect(self._watchlist_remove)
+        edit_row.addWidget(btn_remove)
+        layout.addLayout(edit_row)
+
+        live_row = QHBoxLayout()
+        self.watchlist_live_check = QCheckBox("Live updates")
+        self.watchlist_live_check.setChecked(self.prefs.get("watchlist_live", False))
+        self.watchlist_live_check.toggled.connect(self._toggle_watchlist_live)
+        live_row.addWidget(self.watchlist_live_check)
+        live_row.addWidget(QLabel("Every"))
+        self.watchlist_cadence_spin = QSpinBox()
+        self.watchlist_cadence_spin.setRange(5, 3600)
+        self.watchlist_cadence_spin.setSuffix(" s")
+        self.watchlist_cadence_spin.setValue(int(self.prefs.get("watchlist_poll_seconds", 30)))
+        self.watchlist_cadence_spin.valueChanged.connect(self._on_watchlist_settings_changed)
+        live_row.addWidget(self.watchlist_cadence_spin)
+        self.watchlist_hours_check = QCheckBox("Poll outside market hours")
+        self.watchlist_hours_check.setChecked(self.prefs.get("watchlist_ignore_hours", False))
+        self.watchlist_hours_check.toggled.connect(self._on_watchlist_settings_changed)
+        live_row.addWidget(self.watchlist_hours_check)
+        btn_poll = QPushButton("Poll Now")
+        btn_poll.clicked.connect(self._watchlist_poll_now)
+        live_row.addWidget(btn_poll)
+        self.watchlist_report_btn = QPushButton("Watchlist Report (PDF)")
+        self.watchlist_report_btn.clicked.connect(self._export_watchlist_report)
+        live_row.addWidget(self.watchlist_report_btn)
+        live_row.addStretch()
+        layout.addLayout(live_row)
+
+        self.watchlist_status_label = QLabel("")
+        self.watchlist_status_label.setStyleSheet("color: #888;")
+        layout.addWidget(self.watchlist_status_label)
+
+        self.watchlist_table = QTableWidget(0, len(WATCHLIST_COLUMNS))
+        self.watchlist_table.setHorizontalHeaderLabels(WATCHLIST_COLUMNS)
+        self.watchlist_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.watchlist_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.watchlist_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.watchlist_table.cellDoubleClicked.connect(self._on_watchlist_row_activated)
+        layout.addWidget(self.watchlist_table, 1)
+
+        self.watchlist_poller = WatchlistPoller(ohlcv_cache, int(self.prefs.get("watchlist_poll_seconds", 30)),
+                                                ignore_hours=self.prefs.get("watchlist_ignore_hours", False))
+        self._set_watchlist(self.prefs.get("watchlist", []), save=False)
+        if self.watchlist_live_check.isChecked():
+            self.watchlist_poller.start()
+        return w
+
+    def _set_watchlist(self, tickers, save=True):
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        current = [self.watchlist_table.item(r, 0).text() for r in range(self.watchlist_table.rowCount())]
+        for r in reversed(range(len(current))):
+            if current[r] not in tickers:
+                self.watchlist_table.removeRow(r)
+        for ticker in tickers:
+            if ticker not in current:
+                r = self.watchlist_table.rowCount()
+                self.watchlist_table.insertRow(r)
+                self.watchlist_table.setItem(r, 0, QTableWidgetItem(ticker))
+        self.watchlist_poller.set_tickers(tickers)
+        if save:
+            self.prefs["watchlist"] = tickers
+            save_json(PREF_FILE, self.prefs)
+
+    def _watchlist_tickers(self):
+        return [self.watchlist_table.item(r, 0).text() for r in range(self.watchlist_table.rowCount())]
+
+    def _watchlist_add(self):
+        tickers = parse_ticker_list(self.watchlist_input.text())
+        if not tickers:
+            return
+        self.watchlist_input.clear()
+        self._set_watchlist(self._watchlist_tickers() + tickers)
+
+    def _watchlist_remove(self):
+        rows = {index.row() for index in self.watchlist_table.selectionModel().selectedRows()}
+        self._set_watchlist([t for r, t in enumerate(self._watchlist_tickers()) if r not in rows])
+
+    def _toggle_watchlist_live(self, checked):
+        self.prefs["watchlist_live"] = checked
+        save_json(PREF_FILE, self.prefs)
+        if checked:
+            self.watchlist_poller.start()
+        else:
+            self.watchlist_poller.stop()
+            self.watchlist_status_label.setText("Live updates paused")
+
+    def _on_watchlist_settings_changed(self, *_):
+        self.prefs["watchlist_poll_seconds"] = self.watchlist_cadence_spin.value()
+        self.prefs["watchlist_ignore_hours"] = self.watchlist_hours_check.isChecked()
+        save_json(PREF_FILE, self.prefs)
+        self.watchlist_poller.configure(self.watchlist_cadence_spin.value(), self.watchlist_hours_check.isChecked())
+
+    def _watchlist_poll_now(self):
+        self.watchlist_poller.poll_now()
+
+    def _on_watchlist_tick(self, payload):
+        rows = {row["Ticker"]: row for row in payload["rows"]}
+        for r in range(self.watchlist_table.rowCount()):
+            row = rows.get(self.watchlist_table.item(r, 0).text())
+            if row is None:
+                continue
+            color = QColor("#2ECC71") if row["Change"] > 0 else QColor("#E74C3C") if row["Change"] < 0 else None
+            for c, col in enumerate(WATCHLIST_COLUMNS[1:], start=1):
+                value = row[col]
+                item = QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value, 2) if np.isfinite(value) else "")
+                if color is not None and col in ("Change", "Change %"):
+                    item.setForeground(color)
+                self.watchlist_table.setItem(r, c, item)
+        status = payload["status"]
+        stamp = datetime.now().strftime("%H:%M:%S")
+        if status == "closed":
+            self.watchlist_status_label.setText(f"Market closed · opens in {payload['next'] / 3600:.1f} h")
+        elif status == "error":
+            self.watchlist_status_label.setText(f"[{stamp}] Poll failed: {payload['error']} · retrying in {payload.get('next', 0):.0f} s")
+        elif status == "live":
+            self.watchlist_status_label.setText(f"[{stamp}] Polled {payload['polled']} tickers · {len(rows)} changed")
+
+    def _export_watchlist_report(self):
+        if SimpleDocTemplate is None:
+            QMessageBox.critical(self, "Error", "ReportLab library not found. Cannot save PDF.")
+            return
+        tickers = self._watchlist_tickers()
+        if not tickers:
+            QMessageBox.warning(self, "Empty Watchlist", "Add tickers to the watchlist first.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Watchlist Report", f"Watchlist_{datetime.now():%Y%m%d}.pdf", "PDF Files (*.pdf)")
+        if not path:
+            return
+        self.watchlist_report_btn.setEnabled(False)
+        self.watchlist_status_label.setText(f"Building report for {len(tickers)} tickers...")
+        threading.Thread(target=self._watchlist_report_thread, args=(path, tickers), daemon=True).start()
+
+    def _watchlist_report_thread(self, path, tickers):
+        try:
+            result = write_watchlist_report(path, tickers, "6mo",
+                                            lambda done, total: signals.report_progress.emit({"done": done, "total": total}))
+            signals.report_progress.emit(result)
+        except Exception as e:
+            signals.report_progress.emit(("error", str(e)))
+
+    def _on_report_progress(self, payload):
+        if isinstance(payload, tuple) and payload[0] == "error":
+            self.watchlist_report_btn.setEnabled(True)
+            self.watchlist_status_label.setText(f"Report failed: {payload[1]}")
+        elif "path" in payload:
+            self.watchlist_report_btn.setEnabled(True)
+            self.watchlist_status_label.setText(f"Report with {payload['tickers']} tickers saved to {payload['path']} in {payload['elapsed']:.1f}s")
+        else:
+            self.watchlist_status_label.setText(f"Building report... {payload['done']}/{payload['total']} pages")
+
+    def _on_watchlist_row_activated(self, row, column):
+        item = self.watchlist_table.item(row, 0)
+        if item is None:
+            return
+        self.stock_search_input.setText(item.text())
+        self._search_stock()
+
+    def _create_trading_tab_screener(self):
+        w = QWidget()
+        layout = QVBoxLayout(w)
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        universe_group = QGroupBox("Ticker Universe")
+        universe_layout = QVBoxLayout(universe_group)
+        self.screener_universe_input = QTextEdit()
+        self.screener_universe_input.setPlaceholderText("Tickers separated by spaces, commas or new lines, or load a list/CSV file...")
+        self.screener_universe_input.setFixedHeight(70)
+        universe_layout.addWidget(self.screener_universe_input)
+        universe_actions = QHBoxLayout()
+        self.screener_load_btn = QPushButton("Load List / CSV")
+        self.screener_load_btn.clicked.connect(self._screener_load_universe)
+        universe_actions.addWidget(self.screener_load_btn)
+        self.screener_universe_count = QLabel("0 tickers")
+        universe_actions.addWidget(self.screener_universe_count)
+        universe_actions.addStretch()
+        universe_layout.addLayout(universe_actions)
+        self.screener_universe_input.textChanged.connect(
+            lambda: self.screener_universe_count.setText(f"{len(parse_ticker_list(self.screener_universe_input.toPlainText()))} tickers"))
+        layout.addWidget(universe_group)
+
+        form = QFormLayout()
+        self.screener_filter_input = QLineEdit("cross_above(close, sma(200))")
+        self.screener_filter_input.setToolTip(
+            "Series: " + ", ".join(SCREEN_SERIES) + "\nFunctions: " + ", ".join(SCREEN_FUNCTIONS) +
+            "\nExamples: rsi(14) < 30 and close > sma(50)    change(5) > 10    cross_below(macd(), macd_signal())")
+        form.addRow("Filter:", self.screener_filter_input)
+        rank_row = QHBoxLayout()
+        self.screener_rank_input = QLineEdit("rsi(14)")
+        rank_row.addWidget(self.screener_rank_input, 1)
+        self.screener_rank_desc = QCheckBox("Descending")
+        self.screener_rank_desc.setChecked(True)
+        rank_row.addWidget(self.screener_rank_desc)
+        self.screener_period_combo = QComboBox()
+        self.screener_period_combo.addItems(["3mo", "6mo", "1y", "2y", "5y"])
+        self.screener_period_combo.setCurrentText("1y")
+        rank_row.addWidget(self.screener_period_combo)
+        form.addRow("Rank by:", rank_row)
+        layout.addLayout(form)
+
+        actions = QHBoxLayout()
+        self.screener_run_btn = QPushButton("Run Screener")
+        self.screener_run_btn.clicked.connect(self._run_screener)
+        actions.addWidget(self.screener_run_btn)
+        self.screener_status_label = QLabel("")
+        self.screener_status_label.setStyleSheet("color: #888;")
+        actions.addWidget(self.screener_status_label, 1)
+        layout.addLayout(actions)
+
+        self.screener_table = QTableWidget(0, len(SCREENER_COLUMNS))
+        self.screener_table.setHorizontalHeaderLabels(SCREENER_COLUMNS)
+        self.screener_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.screener_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.screener_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.screener_table.cellDoubleClicked.connect(self._on_screener_row_activated)
+        layout.addWidget(self.screener_table, 1)
+        return w
+
+    def _screener_load_universe(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load ticker universe", "", "Ticker lists (*.csv *.txt);;All Files (*)")
+        if not path:
+            return
+        try:
+            tickers = load_ticker_universe(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Load Error", str(e))
+            return
+        self.screener_universe_input.setPlainText("\n".join(tickers))
+
+    def _run_screener(self):
+        tickers = parse_ticker_list(self.screener_universe_input.toPlainText())
+        if not tickers:
+            QMessageBox.warning(self, "Input Error", "Add at least one ticker to the universe.")
+            return
+        expression = self.screener_filter_input.text().strip()
+        rank_expression = self.screener_rank_input.text().strip()
+        try:
+            compile_screen_expression(expression)
+            if rank_expression:
+                compile_screen_expression(rank_expression)
+        except (SyntaxError, ValueError) as e:
+            QMessageBox.warning(self, "Expression Error", str(e))
+            return
+        self.screener_run_btn.setEnabled(False)
+        self.screener_table.setSortingEnabled(False)
+        self.screener_table.setRowCount(0)
+        self.screener_status_label.setText(f"Screening {len(tickers)} tickers...")
+        args = (tickers, self.screener_period_combo.currentText(), expression, rank_expression, self.screener_rank_desc.isChecked())
+        threading.Thread(target=self._screener_thread, args=args, daemon=True).start()
+
+    def _screener_thread(self, tickers, period, expression, rank_expression, descending):
+        try:
+            t_start = time.perf_counter()
+            fetch_time = 0.0
+            compute_time = 0.0
+            rows = []
+            scanned = 0
+            try:
+                pool = process_pool()
+            except Exception:
+                pool = None
+            pending = {}
+
+            def finish(chunk_rows, elapsed):
+                nonlocal compute_time
+                compute_time += elapsed
+                rows.extend(chunk_rows)
+                signals.screener_rows.emit(chunk_rows)
+
+            def collect(future):
+                nonlocal pool
+                frames = pending.pop(future)
+                try:
+                    finish(*future.result())
+                except BrokenProcessPool as e:
+                    if pool is not None:
+                        print(f"Process pool screen failed: {e}. Running in-process.")
+                        shutdown_process_pool()
+                        pool = None
+                    finish(*screen_chunk(frames, expression, rank_expression))
+
+            for i in range(0, len(tickers), SCREENER_CHUNK):
+                t0 = time.perf_counter()
+                frames = ohlcv_cache.get_many(tickers[i:i + SCREENER_CHUNK], period, "1d")
+                fetch_time += time.perf_counter() - t0
+                scanned += len(frames)
+                if pool is not None:
+                    try:
+                        pending[pool.submit(screen_chunk, frames, expression, rank_expression)] = frames
+                    except BrokenProcessPool as e:
+                        print(f"Process pool screen failed: {e}. Running in-process.")
+                        shutdown_process_pool()
+                        pool = None
+                if pool is None:
+                    finish(*screen_chunk(frames, expression, rank_expression))
+                if pending:
+                    for future in wait(pending, timeout=0, return_when=FIRST_COMPLETED).done:
+                        collect(future)
+            for future in as_completed(list(pending)):
+                collect(future)
+            t0 = time.perf_counter()
+            ranked = sorted(rows, key=lambda r: (np.isnan(r["Rank"]), -r["Rank"] if descending else r["Rank"]))
+            rank_time = time.perf_counter() - t0
+            signals.screener_done.emit({"rows": ranked, "universe": len(tickers), "scanned": scanned,
+                                        "fetch": fetch_time, "compute": compute_time, "rank": rank_time,
+                                        "total": time.perf_counter() - t_start})
+        except Exception as e:
+            signals.screener_done.emit(("error", str(e)))
+
+    def _append_screener_rows(self, rows):
+        for row in rows:
+            r = self.screener_table.rowCount()
+            self.screener_table.insertRow(r)
+            for c, col in enumerate(SCREENER_COLUMNS):
+                value = row[col]
+                item = QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(float(value), 2) if np.isfinite(value) else "")
+                self.screener_table.setItem(r, c, item)
+
+    def _on_screener_rows(self, rows):
+        self._append_screener_rows(rows)
+        self.screener_status_label.setText(f"{self.screener_table.rowCount()} matches so far...")
+
+    def _on_screener_done(self, payload):
+        self.screener_run_btn.setEnabled(True)
+        if isinstance(payload, tuple) and payload[0] == "error":
+            self.screener_status_label.setText(f"Screener failed: {payload[1]}")
+            return
+        self.screener_table.setRowCount(0)
+        self._append_screener_rows(payload["rows"])
+        self.screener_table.setSortingEnabled(True)
+        self.screener_status_label.setText(
+            f"{len(payload['rows'])} of {payload['scanned']} tickers matched ({payload['universe'] - payload['scanned']} without data). "
+            f"Fetch {payload['fetch']:.2f}s · compute {payload['compute']:.2f}s · rank {payload['rank'] * 1000:.1f}ms · "
+            f"total {payload['total']:.2f}s")
+
+    def _on_screener_row_activated(self, row, column):
+        item = self.screener_table.item(row, 0)
+        if item is None:
+            return
+        self.stock_search_input.setText(item.text())
+        self._search_stock()
+
+    def _create_trading_tab_portfolio(self):
+        w = QWidget()
+        layout = QVBoxLayout(w)
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        top = QHBoxLayout()
+        self.portfolio_holdings_input = QTextEdit()
+        self.portfolio_holdings_input.setPlaceholderText("One holding per line: TICKER WEIGHT (e.g., AAPL 30). Weights default to equal.")
+        self.portfolio_holdings_input.setFixedHeight(90)
+        top.addWidget(self.portfolio_holdings_input, 1)
+        controls = QFormLayout()
+        self.portfolio_benchmark_input = QLineEdit("SPY")
+        controls.addRow("Benchmark:", self.portfolio_benchmark_input)
+        self.portfolio_period_combo = QComboBox()
+        self.portfolio_period_combo.addItems(["3mo", "6mo", "1y", "2y", "5y"])
+        self.portfolio_period_combo.setCurrentText("1y")
+        controls.addRow("Window:", self.portfolio_period_combo)
+        self.portfolio_run_btn = QPushButton("Analyze Portfolio")
+        self.portfolio_run_btn.clicked.connect(self._run_portfolio)
+        controls.addRow(self.portfolio_run_btn)
+        top.addLayout(controls)
+        layout.addLayout(top)
+
+        self.portfolio_summary_label = QLabel("")
+        self.portfolio_summary_label.setWordWrap(True)
+        layout.addWidget(self.portfolio_summary_label)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.portfolio_table = QTableWidget(0, len(PORTFOLIO_COLUMNS))
+        self.portfolio_table.setHorizontalHeaderLabels(PORTFOLIO_COLUMNS)
+        self.portfolio_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.portfolio_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.portfolio_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        splitter.addWidget(self.portfolio_table)
+        self.portfolio_heatmap = CorrelationHeatmap()
+        self.portfolio_heatmap.set_theme(self.current_theme_colors)
+        splitter.addWidget(self.portfolio_heatmap)
+        splitter.setSizes([500, 400])
+        layout.addWidget(splitter, 1)
+
+        self.portfolio_model = None
+        self._portfolio_busy = False
+        self._portfolio_seen_version = 0
+        self.portfolio_timer = QTimer(self)
+        self.portfolio_timer.timeout.connect(self._refresh_portfolio)
+        self.portfolio_timer.start(5000)
+        return w
+
+    def _run_portfolio(self):
+        if self._portfolio_busy:
+            return
+        try:
+            holdings = parse_holdings(self.portfolio_holdings_input.toPlainText())
+            if not holdings:
+                raise ValueError("Add at least one holding.")
+            model = PortfolioRisk(ohlcv_cache, holdings, self.portfolio_benchmark_input.text().strip() or "SPY",
+                                  self.portfolio_period_combo.currentText())
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
+            return
+        self.portfolio_model = model
+        self.portfolio_run_btn.setEnabled(False)
+        self.portfolio_summary_label.setText(f"Loading prices for {len(model.columns)} tickers...")
+        self._portfolio_busy = True
+        threading.Thread(target=self._portfolio_thread, args=(model, True), daemon=True).start()
+
+    def _refresh_portfolio(self):
+        if self.portfolio_model is None or self._portfolio_busy or ohlcv_cache.version == self._portfolio_seen_version:
+            return
+        self._portfolio_busy = True
+        self.portfolio_run_btn.setEnabled(False)
+        threading.Thread(target=self._portfolio_thread, args=(self.portfolio_model, False), daemon=True).start()
+
+    def _portfolio_thread(self, model, fetch):
+        try:
+            t0 = time.perf_counter()
+            version = ohlcv_cache.version
+            if fetch:
+                frames = ohlcv_cache.get_many(model.columns, model.period, model.interval)
+                missing = [t for t in model.columns if t not in frames]
+                if missing:
+                    raise Exception(f"No price history for {', '.join(missing)}")
+                version = ohlcv_cache.version
+            t1 = time.perf_counter()
+            changed = model.update()
+            signals.portfolio_done.emit({"model": model, "changed": changed or fetch, "version": version,
+                                         "stats": model.stats(), "fetch": t1 - t0, "compute": time.perf_counter() - t1})
+        except Exception as e:
+            signals.portfolio_done.emit(("error", str(e), model))
+
+    def _on_portfolio_done(self, payload):
+        self._portfolio_busy = False
+        self.portfolio_run_btn.setEnabled(True)
+        if isinstance(payload, tuple) and payload[0] == "error":
+            if payload[2] is self.portfolio_model:
+                self.portfolio_summary_label.setText(f"Portfolio analysis failed: {payload[1]}")
+                self._portfolio_seen_version = ohlcv_cache.version
+            return
+        if payload["model"] is not self.portfolio_model:
+            return
+        self._portfolio_seen_version = payload["version"]
+        if not payload["changed"]:
+            return
+        stats = payload["stats"]
+        summary = stats["summary"]
+        model = payload["model"]
+        self.portfolio_summary_label.setText(
+            f"<b>Volatility</b> {summary['volatility']:.2f}% ann. · <b>Beta vs {model.benchmark}</b> {summary['beta']:.2f} · "
+            f"<b>{model.benchmark} vol</b> {summary['benchmark_vol']:.2f}% · <b>Avg pairwise corr</b> {summary['avg_corr']:.2f} · "
+            f"<b>Diversification ratio</b> {summary['diversification']:.2f}<br>"
+            f"{summary['bars']} aligned bars {summary['start']:%Y-%m-%d} → {summary['end']:%Y-%m-%d} · "
+            f"fetch {payload['fetch']:.2f}s · compute {payload['compute'] * 1000:.1f} ms")
+        self.portfolio_table.setSortingEnabled(False)
+        self.portfolio_table.setRowCount(len(stats["rows"]))
+        for r, row in enumerate(stats["rows"]):
+            for c, col in enumerate(PORTFOLIO_COLUMNS):
+                value = row[col]
+                item = QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(float(value), 3) if np.isfinite(value) else "")
+                self.portfolio_table.setItem(r, c, item)
+        self.portfolio_table.setSortingEnabled(True)
+        self.portfolio_heatmap.set_matrix(stats["labels"], stats["corr"])
+
+    def _create_trading_tab_compare(self):
+        w = QWidget()
+        layout = QVBoxLayout(w)
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        top = QHBoxLayout()
+        self.compare_input = QLineEdit("AAPL, MSFT, QQQ")
+        self.compare_input.setPlaceholderText("Tickers to compare, separated by commas or spaces")
+        self.compare_input.returnPressed.connect(self._run_compare)
+        top.addWidget(self.compare_input, 1)
+        self.compare_period_combo = QComboBox()
+        self.compare_period_combo.addItems(["1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"])
+        self.compare_period_combo.setCurrentText("1y")
+        self.compare_period_combo.currentTextChanged.connect(self._run_compare)
+        top.addWidget(self.compare_period_combo)
+        self.compare_btn = QPushButton("Compare")
+        self.compare_btn.clicked.connect(self._run_compare)
+        top.addWidget(self.compare_btn)
+        layout.addLayout(top)
+
+        self.compare_status_label = QLabel("")
+        self.compare_status_label.setStyleSheet("color: #888;")
+        layout.addWidget(self.compare_status_label)
+
+        self.compare_chart = LineChart(min_height=320)
+        self.compare_chart.set_theme(self.current_theme_colors)
+        self.compare_chart.set_message("Enter tickers and press Compare")
+        layout.addWidget(self.compare_chart, 1)
+        self._compare_request = 0
+        return w
+
+    def _run_compare(self, *_):
+        tickers = parse_ticker_list(self.compare_input.text())
+        if not tickers:
+            return
+        self._compare_request += 1
+        period = self.compare_period_combo.currentText()
+        self.compare_status_label.setText(f"Loading {len(tickers)} tickers...")
+        threading.Thread(target=self._compare_thread, args=(self._compare_request, tickers, period), daemon=True).start()
+
+    def _compare_thread(self, request, tickers, period):
+        try:
+            t0 = time.perf_counter()
+            frames, errors = {}, {}
+            with ThreadPoolExecutor(max_workers=min(COMPARE_FETCH_WORKERS, len(tickers))) as executor:
+                futures = {executor.submit(ohlcv_cache.get, ticker, cache_period(period), "1d"): ticker for ticker in tickers}
+                for future in as_completed(futures):
+                    try:
+                        frames[futures[future]] = future.result()
+                    except Exception as e:
+                        errors[futures[future]] = str(e)
+            frames = {t: frames[t] for t in tickers if t in frames and not frames[t].empty}
+            if frames and period == "ytd":
+                year = max(frame.index[-1].year for frame in frames.values())
+                frames = {t: frame[frame.index.year >= year] for t, frame in frames.items()}
+                frames = {t: frame for t, frame in frames.items() if not frame.empty}
+            if not frames:
+                raise Exception("; ".join(f"{t}: {e}" for t, e in errors.items()) or "No data")
+            index, rebased = rebase_closes(frames)
+            signals.compare_done.emit({"request": request, "period": period, "index": index, "series": rebased,
+                                       "errors": errors, "elapsed": time.perf_counter() - t0})
+        except Exception as e:
+            signals.compare_done.emit({"request": request, "error": str(e)})
+
+    def _on_compare_done(self, payload):
+        if payload["request"] != self._compare_request:
+            return
+        if "error" in payload:
+            self.compare_status_label.setText(f"Compare failed: {payload['error']}")
+            self.compare_chart.set_message("No data to compare")
+            return
+        series = [{"label": ticker, "values": values} for ticker, values in payload["series"].items()]
+        self.compare_chart.set_series(payload["index"], series, f"Rebased to 100 · {payload['period']}", baseline=100.0)
+        parts = [f"{ticker} {values[-1] - 100:+.1f}%" for ticker, values in payload["series"].items()]
+        status = "   ".join(parts) + f"   ·   {payload['elapsed']:.2f}s"
+        if payload["errors"]:
+            status += "   ·   failed: " + ", ".join(payload["errors"])
+        self.compare_status_label.setText(status)
+
     def _page_book_maker(self):
         w = QWidget()
         layout = QVBoxLayout(w)
@@ -912,6 +5214,11 @@ class SarkarGPTPro(QMainWindow):
         self.book_custom_instructions.setPlaceholderText("Enter any other custom instructions for the AI author (e.g., 'write in the first person', 'focus on practical examples')...")
         self.book_custom_instructions.setFixedHeight(100)
         ai_layout.addRow("Custom Instructions:", self.book_custom_instructions)
+        self.book_workers_spin = QSpinBox()
+        self.book_workers_spin.setRange(1, BOOK_MAX_WORKERS)
+        self.book_workers_spin.setValue(int(self.prefs.get("book_workers", 4)))
+        self.book_workers_spin.valueChanged.connect(self._save_book_workers)
+        ai_layout.addRow("Parallel Requests:", self.book_workers_spin)
 
         scroll_layout.addWidget(ai_group)
 
@@ -930,6 +5237,11 @@ class SarkarGPTPro(QMainWindow):
         editor_header.addWidget(self.book_gen_status)
         editor_layout.addLayout(editor_header)
 
+        self.book_section_list = QListWidget()
+        self.book_section_list.setFixedHeight(110)
+        self.book_section_list.itemDoubleClicked.connect(self._book_jump_to_section)
+        editor_layout.addWidget(self.book_section_list)
+
         self.book_content_editor = QTextEdit()
         self.book_content_editor.setObjectName("BookContentEditor")
         self.book_content_editor.setPlaceholderText("Generated book content will appear here...")
@@ -939,9 +5251,25 @@ class SarkarGPTPro(QMainWindow):
         self.book_generate_btn = QPushButton("Generate Book (AI)")
         self.book_generate_btn.clicked.connect(self._book_generate_ai)
         editor_actions.addWidget(self.book_generate_btn)
+        self.book_regenerate_btn = QPushButton("Regenerate Section")
+        self.book_regenerate_btn.clicked.connect(self._book_regenerate_section)
+        editor_actions.addWidget(self.book_regenerate_btn)
         self.book_save_pdf_btn = QPushButton("Save Book as PDF")
         self.book_save_pdf_btn.clicked.connect(self._save_book_pdf)
         editor_actions.addWidget(self.book_save_pdf_btn)
+        self.book_export_epub_btn = QPushButton("Export EPUB")
+        self.book_export_epub_btn.clicked.connect(lambda: self._export_book("epub"))
+        editor_actions.addWidget(self.book_export_epub_btn)
+        self.book_export_html_btn = QPushButton("Export HTML")
+        self.book_export_html_btn.clicked.connect(lambda: self._export_book("html"))
+        editor_actions.addWidget(self.book_export_html_btn)
+        self.book_pdf_progress = QProgressBar()
+        self.book_pdf_progress.hide()
+        editor_actions.addWidget(self.book_pdf_progress)
+        self.book_pdf_cancel_btn = QPushButton("Cancel")
+        self.book_pdf_cancel_btn.clicked.connect(lambda: self._cancel_pdf_export("book"))
+        self.book_pdf_cancel_btn.hide()
+        editor_actions.addWidget(self.book_pdf_cancel_btn)
         editor_layout.addLayout(editor_actions)
 
         splitter.addWidget(editor_widget)
@@ -976,7 +5304,9 @@ class SarkarGPTPro(QMainWindow):
         l.addLayout(mid, 1)
         btns = QHBoxLayout()
         self.btn_translate = QPushButton("Translate"); self.btn_translate.clicked.connect(self._translate)
-        btns.addWidget(self.btn_translate); btns.addStretch()
+        btns.addWidget(self.btn_translate)
+        self.trans_progress = QProgressBar(); self.trans_progress.setFormat("%v/%m chunks"); self.trans_progress.hide()
+        btns.addWidget(self.trans_progress, 1); btns.addStretch()
         l.addLayout(btns)
         return w
 
@@ -1033,7 +5363,7 @@ class SarkarGPTPro(QMainWindow):
 
         top = QFrame(); top_l = QVBoxLayout(top)
         self.img2g_btn_open = QPushButton("Open Image"); self.img2g_btn_open.clicked.connect(self._img2g_open); top_l.addWidget(self.img2g_btn_open)
-        self.img2g_preview = QLabel("Open an image to analyze...")
+        self.img2g_preview = ScaledPixmapLabel("Open an image to analyze...", upscale=False)
         self.img2g_preview.setMinimumSize(400, 300)
         self.img2g_preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.img2g_preview.setFrameShape(QFrame.Shape.StyledPanel)
@@ -1058,10 +5388,17 @@ class SarkarGPTPro(QMainWindow):
         return w
 
     def _page_billing(self):
-        w = QWidget(); l = QVBoxLayout(w)
+        w = QWidget(); outer = QVBoxLayout(w)
         h = QLabel("Invoicing / Billing");
         h.setObjectName("PageTitle")
-        h.setFont(QFont("Inter", 16, QFont.Weight.Bold)); l.addWidget(h)
+        h.setFont(QFont("Inter", 16, QFont.Weight.Bold)); outer.addWidget(h)
+        self.billing_tabs = QTabWidget()
+        single = QWidget(); l = QVBoxLayout(single)
+        self.billing_tabs.addTab(single, "Single Invoice")
+        self.billing_tabs.addTab(self._billing_tab_batch(), "Batch")
+        self.billing_tabs.addTab(self._billing_tab_ledger(), "Ledger")
+        self.billing_tabs.currentChanged.connect(lambda index: index == 2 and self._refresh_ledger())
+        outer.addWidget(self.billing_tabs)
         form = QFormLayout()
         self.bill_client = QLineEdit(); form.addRow("Client:", self.bill_client)
         self.bill_address = QTextEdit(); self.bill_address.setFixedHeight(80); form.addRow("Address:", self.bill_address)
@@ -1080,9 +5417,82 @@ class SarkarGPTPro(QMainWindow):
         self.bill_list = QListWidget(); self.bill_list.setObjectName("BillList")
         l.addWidget(self.bill_list)
         self.btn_gen_invoice = QPushButton("Generate PDF Invoice"); self.btn_gen_invoice.clicked.connect(self._generate_invoice); l.addWidget(self.btn_gen_invoice)
+        export_row = QHBoxLayout()
+        self.bill_pdf_progress = QProgressBar(); self.bill_pdf_progress.hide(); export_row.addWidget(self.bill_pdf_progress)
+        self.bill_pdf_cancel_btn = QPushButton("Cancel"); self.bill_pdf_cancel_btn.clicked.connect(lambda: self._cancel_pdf_export("invoice")); self.bill_pdf_cancel_btn.hide(); export_row.addWidget(self.bill_pdf_cancel_btn)
+        l.addLayout(export_row)
         self._bill_items = []
         return w
 
+    def _billing_tab_batch(self):
+        w = QWidget(); l = QVBoxLayout(w)
+        hint = QLabel("CSV columns: client, address, item, rate, qty, tax, date, invoice (one row per line item, rows grouped by client and invoice). "
+                      "JSON: a list of {client, address, tax, date, items: [{name, rate, qty}]}.")
+        hint.setWordWrap(True); l.addWidget(hint)
+        form = QFormLayout()
+        source_row = QHBoxLayout()
+        self.bill_batch_source = QLineEdit(); self.bill_batch_source.setPlaceholderText("Clients CSV or JSON file"); source_row.addWidget(self.bill_batch_source, 1)
+        source_btn = QPushButton("Browse"); source_btn.clicked.connect(self._browse_invoice_batch_source); source_row.addWidget(source_btn)
+        form.addRow("Source:", source_row)
+        output_row = QHBoxLayout()
+        self.bill_batch_output = QLineEdit(); self.bill_batch_output.setPlaceholderText("Folder for PDFs and manifest.json"); output_row.addWidget(self.bill_batch_output, 1)
+        output_btn = QPushButton("Browse"); output_btn.clicked.connect(self._browse_invoice_batch_output); output_row.addWidget(output_btn)
+        form.addRow("Output:", output_row)
+        self.bill_batch_tax = QSpinBox(); self.bill_batch_tax.setRange(0,100); self.bill_batch_tax.setValue(18); self.bill_batch_tax.setSuffix(" %"); form.addRow("Default Tax:", self.bill_batch_tax)
+        l.addLayout(form)
+        run_row = QHBoxLayout()
+        self.bill_batch_btn = QPushButton("Render Invoices"); self.bill_batch_btn.clicked.connect(self._start_invoice_batch); run_row.addWidget(self.bill_batch_btn)
+        self.bill_batch_progress = QProgressBar(); self.bill_batch_progress.hide(); run_row.addWidget(self.bill_batch_progress, 1)
+        self.bill_batch_cancel_btn = QPushButton("Cancel"); self.bill_batch_cancel_btn.clicked.connect(self._cancel_invoice_batch); self.bill_batch_cancel_btn.hide(); run_row.addWidget(self.bill_batch_cancel_btn)
+        l.addLayout(run_row)
+        self.bill_batch_table = QTableWidget(0, 6)
+        self.bill_batch_table.setHorizontalHeaderLabels(["Client", "Items", "Total", "Pages", "Render (ms)", "Status"])
+        self.bill_batch_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.bill_batch_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.bill_batch_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        l.addWidget(self.bill_batch_table, 1)
+        self.bill_batch_status = QLabel("Ready"); l.addWidget(self.bill_batch_status)
+        self._invoice_batch_cancel = None
+        return w
+
+    def _billing_tab_ledger(self):
+        w = QWidget(); l = QVBoxLayout(w)
+        filters = QHBoxLayout()
+        self.ledger_range_combo = QComboBox(); self.ledger_range_combo.addItems(["All Time", "This Year", "Last 12 Months", "Last 90 Days"])
+        self.ledger_range_combo.currentIndexChanged.connect(self._refresh_ledger)
+        filters.addWidget(QLabel("Range:")); filters.addWidget(self.ledger_range_combo)
+        self.ledger_client_combo = QComboBox(); self.ledger_client_combo.addItem("All Clients")
+        self.ledger_client_combo.currentIndexChanged.connect(self._refresh_ledger)
+        filters.addWidget(QLabel("Client:")); filters.addWidget(self.ledger_client_combo, 1)
+        self.ledger_refresh_btn = QPushButton("Refresh"); self.ledger_refresh_btn.clicked.connect(self._refresh_ledger); filters.addWidget(self.ledger_refresh_btn)
+        l.addLayout(filters)
+        self.ledger_summary = QLabel("No invoices recorded yet."); self.ledger_summary.setWordWrap(True); l.addWidget(self.ledger_summary)
+
+        def table(headers):
+            t = QTableWidget(0, len(headers))
+            t.setHorizontalHeaderLabels(headers)
+            t.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+            t.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+            t.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            return t
+
+        self.ledger_invoice_table = table(["Number", "Date", "Client", "Total", "Status"])
+        self.ledger_invoice_table.itemSelectionChanged.connect(self._on_ledger_invoice_selected)
+        l.addWidget(self.ledger_invoice_table, 2)
+        status_row = QHBoxLayout()
+        self.ledger_items_label = QLabel(""); self.ledger_items_label.setWordWrap(True); status_row.addWidget(self.ledger_items_label, 1)
+        for status in LEDGER_STATUSES:
+            btn = QPushButton(f"Mark {status.title()}"); btn.clicked.connect(partial(self._set_ledger_status, status)); status_row.addWidget(btn)
+        l.addLayout(status_row)
+        reports = QHBoxLayout()
+        self.ledger_month_table = table(["Month", "Invoices", "Revenue", "Tax", "Paid"])
+        self.ledger_client_table = table(["Client", "Invoices", "Revenue", "Outstanding"])
+        self.ledger_tax_table = table(["Rate", "Invoices", "Taxable", "Tax"])
+        reports.addWidget(self.ledger_month_table, 3); reports.addWidget(self.ledger_client_table, 3); reports.addWidget(self.ledger_tax_table, 2)
+        l.addLayout(reports, 3)
+        self._ledger_generation = 0
+        return w
+
     def _page_templates(self):
         w = QWidget(); l = QVBoxLayout(w)
         h = QLabel("Blueprints Manager");
@@ -1138,6 +5548,37 @@ class SarkarGPTPro(QMainWindow):
         t_layout.addWidget(self.btn_apply_theme)
         l.addWidget(theme_group)
 
+        data_group = QGroupBox("Market Data")
+        d_layout = QFormLayout(data_group)
+        self.market_provider_combo = QComboBox()
+        self.market_provider_combo.addItem("Yahoo Finance (online)", "yfinance")
+        self.market_provider_combo.addItem("Offline fixtures (CSV/Parquet or generated)", "fixture")
+        self.market_provider_combo.setCurrentIndex(max(0, self.market_provider_combo.findData(self.prefs.get("market_data_provider", "yfinance"))))
+        d_layout.addRow("Provider:", self.market_provider_combo)
+        fixture_row = QHBoxLayout()
+        self.fixture_dir_input = QLineEdit(self.prefs.get("fixture_dir", os.path.join(APP_DATA_DIR, "fixtures")))
+        fixture_row.addWidget(self.fixture_dir_input)
+        btn_fixture_dir = QPushButton("Browse")
+        btn_fixture_dir.clicked.connect(self._browse_fixture_dir)
+        fixture_row.addWidget(btn_fixture_dir)
+        d_layout.addRow("Fixture folder:", fixture_row)
+        self.fixture_latency_spin = QSpinBox()
+        self.fixture_latency_spin.setRange(0, 10000)
+        self.fixture_latency_spin.setSuffix(" ms")
+        self.fixture_latency_spin.setValue(int(self.prefs.get("fixture_latency_ms", 0)))
+        d_layout.addRow("Simulated latency:", self.fixture_latency_spin)
+        self.fixture_generate_check = QCheckBox("Generate deterministic bars for tickers without a fixture file")
+        self.fixture_generate_check.setChecked(self.prefs.get("fixture_generate", True))
+        d_layout.addRow(self.fixture_generate_check)
+        d_layout.addRow(QLabel("<i>Fixture files are named TICKER_interval.csv / .parquet (or TICKER.csv) with Date, Open, High, Low, Close, Volume columns.</i>"))
+        self.symbol_count_label = QLabel(f"{len(symbol_index)} symbols indexed for autocomplete. Drop a Symbol,Name CSV (or a NASDAQ pipe-delimited listing) at {SYMBOLS_FILE} to extend it.")
+        self.symbol_count_label.setWordWrap(True)
+        d_layout.addRow(self.symbol_count_label)
+        btn_save_data = QPushButton("Apply Market Data Settings")
+        btn_save_data.clicked.connect(self._save_market_data_settings)
+        d_layout.addRow(btn_save_data)
+        l.addWidget(data_group)
+
         keys_group = QGroupBox("API Keys")
         g_layout = QFormLayout(keys_group)
 
@@ -1299,6 +5740,24 @@ class SarkarGPTPro(QMainWindow):
         self.saved_keys = data
         QMessageBox.information(self, "Saved", "API keys saved locally.")
 
+    def _browse_fixture_dir(self):
+        path = QFileDialog.getExistingDirectory(self, "Select fixture folder", self.fixture_dir_input.text())
+        if path:
+            self.fixture_dir_input.setText(path)
+
+    def _save_market_data_settings(self):
+        self.prefs["market_data_provider"] = self.market_provider_combo.currentData()
+        self.prefs["fixture_dir"] = self.fixture_dir_input.text().strip()
+        self.prefs["fixture_latency_ms"] = self.fixture_latency_spin.value()
+        self.prefs["fixture_generate"] = self.fixture_generate_check.isChecked()
+        save_json(PREF_FILE, self.prefs)
+        ohlcv_cache.set_provider(make_market_data_provider(self.prefs))
+        QMessageBox.information(self, "Saved", f"Market data provider set to {ohlcv_cache.provider.name}. Cached prices were cleared.")
+
+    def _toggle_stock_ai_combined(self, checked):
+        self.prefs["stock_ai_combined"] = checked
+        save_json(PREF_FILE, self.prefs)
+
     def _toggle_remember_default(self, state):
         val = bool(state)
         self.remember_messages = val
@@ -1726,6 +6185,11 @@ class SarkarGPTPro(QMainWindow):
         self.current_theme_colors = theme
         self.setStyleSheet(qss)
         self.current_theme = name
+        if hasattr(self, 'stock_chart'):
+            self.stock_chart.set_theme(theme)
+        for chart_name in ('bt_equity_chart', 'bt_drawdown_chart', 'portfolio_heatmap', 'compare_chart'):
+            if hasattr(self, chart_name):
+                getattr(self, chart_name).set_theme(theme)
 
 
     def _send_chat(self):
@@ -2303,17 +6767,37 @@ class SarkarGPTPro(QMainWindow):
         src_code = "auto" if src.lower()=="auto" else self._lang_to_code(src)
         dest_code = self._lang_to_code(dest)
         self.trans_out.setPlainText("Translating...")
+        self._trans_streamed = False
+        self.btn_translate.setEnabled(False)
+        self.trans_progress.setRange(0, 0); self.trans_progress.show()
         threading.Thread(target=self._translate_thread, args=(txt, src_code, dest_code), daemon=True).start()
 
     def _translate_thread(self, text, src, dest):
         try:
-            t = GoogleTranslator(source=src, target=dest).translate(text)
+            t = translate_document(text, src, dest,
+                                   progress=lambda done, total, ready: signals.translate_progress.emit({"done": done, "total": total, "text": ready}))
             signals.translate_done.emit(t)
         except Exception as e:
             signals.translate_done.emit(f"[Translate error: {e}]")
 
+    def _on_translate_progress(self, payload):
+        self.trans_progress.setRange(0, payload["total"])
+        self.trans_progress.setValue(payload["done"])
+        if not payload["text"]:
+            return
+        if not self._trans_streamed:
+            self.trans_out.clear()
+            self._trans_streamed = True
+        self.trans_out.moveCursor(QTextCursor.MoveOperation.End)
+        self.trans_out.insertPlainText(payload["text"])
+
     def _on_translate_done(self, text):
-        self.trans_out.setPlainText(text)
+        self.btn_translate.setEnabled(True)
+        self.trans_progress.hide()
+        if text.startswith("[Translate error") and self._trans_streamed:
+            self.trans_out.append(f"\n{text}")
+        elif self.trans_out.toPlainText() != text:
+            self.trans_out.setPlainText(text)
 
     def _lang_to_code(self, name):
         mapping = {
@@ -2355,10 +6839,7 @@ class SarkarGPTPro(QMainWindow):
             img_data = requests.get(image_url).content
             img = Image.open(io.BytesIO(img_data))
 
-            qim = ImageQt.ImageQt(img.convert("RGBA"))
-            pix = QPixmap.fromImage(qim)
-
-            signals.image_gen_done.emit(pix)
+            signals.image_gen_done.emit(to_qimage(img))
 
         except Exception as e:
             signals.image_gen_done.emit(("error", str(e)))
@@ -2371,6 +6852,8 @@ class SarkarGPTPro(QMainWindow):
             QMessageBox.critical(self, "Image Generation Error", payload[1])
             return
 
+        if isinstance(payload, QImage):
+            payload = QPixmap.fromImage(payload)
         if isinstance(payload, QPixmap):
             prompt = self.img_prompt.toPlainText().strip()[:60]
             item = QListWidgetItem(prompt)
@@ -2403,8 +6886,7 @@ class SarkarGPTPro(QMainWindow):
         try:
             pil = Image.open(path).convert("RGBA")
             self.img2g_pil_image = pil
-            pix = pil_to_qpixmap(pil, maxsize=(self.img2g_preview.width(), self.img2g_preview.height()))
-            self.img2g_preview.setPixmap(pix)
+            self.img2g_preview.set_source(pil)
             self.img2g_output.clear()
             self._update_floating_card("Image Status", "Loaded")
             self._update_floating_card("Analysis", "Ready")
@@ -2526,43 +7008,178 @@ class SarkarGPTPro(QMainWindow):
             QMessageBox.warning(self, "Items", "Add items first."); return
         path, _ = QFileDialog.getSaveFileName(self, "Save Invoice", f"Invoice_{client}.pdf", "PDF Files (*.pdf)")
         if not path: return
+        self._pending_invoice = {"client": client, "address": self.bill_address.toPlainText(), "tax_pct": float(self.bill_tax.value()),
+                                 "date": datetime.now().strftime("%Y-%m-%d"), "items": [dict(it) for it in self._bill_items]}
+        invoice = self._pending_invoice
+        self._start_pdf_export("invoice", path, partial(write_invoice_pdf, date=invoice["date"]), invoice["client"],
+                               invoice["address"], invoice["items"], invoice["tax_pct"])
+
+    def _ledger_filters(self):
+        today = datetime.now()
+        since = {1: f"{today:%Y}-01-01", 2: f"{today - timedelta(days=365):%Y-%m-%d}", 3: f"{today - timedelta(days=90):%Y-%m-%d}"}
+        client = self.ledger_client_combo.currentText() if self.ledger_client_combo.currentIndex() > 0 else None
+        return since.get(self.ledger_range_combo.currentIndex()), client
+
+    def _refresh_ledger(self, *_):
+        self._ledger_generation += 1
+        since, client = self._ledger_filters()
+        threading.Thread(target=self._ledger_report_thread, args=(self._ledger_generation, since, client), daemon=True).start()
+
+    def _ledger_report_thread(self, generation, since, client):
         try:
-            doc = SimpleDocTemplate(path, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            story.append(Paragraph("SarkarGPT Pro Services", styles['Title']))
-            story.append(Paragraph("Invoice", styles['Heading2']))
-            story.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d')}", ParagraphStyle(name='right', parent=styles['Normal'], alignment=TA_RIGHT)))
-            story.append(Spacer(1,0.2*inch))
-            story.append(Paragraph(f"Bill To: {client}", styles['Normal']))
-            story.append(Paragraph(self.bill_address.toPlainText().replace("\n","<br/>"), styles['Normal']))
-            story.append(Spacer(1,0.2*inch))
-            data = [["Item Description","Rate","Qty","Total"]]
-            subtotal = 0.0
-            for it in self._bill_items:
-                data.append([it['name'], english_number(it['rate']), str(it['qty']), english_number(it['total'])])
-                subtotal += it['total']
-            tax_pct = float(self.bill_tax.value())
-            tax_amt = subtotal * tax_pct / 100.0
-            grand = subtotal + tax_amt
-            data.append(["","","Subtotal", english_number(subtotal)])
-            data.append(["","","Tax ("+str(int(tax_pct))+"%)", english_number(tax_amt)])
-            data.append(["","","Total", english_number(grand)])
-            table = Table(data, colWidths=[3*inch,1*inch,0.6*inch,1*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND',(0,0),(-1,0), colors.HexColor("#2C3E50")),
-                ('TEXTCOLOR',(0,0),(-1,0), colors.whitesmoke),
-                ('GRID',(0,0),(-1,-1),0.5,colors.gray),
-                ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor("#E0E5EC")),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#CADBEB")),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')
-            ]))
-            story.append(table); story.append(Spacer(1,0.5*inch))
-            story.append(Paragraph("Thank you for your business!", ParagraphStyle(name='center', parent=styles['Normal'], alignment=TA_CENTER)))
-            doc.build(story)
-            QMessageBox.information(self, "Saved", f"Invoice saved to {path}")
+            t0 = time.perf_counter()
+            report = invoice_ledger.report(since, client)
+            report.update(generation=generation, invoices=invoice_ledger.invoices(since, client),
+                          client_names=invoice_ledger.clients(), elapsed=time.perf_counter() - t0)
+            signals.ledger_report_done.emit(report)
         except Exception as e:
-            QMessageBox.critical(self, "PDF Error", str(e))
+            signals.ledger_report_done.emit(("error", str(e)))
+
+    def _on_ledger_report_done(self, report):
+        if isinstance(report, tuple):
+            self.ledger_summary.setText(f"Ledger unavailable: {report[1]}")
+            return
+        if report["generation"] != self._ledger_generation:
+            return
+
+        def fill(table, rows):
+            table.setRowCount(len(rows))
+            for r, row in enumerate(rows):
+                for c, value in enumerate(row):
+                    table.setItem(r, c, QTableWidgetItem(value))
+
+        money = lambda value: english_number(round(value or 0, 2))
+        fill(self.ledger_invoice_table, [[n, d, c, money(t), st.title()] for n, d, c, t, st, _ in report["invoices"]])
+        fill(self.ledger_month_table, [[m, str(n), money(t), money(tax), money(paid)] for m, n, _, tax, t, paid in report["monthly"]])
+        fill(self.ledger_client_table, [[c, str(n), money(t), money(o)] for c, n, t, o, _ in report["clients"]])
+        fill(self.ledger_tax_table, [[f"{rate:g}%", str(n), money(taxable), money(tax)] for rate, n, taxable, tax in report["taxes"]])
+        current = self.ledger_client_combo.currentText()
+        names = ["All Clients"] + report["client_names"]
+        if [self.ledger_client_combo.itemText(i) for i in range(self.ledger_client_combo.count())] != names:
+            self.ledger_client_combo.blockSignals(True)
+            self.ledger_client_combo.clear(); self.ledger_client_combo.addItems(names)
+            self.ledger_client_combo.setCurrentIndex(names.index(current) if current in names else 0)
+            self.ledger_client_combo.blockSignals(False)
+        count, outstanding, oldest = report["outstanding"]
+        self.ledger_summary.setText(f"Revenue {money(report['revenue'])} · Tax {money(report['tax'])} · "
+                                    f"Outstanding {money(outstanding)} across {count} invoices"
+                                    f"{f' (oldest {oldest})' if oldest else ''} · queried in {report['elapsed'] * 1000:.0f} ms")
+
+    def _selected_ledger_numbers(self):
+        rows = sorted({index.row() for index in self.ledger_invoice_table.selectedIndexes()})
+        return [self.ledger_invoice_table.item(row, 0).text() for row in rows]
+
+    def _on_ledger_invoice_selected(self):
+        numbers = self._selected_ledger_numbers()
+        if len(numbers) != 1:
+            self.ledger_items_label.setText(f"{len(numbers)} invoices selected" if numbers else "")
+            return
+        items = invoice_ledger.items(numbers[0])
+        self.ledger_items_label.setText(" · ".join(f"{name} ({qty:g} x {english_number(rate)})" for name, rate, qty, _ in items))
+
+    def _set_ledger_status(self, status):
+        numbers = self._selected_ledger_numbers()
+        if not numbers:
+            QMessageBox.warning(self, "Ledger", "Select invoices first."); return
+        try:
+            invoice_ledger.set_status(numbers, status)
+        except Exception as e:
+            QMessageBox.critical(self, "Ledger", f"Could not update invoices: {e}"); return
+        self._refresh_ledger()
+
+    def _browse_invoice_batch_source(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Invoice Batch", "", "Invoice Data (*.csv *.json)")
+        if path:
+            self.bill_batch_source.setText(path)
+            if not self.bill_batch_output.text().strip():
+                self.bill_batch_output.setText(os.path.join(os.path.dirname(path), f"Invoices_{datetime.now():%Y%m%d}"))
+
+    def _browse_invoice_batch_output(self):
+        path = QFileDialog.getExistingDirectory(self, "Invoice Output Folder", self.bill_batch_output.text())
+        if path:
+            self.bill_batch_output.setText(path)
+
+    def _start_invoice_batch(self):
+        if SimpleDocTemplate is None:
+            QMessageBox.critical(self, "Error", "ReportLab library not found. Cannot generate PDF.")
+            return
+        source = self.bill_batch_source.text().strip()
+        out_dir = self.bill_batch_output.text().strip()
+        if not source or not os.path.isfile(source):
+            QMessageBox.warning(self, "Source", "Choose a CSV or JSON file of clients and line items."); return
+        if not out_dir:
+            QMessageBox.warning(self, "Output", "Choose an output folder."); return
+        try:
+            invoices = load_invoice_batch(source, self.bill_batch_tax.value())
+        except Exception as e:
+            QMessageBox.critical(self, "Batch Error", f"Could not read {os.path.basename(source)}: {e}"); return
+        if not invoices:
+            QMessageBox.warning(self, "Batch", "The file contains no invoices."); return
+        self.bill_batch_table.setRowCount(len(invoices))
+        for row, invoice in enumerate(invoices):
+            values = [invoice["client"], str(len(invoice["items"])), "", "", "", "Queued"]
+            for column, value in enumerate(values):
+                self.bill_batch_table.setItem(row, column, QTableWidgetItem(value))
+        self._invoice_batch_cancel = threading.Event()
+        self.bill_batch_progress.setRange(0, len(invoices)); self.bill_batch_progress.setValue(0); self.bill_batch_progress.show()
+        self.bill_batch_cancel_btn.setEnabled(True); self.bill_batch_cancel_btn.show()
+        self.bill_batch_btn.setEnabled(False)
+        self.bill_batch_status.setText(f"Rendering {len(invoices)} invoices...")
+        threading.Thread(target=self._invoice_batch_thread, args=(invoices, out_dir, source, self._invoice_batch_cancel), daemon=True).start()
+
+    def _invoice_batch_thread(self, invoices, out_dir, source, cancel):
+        progress = lambda done, total, entry: signals.invoice_batch_progress.emit({"done": done, "total": total, "entry": entry})
+        try:
+            try:
+                result = write_invoice_batch(invoices, out_dir, source, process_pool(), progress, cancel)
+            except BrokenProcessPool as e:
+                print(f"Process pool batch failed: {e}. Rendering invoices in-process.")
+                shutdown_process_pool()
+                result = write_invoice_batch(invoices, out_dir, source, None, progress, cancel)
+            try:
+                invoice_ledger.record_many([(invoice, os.path.join(out_dir, entry["file"]))
+                                            for invoice, entry in zip(invoices, result["invoices"]) if entry["status"] == "ok"])
+            except Exception as e:
+                result["ledger_error"] = str(e)
+            signals.invoice_batch_progress.emit(result)
+        except Exception as e:
+            signals.invoice_batch_progress.emit(("error", f"{e}\n{traceback.format_exc()}"))
+
+    def _cancel_invoice_batch(self):
+        if self._invoice_batch_cancel is not None:
+            self._invoice_batch_cancel.set()
+            self.bill_batch_cancel_btn.setEnabled(False)
+
+    def _on_invoice_batch_progress(self, payload):
+        if isinstance(payload, dict) and "entry" in payload:
+            entry = payload["entry"]
+            values = {2: english_number(entry["total"]), 3: str(entry["pages"] or ""),
+                      4: f"{entry['render_ms']:.0f}" if entry["render_ms"] is not None else "",
+                      5: "Done" if entry["status"] == "ok" else f"Failed: {entry.get('error', '')}"}
+            for column, value in values.items():
+                self.bill_batch_table.setItem(entry["index"], column, QTableWidgetItem(value))
+            self.bill_batch_progress.setValue(payload["done"])
+            self.bill_batch_status.setText(f"Rendered {payload['done']}/{payload['total']} invoices...")
+            return
+        self._invoice_batch_cancel = None
+        self.bill_batch_progress.hide()
+        self.bill_batch_cancel_btn.hide()
+        self.bill_batch_btn.setEnabled(True)
+        if isinstance(payload, tuple):
+            self.bill_batch_status.setText("Batch failed.")
+            QMessageBox.critical(self, "Batch Error", f"Failed to render invoices: {payload[1]}")
+        else:
+            for index, entry in enumerate(payload["invoices"]):
+                if entry["status"] == "cancelled":
+                    self.bill_batch_table.setItem(index, 5, QTableWidgetItem("Cancelled"))
+            failed = f" · {payload['failed']} failed" if payload["failed"] else ""
+            if payload["cancelled"]:
+                failed += f" · cancelled, {payload['cancelled']} not rendered"
+            if "ledger_error" in payload:
+                failed += f" · not recorded in ledger: {payload['ledger_error']}"
+            average = payload["render_ms_total"] / max(1, payload["count"] - payload["failed"] - payload["cancelled"])
+            self.bill_batch_status.setText(f"{payload['count']} invoices in {payload['elapsed']:.1f}s{failed} · avg render {average:.0f} ms, "
+                                           f"max {payload['render_ms_max'] or 0:.0f} ms · total {english_number(payload['grand_total'])} · manifest: {payload['path']}")
 
     def _book_add_chapter(self):
         title = self.book_chapter_input.text().strip()
@@ -2601,10 +7218,6 @@ class SarkarGPTPro(QMainWindow):
             QMessageBox.warning(self, "API Key Missing", "OpenAI key is missing. Please set it in Configuration.")
             return
 
-        self.book_gen_status.setText("Generating...")
-        self.book_generate_btn.setEnabled(False)
-        self.book_save_pdf_btn.setEnabled(False)
-
         book_data = {
             "title": self.book_title_input.text(),
             "author": self.book_author_input.text(),
@@ -2617,103 +7230,222 @@ class SarkarGPTPro(QMainWindow):
             "custom_instructions": self.book_custom_instructions.toPlainText().strip()
         }
 
-        threading.Thread(target=self._call_book_api, args=(key, book_data), daemon=True).start()
+        project = BookProject(book_data["title"])
+        resume = False
+        if project.outline:
+            ret = QMessageBox.question(self, "Resume Book",
+                                       f"A saved project for '{book_data['title']}' has {project.written()}/{len(project.sections)} sections written.\n\n"
+                                       "Resume it? Choose No to start over with the current settings.",
+                                       QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel)
+            if ret == QMessageBox.StandardButton.Cancel:
+                return
+            resume = ret == QMessageBox.StandardButton.Yes
+
+        self.book_project = project
+        self.book_gen_status.setText("Resuming..." if resume else "Outlining...")
+        self._set_book_busy(True)
+        threading.Thread(target=self._book_generation_thread, args=(key, book_data, self.book_workers_spin.value(), project, resume), daemon=True).start()
+
+    def _set_book_busy(self, busy):
+        self._book_busy = busy
+        self.book_generate_btn.setEnabled(not busy)
+        self.book_regenerate_btn.setEnabled(not busy)
+        self.book_save_pdf_btn.setEnabled(not busy and "book" not in self._pdf_exports)
+
+    def _save_book_workers(self, value):
+        self.prefs["book_workers"] = value
+        save_json(PREF_FILE, self.prefs)
+
+    def _book_outline(self, key, data):
+        resp = openai_client(key).chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": book_outline_prompt(data)}],
+            response_format={"type": "json_object"}
+        )
+        outline = []
+        for chapter in json.loads(resp.choices[0].message.content).get("chapters") or []:
+            if isinstance(chapter, dict) and str(chapter.get("title", "")).strip():
+                outline.append({"title": str(chapter["title"]).strip(), "summary": str(chapter.get("summary", "")).strip()})
+        if data['chapters']:
+            summaries = {chapter["title"].lower(): chapter["summary"] for chapter in outline}
+            outline = [{"title": title, "summary": summaries.get(title.lower(), outline[i]["summary"] if i < len(outline) else "")}
+                       for i, title in enumerate(data['chapters'])]
+        if not outline:
+            raise ValueError("The outline request returned no chapters.")
+        return outline
+
+    def _book_write_section(self, key, data, outline, index, section):
+        signals.book_section_update.emit(index, "writing", None)
+        stream = openai_client(key).chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": book_section_prompt(data, outline, section)}],
+            stream=True
+        )
+        parts, pending, last = [], [], time.monotonic()
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                pending.append(delta)
+            if pending and time.monotonic() - last >= BOOK_STREAM_INTERVAL:
+                signals.book_section_stream.emit(index, "".join(pending))
+                pending, last = [], time.monotonic()
+        if pending:
+            signals.book_section_stream.emit(index, "".join(pending))
+        text = clean_book_section("".join(parts))
+        if not text:
+            raise ValueError("Empty response")
+        return text
 
-    def _call_book_api(self, key, data):
+    def _book_generation_thread(self, key, data, workers, project, resume=False):
         try:
             if OpenAI is None:
                 raise ImportError("OpenAI library is not installed or failed to import. Please run: pip install openai")
-
-            client = OpenAI(api_key=key)
-
-            prompt = f"""
-            You are a professional author. Your task is to write a complete book based on the following specifications.
-            The response MUST be in Markdown format, with '#' for the title, '##' for chapter headings, and '###' for sub-sections.
-            Use '---' on its own line to indicate a new page break.
-
-            *** IMPORTANT: The entire book must be written in English. ***
-
-            SPECIFICATIONS:
-            - Book Title: {data['title']}
-            - Author: {data['author']}
-            - Difficulty Level: {data['difficulty']}
-            - Writing Style: {data['style']}
-            """
-
-            if data['custom_instructions']:
-                prompt += f"\n- Custom Instructions: {data['custom_instructions']}\n"
-
-            prompt += f"""
-            STRUCTURE:
-            1.  **Title Page**: Generate a professional title page with Title and Author.
-            2.  **Preface**: Write a preface. If user provided one, use it as a base: "{data['preface']}"
-            3.  **Introduction**: Write the introduction. If user provided one, use it as a base: "{data['intro']}"
-            4.  **Chapters**: Write content for the following chapters.
-                {chr(10).join([f"    - Chapter {i+1}: {title}" for i, title in enumerate(data['chapters'])])}
-            5.  **Conclusion**: Write the conclusion. If user provided one, use it as a base: "{data['conclusion']}"
-
-            INSTRUCTIONS:
-            - Write comprehensive, high-quality content for each section.
-            - Ensure the tone matches the requested difficulty, style, and custom instructions.
-            - Format the entire output as a single, continuous Markdown document.
-            - Use page breaks '---' appropriately (e.g., before each new chapter).
-
-            BEGIN BOOK:
-            # {data['title']}
-            *By {data['author']}*
-
-            ---
-            ## Preface
-            """
-
-            if data['preface']:
-                prompt += f"{data['preface']}\n\n"
+            if resume and project.outline:
+                data, outline = project.data, project.outline
             else:
-                prompt += "Write a compelling preface for this book...\n\n"
-
-            prompt += "---\n## Introduction\n"
-
-            if data['intro']:
-                prompt += f"{data['intro']}\n\n"
-            else:
-                prompt += "Write a detailed introduction for this book, outlining its purpose and scope...\n\n"
-
-            if not data['chapters']:
-                prompt += "No chapters were provided. Please generate 3-5 relevant chapters based on the title.\n\n"
-            else:
-                for i, title in enumerate(data['chapters']):
-                    prompt += f"---\n## Chapter {i+1}: {title}\n"
-                    prompt += f"Write the full content for this chapter, keeping in mind the book's difficulty ('{data['difficulty']}'), style ('{data['style']}'), and custom instructions. Use sub-sections (###) if needed.\n\n"
+                project.reset()
+                outline = self._book_outline(key, data)
+                project.start(data, outline, book_sections(data, outline))
+        except Exception as e:
+            signals.book_gen_done.emit(f"[BOOK GENERATION ERROR: {e}]")
+            return
 
-            prompt += "---\n## Conclusion\n"
-            if data['conclusion']:
-                prompt += f"{data['conclusion']}\n\n"
+        sections = project.sections
+        signals.book_outline_done.emit((data, [dict(section) for section in sections]))
+        pending = []
+        for i, section in enumerate(sections):
+            text = project.section_text(section["key"])
+            if text is None:
+                pending.append(i)
             else:
-                prompt += "Write a strong concluding chapter, summarizing the key takeaways and looking to the future...\n\n"
-
-            prompt += "---"
-
-            resp = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role":"user","content":prompt}])
-            text = getattr(resp.choices[0].message, "content", None) or str(resp)
-
-            signals.book_gen_done.emit(text)
+                signals.book_section_update.emit(i, "done", text)
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, BOOK_MAX_WORKERS))) as pool:
+            futures = {pool.submit(self._book_write_section, key, data, outline, i, sections[i]): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    text = future.result()
+                    project.save_section(sections[i]["key"], text)
+                    signals.book_section_update.emit(i, "done", text)
+                except Exception as e:
+                    failed += 1
+                    project.mark_failed(sections[i]["key"], str(e))
+                    signals.book_section_update.emit(i, "error", str(e))
+        signals.book_gen_done.emit(f"{failed} of {len(pending)} sections failed" if failed else "")
+
+    def _book_regenerate_section(self):
+        project = self.book_project
+        index = self.book_section_list.currentRow()
+        if project is None or not project.outline or index < 0 or index >= len(self.book_section_anchors):
+            QMessageBox.warning(self, "Selection Error", "Generate a book, then select a section to regenerate.")
+            return
+        key = self._get_api_key("openai")
+        if not key or "your-default" in key:
+            QMessageBox.warning(self, "API Key Missing", "OpenAI key is missing. Please set it in Configuration.")
+            return
+        self.book_gen_status.setText(f"Regenerating {project.sections[index]['title']}...")
+        self._set_book_busy(True)
+        threading.Thread(target=self._book_regenerate_thread, args=(key, project, index), daemon=True).start()
 
+    def _book_regenerate_thread(self, key, project, index):
+        section = project.sections[index]
+        try:
+            text = self._book_write_section(key, project.data, project.outline, index, section)
+            project.save_section(section["key"], text)
+            signals.book_section_update.emit(index, "done", text)
+            signals.book_gen_done.emit("")
         except Exception as e:
-            signals.book_gen_done.emit(f"[BOOK GENERATION ERROR: {e}]")
+            project.mark_failed(section["key"], str(e))
+            signals.book_section_update.emit(index, "error", str(e))
+            signals.book_gen_done.emit(f"{section['title']} failed")
+
+    def _on_book_outline_done(self, payload):
+        data, sections = payload
+        self.book_sections = sections
+        self.book_content_editor.setMarkdown(book_skeleton(data, sections))
+        self.book_section_anchors = []
+        block = self.book_content_editor.document().begin()
+        while block.isValid():
+            if block.blockFormat().headingLevel() == 2:
+                self.book_section_anchors.append(QTextCursor(block))
+            block = block.next()
+        self.book_section_list.clear()
+        for section in sections:
+            self.book_section_list.addItem(f"{section['title']}  —  queued")
+        self._update_floating_card("Chapters", str(sum(section['kind'] == "chapter" for section in sections)))
+        self.book_gen_status.setText(f"Writing 0/{len(sections)} sections...")
+
+    def _book_section_cursor(self, index):
+        doc = self.book_content_editor.document()
+        heading = self.book_section_anchors[index].block()
+        cursor = QTextCursor(doc)
+        if not heading.next().isValid():
+            cursor.setPosition(heading.position() + heading.length() - 1)
+            cursor.insertBlock()
+            return cursor
+        start = heading.next().position()
+        if index + 1 < len(self.book_section_anchors):
+            end = self.book_section_anchors[index + 1].position() - 1
+        else:
+            end = doc.characterCount() - 1
+        cursor.setPosition(start)
+        cursor.setPosition(max(start, end), QTextCursor.MoveMode.KeepAnchor)
+        return cursor
 
-    def _on_book_gen_done(self, text):
-        self.book_content_editor.setMarkdown(text)
-        self.book_gen_status.setText("Generation Complete")
-        self.book_generate_btn.setEnabled(True)
-        self.book_save_pdf_btn.setEnabled(True)
+    def _on_book_section_update(self, index, state, payload):
+        if index >= len(self.book_sections) or index >= len(self.book_section_anchors):
+            return
+        section = self.book_sections[index]
+        section['state'] = state
+        if state == "done":
+            self._book_section_cursor(index).insertMarkdown(payload)
+        elif state == "error":
+            self._book_section_cursor(index).insertMarkdown(f"*Generation failed: {payload}*")
+        label = {"writing": "writing...", "done": "done", "error": f"failed: {payload}"}[state]
+        self.book_section_list.item(index).setText(f"{section['title']}  —  {label}")
+        finished = sum(s.get('state') in ("done", "error") for s in self.book_sections)
+        self.book_gen_status.setText(f"Writing {finished}/{len(self.book_sections)} sections...")
+
+    def _on_book_section_stream(self, index, delta):
+        if index >= len(self.book_sections) or index >= len(self.book_section_anchors):
+            return
+        section = self.book_sections[index]
+        cursor = self._book_section_cursor(index)
+        if section.get('state') != "streaming":
+            section['state'] = "streaming"
+            cursor.removeSelectedText()
+            cursor.setBlockFormat(QTextBlockFormat())
+            cursor.setCharFormat(QTextCharFormat())
+        else:
+            cursor.setPosition(cursor.selectionEnd())
+        cursor.insertText(delta)
+
+    def _book_jump_to_section(self, item):
+        index = self.book_section_list.row(item)
+        if index < len(self.book_section_anchors):
+            self.book_content_editor.setTextCursor(QTextCursor(self.book_section_anchors[index].block()))
+            self.book_content_editor.ensureCursorVisible()
+
+    def _on_book_gen_done(self, message):
+        if message.startswith("[BOOK GENERATION ERROR"):
+            self.book_sections = []
+            self.book_section_anchors = []
+            self.book_section_list.clear()
+            self.book_content_editor.setMarkdown(message)
+            self.book_gen_status.setText("Generation Failed")
+        else:
+            self.book_gen_status.setText(f"Generation Complete ({message})" if message else "Generation Complete")
+        self._set_book_busy(False)
 
     def _save_book_pdf(self):
         if SimpleDocTemplate is None:
             QMessageBox.critical(self, "Error", "ReportLab library not found. Cannot save PDF.")
             return
 
-        text = self.book_content_editor.toPlainText()
-        if not text:
+        text = self.book_content_editor.toMarkdown()
+        if not text.strip():
             QMessageBox.warning(self, "Error", "No content to save.")
             return
 
@@ -2721,54 +7453,98 @@ class SarkarGPTPro(QMainWindow):
         path, _ = QFileDialog.getSaveFileName(self, "Save Book as PDF", f"{title}.pdf", "PDF Files (*.pdf)")
         if not path:
             return
+        self._start_pdf_export("book", path, write_book_pdf, text, title)
 
-        try:
-            doc = SimpleDocTemplate(path, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
-            story = []
-
-            title_style = ParagraphStyle(name='TitleStyle', fontSize=32, alignment=TA_CENTER, spaceAfter=20, fontName='Helvetica-Bold', textColor=colors.HexColor("#1A2642"))
-            author_style = ParagraphStyle(name='AuthorStyle', fontSize=16, alignment=TA_CENTER, spaceAfter=40, fontName='Helvetica-Oblique', textColor=colors.HexColor("#555555"))
-            h1_style = ParagraphStyle(name='H1', fontSize=20, fontName='Helvetica-Bold', spaceBefore=20, spaceAfter=10, textColor=colors.HexColor("#1F1F32"), borderPadding=4, borderBottomWidth=1, borderBottomColor=colors.HexColor("#1F1F32"))
-            h2_style = ParagraphStyle(name='H2', fontSize=16, fontName='Helvetica-Bold', spaceBefore=10, spaceAfter=5, textColor=colors.HexColor("#20314e"))
-            h3_style = ParagraphStyle(name='H3', fontSize=14, fontName='Helvetica-Bold', spaceBefore=5, textColor=colors.HexColor("#2C3E50"))
-            body_style = ParagraphStyle(name='Body', fontSize=10, alignment=TA_JUSTIFY, spaceAfter=5, leading=14, fontName='Helvetica')
-
-            lines = text.split('\n')
-
-            for line in lines:
-                line_stripped = line.strip()
-                if not line_stripped:
-                    story.append(Spacer(1, 0.2*cm))
-                    continue
-
-                if line_stripped.startswith("# "):
-                    story.append(Paragraph(line_stripped[2:], title_style))
-                elif line_stripped.startswith("## "):
-                    story.append(Paragraph(line_stripped[3:], h1_style))
-                elif line_stripped.startswith("### "):
-                    story.append(Paragraph(line_stripped[4:], h2_style))
-                elif line_stripped.startswith("#### "):
-                    story.append(Paragraph(line_stripped[5:], h3_style))
-                elif line_stripped.startswith("---"):
-                    story.append(PageBreak())
-                elif line_stripped.startswith("*By "):
-                    story.append(Paragraph(line_stripped, author_style))
-                else:
-                    story.append(Paragraph(line, body_style))
-
-            doc.build(story, onFirstPage=self._add_page_numbers, onLaterPages=self._add_page_numbers)
-            QMessageBox.information(self, "Success", f"Book saved successfully to {path}")
+    def _export_book(self, fmt):
+        text = self.book_content_editor.toMarkdown()
+        if not text.strip():
+            QMessageBox.warning(self, "Error", "No content to save.")
+            return
+        title = self.book_title_input.text()
+        label, pattern = ("EPUB", "EPUB Files (*.epub)") if fmt == "epub" else ("HTML", "HTML Files (*.html)")
+        path, _ = QFileDialog.getSaveFileName(self, f"Export Book as {label}", f"{title}.{fmt}", pattern)
+        if not path:
+            return
+        self.book_export_epub_btn.setEnabled(False)
+        self.book_export_html_btn.setEnabled(False)
+        self.book_gen_status.setText(f"Exporting {label}...")
+        threading.Thread(target=self._export_book_thread, args=(path, fmt, label, title, self.book_author_input.text(), text), daemon=True).start()
 
+    def _export_book_thread(self, path, fmt, label, title, author, text):
+        try:
+            signals.book_export_done.emit(dict(export_book(path, fmt, title, author, text), label=label))
         except Exception as e:
-            QMessageBox.critical(self, "PDF Error", f"Failed to generate PDF: {e}\n{traceback.format_exc()}")
-
-    def _add_page_numbers(self, canvas, doc):
-        canvas.saveState()
-        page_num = canvas.getPageNumber()
-        if page_num > 1:
-            canvas.setFont('Helvetica', 9)
-            canvas.drawRightString(doc.width + doc.leftMargin, 1.5 * cm, f"Page {page_num - 1}")
-        canvas.restoreState()
+            signals.book_export_done.emit(("error", label, str(e)))
+
+    def _on_book_export_done(self, result):
+        self.book_export_epub_btn.setEnabled(True)
+        self.book_export_html_btn.setEnabled(True)
+        if isinstance(result, tuple):
+            self.book_gen_status.setText(f"{result[1]} export failed")
+            QMessageBox.critical(self, "Export Error", f"Failed to export {result[1]}: {result[2]}")
+            return
+        self.book_gen_status.setText(f"{result['label']} exported · rebuilt {result['rebuilt']}/{result['chapters']} chapters in {result['elapsed'] * 1000:.0f} ms")
+
+    def _pdf_export_widgets(self, job):
+        if job == "book":
+            return self.book_pdf_progress, self.book_pdf_cancel_btn, self.book_save_pdf_btn
+        return self.bill_pdf_progress, self.bill_pdf_cancel_btn, self.btn_gen_invoice
+
+    def _start_pdf_export(self, job, path, writer, *args):
+        cancel = threading.Event()
+        self._pdf_exports[job] = cancel
+        bar, cancel_btn, start_btn = self._pdf_export_widgets(job)
+        bar.setRange(0, 0)
+        bar.show()
+        cancel_btn.setEnabled(True)
+        cancel_btn.show()
+        start_btn.setEnabled(False)
+        threading.Thread(target=self._pdf_export_thread, args=(job, path, writer, args, cancel), daemon=True).start()
+
+    def _pdf_export_thread(self, job, path, writer, args, cancel):
+        try:
+            t0 = time.perf_counter()
+            state = writer(path, *args, progress=lambda state: signals.pdf_progress.emit(job, state), cancel=cancel)
+            signals.pdf_done.emit(job, {"path": path, "pages": state["page"], "elapsed": time.perf_counter() - t0})
+        except PdfBuildCancelled:
+            signals.pdf_done.emit(job, ("cancelled", path))
+        except Exception as e:
+            signals.pdf_done.emit(job, ("error", f"{e}\n{traceback.format_exc()}"))
+
+    def _cancel_pdf_export(self, job):
+        cancel = self._pdf_exports.get(job)
+        if cancel is not None:
+            cancel.set()
+            self._pdf_export_widgets(job)[1].setEnabled(False)
+
+    def _on_pdf_progress(self, job, state):
+        bar = self._pdf_export_widgets(job)[0]
+        bar.setRange(0, 100)
+        bar.setValue(min(100, int(100 * state["done"] / state["total"])))
+        bar.setFormat(f"Pass {state['pass']} · Page {state['page']} · %p%" if state["pass"] > 1 else f"Page {state['page']} · %p%")
+
+    def _on_pdf_done(self, job, result):
+        self._pdf_exports.pop(job, None)
+        bar, cancel_btn, start_btn = self._pdf_export_widgets(job)
+        bar.hide()
+        cancel_btn.hide()
+        if job == "book":
+            self._set_book_busy(self._book_busy)
+        else:
+            start_btn.setEnabled(True)
+        if isinstance(result, tuple) and result[0] == "cancelled":
+            QMessageBox.information(self, "Export Cancelled", "The PDF export was cancelled.")
+        elif isinstance(result, tuple):
+            QMessageBox.critical(self, "PDF Error", f"Failed to generate PDF: {result[1]}")
+        elif job == "book":
+            QMessageBox.information(self, "Success", f"Book saved successfully to {result['path']} ({result['pages']} pages)")
+        else:
+            try:
+                number = invoice_ledger.record(self._pending_invoice, result["path"])
+            except Exception as e:
+                QMessageBox.warning(self, "Ledger", f"Invoice saved to {result['path']} but could not be recorded: {e}")
+                return
+            QMessageBox.information(self, "Saved", f"Invoice {number} saved to {result['path']}")
 
 
     def _on_stock_list_selected(self, item):
@@ -2776,11 +7552,42 @@ class SarkarGPTPro(QMainWindow):
         self.stock_search_input.setText(ticker)
         self._search_stock()
 
+    def _update_symbol_suggestions(self, text):
+        matches = symbol_index.search(text, 12)
+        self.stock_symbol_model.setStringList([f"{symbol}  —  {name}" for symbol, name in matches])
+        if matches:
+            self.stock_completer.complete()
+        else:
+            self.stock_completer.popup().hide()
+
+    def _on_symbol_completed(self, text):
+        QTimer.singleShot(0, lambda: self.stock_search_input.setText(text.split()[0]))
+
+    def _confirm_ticker(self, ticker):
+        if ticker in symbol_index or ticker in self._confirmed_tickers or ohlcv_cache.snapshot(ticker)[0] is not None:
+            return True
+        suggestions = [symbol for symbol, _ in symbol_index.search(ticker, 5) if symbol != ticker]
+        message = f"'{ticker}' is not in the local symbol list."
+        if suggestions:
+            message += f"\n\nDid you mean: {', '.join(suggestions)}?"
+        message += "\n\nSearch for it online anyway?"
+        answer = QMessageBox.question(self, "Unknown Ticker", message)
+        if answer == QMessageBox.StandardButton.Yes:
+            self._confirmed_tickers.add(ticker)
+            return True
+        if suggestions:
+            self.stock_search_input.setText(suggestions[0])
+        return False
+
     def _search_stock(self):
         ticker = self.stock_search_input.text().strip().upper()
         if not ticker:
             QMessageBox.warning(self, "Input Error", "Please enter a stock ticker.")
             return
+        if self.stock_completer.popup().isVisible():
+            self.stock_completer.popup().hide()
+        if not self._confirm_ticker(ticker):
+            return
 
         if OpenAI is None:
             QMessageBox.critical(self, "Error", "OpenAI library not found. Cannot analyze stock.")
@@ -2796,6 +7603,7 @@ class SarkarGPTPro(QMainWindow):
         self.stock_overview_display.setPlainText(f"Searching for {ticker} overview...")
         self.stock_analytics_display.setPlainText("Requesting AI analysis...")
         self.stock_graph_label.setText(f"Loading graph for {ticker}...")
+        self.stock_chart.set_message(f"Loading graph for {ticker}...")
 
         self.trading_tabs.setCurrentWidget(self.tab1_market)
 
@@ -2805,120 +7613,166 @@ class SarkarGPTPro(QMainWindow):
 
         period = self.period_combo.currentText()
 
-        threading.Thread(target=self._call_stock_overview_api, args=(key, ticker), daemon=True).start()
-        threading.Thread(target=self._call_stock_analytics_api, args=(key, ticker), daemon=True).start()
-        threading.Thread(target=self._load_stock_graph, args=(ticker, period), daemon=True).start()
-
-    def _call_stock_overview_api(self, key, ticker):
-        try:
-            client = OpenAI(api_key=key)
-            safe_prompt = f"""
+        overview = stock_ai_cache.get(f"overview:{ticker}", STOCK_OVERVIEW_TTL)
+        sentiment = stock_ai_cache.get(f"sentiment:{ticker}:{period}", STOCK_SENTIMENT_TTL)
+        if overview is not None:
+            self._on_stock_overview_done(overview)
+        if sentiment is not None:
+            self._on_stock_analytics_done(sentiment)
+        if overview is None and sentiment is None and self.stock_ai_combined_check.isChecked():
+            threading.Thread(target=self._call_stock_combined_api, args=(key, ticker, period), daemon=True).start()
+        else:
+            if overview is None:
+                threading.Thread(target=self._call_stock_overview_api, args=(key, ticker), daemon=True).start()
+            if sentiment is None:
+                threading.Thread(target=self._call_stock_analytics_api, args=(key, ticker, period), daemon=True).start()
+        render = self.stock_chart_stack.currentWidget() is self.stock_graph_label
+        interval = self.interval_combo.currentText()
+        threading.Thread(target=self._load_stock_graph, args=(ticker, period, render, interval, self._next_stock_render()),
+                         daemon=True).start()
+
+    def _reload_stock_graph(self, *_):
+        ticker = self.current_stock_ticker
+        if not ticker:
+            return
+        render = self.stock_chart_stack.currentWidget() is self.stock_graph_label
+        self.stock_chart.set_message(f"Loading graph for {ticker}...")
+        threading.Thread(target=self._load_stock_graph,
+                         args=(ticker, self.period_combo.currentText(), render, self.interval_combo.currentText(),
+                               self._next_stock_render()),
+                         daemon=True).start()
+
+    def _next_stock_render(self):
+        self._stock_render_generation += 1
+        return self._stock_render_generation
+
+    def _stock_overview_prompt(self, ticker):
+        return f"""
             Provide a brief, factual overview of the company with the stock ticker '{ticker}'.
             What are its main products or services and a brief, neutral history?
 
             IMPORTANT: Do not provide any financial analysis, price targets, stock predictions, investment advice, or any opinion on whether to buy, sell, or hold the stock.
             Only provide factual, public-domain information.
             """
-            resp = client.chat.completions.create(
+
+    def _stock_analytics_prompt(self, ticker, period):
+        analytics_prompt = f"""
+            Please rate the share '{ticker}' for buying and selling based on recent public sentiment and news analysis.
+
+            IMPORTANT: Do not provide any financial advice, price targets, or direct recommendations to buy or sell.
+            Your response will be prefixed with a disclaimer.
+            Simply provide a neutral analysis of the sentiment (e.g., "Positive", "Negative", "Neutral") and summarize the key news driving this sentiment.
+            """
+        try:
+            ohlcv_cache.get(ticker, period, "1d")
+            technicals = indicator_engine.snapshot_text(ticker, "1d")
+        except Exception:
+            technicals = ""
+        if technicals:
+            analytics_prompt += f"""
+            Technical indicators computed locally from daily price data (use these exact numbers, do not invent others):
+            {technicals}
+            """
+        return analytics_prompt
+
+    def _call_stock_overview_api(self, key, ticker):
+        try:
+            resp = openai_client(key).chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[{"role": "user", "content": safe_prompt}]
+                messages=[{"role": "user", "content": self._stock_overview_prompt(ticker)}]
             )
             text = getattr(resp.choices[0].message, "content", None) or str(resp)
+            stock_ai_cache.put(f"overview:{ticker}", text)
             signals.stock_overview_done.emit(text)
         except Exception as e:
             signals.stock_overview_done.emit(f"[STOCK OVERVIEW ERROR: {e}]")
 
-    def _call_stock_analytics_api(self, key, ticker):
+    def _call_stock_analytics_api(self, key, ticker, period="6mo"):
         try:
-            client = OpenAI(api_key=key)
-            analytics_prompt = f"""
-            Please rate the share '{ticker}' for buying and selling based on recent public sentiment and news analysis.
-
-            IMPORTANT: Do not provide any financial advice, price targets, or direct recommendations to buy or sell.
-            Your response will be prefixed with a disclaimer.
-            Simply provide a neutral analysis of the sentiment (e.g., "Positive", "Negative", "Neutral") and summarize the key news driving this sentiment.
-            """
-            resp = client.chat.completions.create(
+            resp = openai_client(key).chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[{"role": "user", "content": analytics_prompt}]
+                messages=[{"role": "user", "content": self._stock_analytics_prompt(ticker, period)}]
             )
             text = getattr(resp.choices[0].message, "content", None) or str(resp)
+            stock_ai_cache.put(f"sentiment:{ticker}:{period}", text)
             signals.stock_analytics_done.emit(text)
         except Exception as e:
             signals.stock_analytics_done.emit(f"[STOCK ANALYTICS ERROR: {e}]")
 
-    def _load_stock_graph(self, ticker, period="6mo"):
-        try:
-            theme = self.current_theme_colors
-            is_dark = theme.get("is_dark", True)
-            bg = theme.get("card_bg", "#2a2a3e")
-            if "gradient" in bg:
-                bg = theme.get("card_bg").split("stop:1 ")[-1].strip(")") if is_dark else "#ffffff"
-            text_color = theme.get("text", "#e0e0e0") if is_dark else theme.get("text", "#222222")
-            up_color = theme.get("accent", "#2ECC71")
-            down_color = "#E74C3C"
-
-            mc = mpf.make_marketcolors(up=up_color, down=down_color,
-                                       wick={'up':up_color, 'down':down_color},
-                                       volume={'up':up_color, 'down':down_color},
-                                       edge="inherit")
-
-            mpf_style = mpf.make_mpf_style(base_mpf_style='nightclouds' if is_dark else 'default',
-                                           marketcolors=mc,
-                                           facecolor=bg,
-                                           edgecolor=text_color,
-                                           figcolor=bg,
-                                           gridcolor=theme.get("glass", "#444444"),
-                                           gridstyle="--",
-                                           y_on_right=True,
-                                           rc={'axes.labelcolor': text_color,
-                                               'xtick.color': text_color,
-                                               'ytick.color': text_color,
-                                               'text.color': text_color,
-                                               'figure.facecolor': bg,
-                                               'axes.facecolor': bg})
-
-            data = yf.download(ticker, period=period, interval="1d", auto_adjust=True)
-            if data.empty:
-                raise Exception(f"No data found for ticker {ticker} (period: {period})")
+    def _call_stock_combined_api(self, key, ticker, period="6mo"):
+        prompt = f"""
+            Answer two tasks and reply with a JSON object with exactly two string fields, "overview" and "sentiment".
 
-            for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                if col in data.columns:
-                    data[col] = pd.to_numeric(data[col], errors='coerce')
+            Task "overview":
+            {self._stock_overview_prompt(ticker)}
 
-            data = data.dropna()
+            Task "sentiment":
+            {self._stock_analytics_prompt(ticker, period)}
+            """
+        try:
+            resp = openai_client(key).chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"}
+            )
+            result = json.loads(resp.choices[0].message.content)
+            overview, sentiment = str(result["overview"]), str(result["sentiment"])
+        except Exception as e:
+            signals.stock_overview_done.emit(f"[STOCK OVERVIEW ERROR: {e}]")
+            signals.stock_analytics_done.emit(f"[STOCK ANALYTICS ERROR: {e}]")
+            return
+        stock_ai_cache.put(f"overview:{ticker}", overview)
+        stock_ai_cache.put(f"sentiment:{ticker}:{period}", sentiment)
+        signals.stock_overview_done.emit(overview)
+        signals.stock_analytics_done.emit(sentiment)
 
+    def _load_stock_graph(self, ticker, period="6mo", render=False, interval="1d", generation=0):
+        period = clamp_period(period, interval)
+        try:
+            data = ohlcv_cache.get(ticker, period, interval)
             if data.empty:
                 raise Exception(f"No valid numeric data after cleaning for {ticker}")
 
-            buf = io.BytesIO()
-            mpf.plot(data,
-                     type='candle',
-                     style=mpf_style,
-                     title=f"\n{ticker} - {period} Chart",
-                     volume=True,
-                     panel_ratios=(3, 1),
-                     figsize=(10, 6),
-                     savefig=buf,
-                     tight_layout=True)
-            buf.seek(0)
-            img = Image.open(buf)
-            pix = pil_to_qpixmap(img)
-            signals.stock_graph_done.emit(pix)
-            buf.close()
+            signals.stock_data_done.emit(ticker, period, interval, data)
+            if render:
+                self._render_stock_chart(ticker, f"{period} {interval}", data, generation)
         except Exception as e:
-            print(f"Graph generation failed: {e}. Falling back to placeholder.")
+            signals.stock_data_done.emit(ticker, period, interval, ("error", str(e)))
+            self._render_stock_chart_error(ticker, e, generation)
+
+    def _render_stock_chart(self, ticker, period, data, generation):
+        try:
+            shm, ref = share_ohlcv(data)
+        except Exception as e:
+            self._render_stock_chart_error(ticker, e, generation)
+            return
+        try:
+            future = render_pool().submit(render_candlestick_rgba, ref, f"{ticker} - {period} Chart",
+                                          chart_render_style(self.current_theme_colors))
+        except Exception as e:
+            shm.close(); shm.unlink()
+            self._render_stock_chart_error(ticker, e, generation)
+            return
+
+        def done(fut):
+            shm.close(); shm.unlink()
             try:
-                bg_color = self.current_theme_colors.get("card_bg", "#ffffff").lstrip("#")
-                if "gradient" in bg_color: bg_color = "2a2a3e"
-                text_color = self.current_theme_colors.get("text", "#000000").lstrip("#")
-                url = f"https://placehold.co/600x400/{bg_color}/{text_color}?text=Error+Loading+Graph+for+{ticker}\n(e.g.,+invalid+ticker)"
-                img_data = requests.get(url).content
-                img = Image.open(io.BytesIO(img_data))
-                pix = pil_to_qpixmap(img)
-                signals.stock_graph_done.emit(pix)
-            except Exception as e2:
-                signals.stock_graph_done.emit(("error", str(e2)))
+                width, height, rgba = fut.result()
+                signals.stock_graph_done.emit({"generation": generation, "size": (width, height), "rgba": rgba})
+            except Exception as e:
+                self._render_stock_chart_error(ticker, e, generation)
+        future.add_done_callback(done)
+
+    def _render_stock_chart_error(self, ticker, error, generation):
+        print(f"Graph generation failed: {error}. Falling back to placeholder.")
+        try:
+            bg_color = self.current_theme_colors.get("card_bg", "#ffffff")
+            if not bg_color.startswith("#"): bg_color = "#2a2a3e"
+            text_color = self.current_theme_colors.get("text", "#000000")
+            img = render_placeholder_image(f"Error Loading Graph for {ticker}\n(e.g., invalid ticker)", bg=bg_color, fg=text_color)
+            signals.stock_graph_done.emit({"generation": generation, "image": to_qimage(img)})
+        except Exception as e2:
+            signals.stock_graph_done.emit(("error", str(e2)))
 
     def _on_stock_overview_done(self, text):
         if text.startswith("[STOCK OVERVIEW ERROR"):
@@ -2934,11 +7788,57 @@ class SarkarGPTPro(QMainWindow):
         else:
             self.stock_analytics_display.setPlainText(disclaimer + text)
 
+    def _on_stock_data_done(self, ticker, period, interval, payload):
+        if ticker != self.current_stock_ticker or interval != self.interval_combo.currentText():
+            return
+        if period != clamp_period(self.period_combo.currentText(), interval):
+            return
+        if isinstance(payload, tuple) and payload[0] == "error":
+            self.current_stock_data = None
+            self.stock_chart.set_message(f"Could not load data for {ticker}: {payload[1]}")
+            return
+        self.current_stock_data = (ticker, period, interval, payload)
+        if ticker not in symbol_index:
+            symbol_index.add([(ticker, "")])
+        self.stock_chart.set_data(payload, f"{ticker} - {period} · {interval}")
+        self._refresh_stock_overlays()
+
+    def _refresh_stock_overlays(self):
+        if not self.current_stock_data:
+            return
+        ticker, period, interval, data = self.current_stock_data
+        overlays = []
+        for label, name, params in CHART_INDICATOR_PRESETS:
+            if not self.stock_indicator_checks[label].isChecked():
+                continue
+            try:
+                values = indicator_engine.visible(ticker, name, interval, **params).reindex(data.index)
+            except Exception as e:
+                print(f"Indicator {label} failed for {ticker}: {e}")
+                continue
+            for col in values.columns:
+                overlays.append({"label": col, "group": label, "values": values[col].to_numpy(dtype=float),
+                                 "pane": INDICATORS[name]["pane"]})
+        self.stock_chart.set_overlays(overlays)
+
+    def _on_stock_chart_mode_changed(self, index):
+        self.stock_chart_stack.setCurrentIndex(index)
+        if self.stock_chart_stack.currentWidget() is self.stock_graph_label and self.current_stock_data:
+            ticker, period, interval, data = self.current_stock_data
+            self.stock_graph_label.setText(f"Rendering graph for {ticker}...")
+            self._render_stock_chart(ticker, f"{period} {interval}", data, self._next_stock_render())
+
     def _on_stock_graph_done(self, payload):
         if isinstance(payload, tuple) and payload[0] == "error":
             self.stock_graph_label.setText(f"Could not load graph: {payload[1]}")
-        elif isinstance(payload, QPixmap):
-            self.stock_graph_label.setPixmap(payload.scaled(self.stock_graph_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+        elif isinstance(payload, dict):
+            if payload["generation"] != self._stock_render_generation:
+                return
+            if "image" in payload:
+                img = payload["image"]
+            else:
+                img = qimage_from_rgba(payload["rgba"], *payload["size"])
+            self.stock_graph_label.set_source(img)
 
     def _generate_business_assist(self):
         key = self._get_api_key("openai")
@@ -2986,18 +7886,13 @@ class SarkarGPTPro(QMainWindow):
         self._set_thinking(False, self.biz_thinking)
         self.biz_btn_generate.setEnabled(True)
 
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        if hasattr(self, 'img2g_preview') and self.img2g_pil_image:
-             pix = pil_to_qpixmap(self.img2g_pil_image, maxsize=(self.img2g_preview.width(), self.img2g_preview.height()))
-             self.img2g_preview.setPixmap(pix)
-        if hasattr(self, 'stock_graph_label') and self.stock_graph_label.pixmap():
-             self.stock_graph_label.setPixmap(self.stock_graph_label.pixmap().scaled(self.stock_graph_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-
-
     def closeEvent(self, event):
         if self.streaming_timer and self.streaming_timer.isActive():
             self.streaming_timer.stop()
+        if hasattr(self, "watchlist_poller"):
+            self.watchlist_poller.stop()
+        shutdown_process_pool()
+        shutdown_render_pool()
 
         event.accept()
 